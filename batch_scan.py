@@ -0,0 +1,545 @@
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+from config import (
+    KNOWN_PEOPLE, CONFIDENCE_THRESHOLD, BATCH_SCAN_WORKERS, BATCH_SCAN_STRIDE, BATCH_SCAN_SCALE,
+    BATCH_SCAN_UPSAMPLE, BATCH_SCAN_IMAGE_MAX_SIDE, BATCH_SCAN_CHUNK_SECONDS, BATCH_SCAN_IMAGE_CHUNK
+)
+from utils import load_rgb_image, scale_face_locations
+
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# 每次批次編碼的取樣畫面數 (跨畫面共用對齊緩衝區)
+FRAMES_PER_BATCH = 8
+
+# 子行程中的人臉識別處理器與掃描設定 (由 _init_worker 建立)
+_worker_handler = None
+_worker_settings = None
+
+
+class ScanChunk:
+    """一個工作單位：影片的一段或一組照片"""
+
+    def __init__(self, kind, path, keys, start=0, end=None, fps=None, stride=1, paths=None):
+        """
+        初始化工作單位
+
+        Args:
+            kind: "video" 或 "images"
+            path: 影片路徑或照片所在資料夾 (顯示用)
+            keys: 完成後寫入檢查點的項目鍵
+            start: 影片起始幀
+            end: 影片結束幀 (不含)，None 表示讀到檔案結尾
+            fps: 影片幀率
+            stride: 取樣間隔 (幀)
+            paths: 照片路徑列表
+        """
+        self.kind = kind
+        self.path = path
+        self.keys = keys
+        self.start = start
+        self.end = end
+        self.fps = fps
+        self.stride = stride
+        self.paths = paths or []
+
+
+class JsonlIndexWriter:
+    """將出現紀錄附加到 JSON Lines 檔案，檢查點記錄每個工作單位完成時的檔案位置"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 輸出檔案路徑 (檢查點為同名的 .checkpoint 檔)
+        """
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self.output = None
+        self.checkpoint = None
+
+    def open(self, params, restart=False):
+        """
+        開啟輸出並讀取檢查點
+
+        Args:
+            params: 掃描參數，續跑時必須與檢查點一致
+            restart: 捨棄既有輸出與檢查點重新掃描
+
+        Returns:
+            已完成的項目鍵集合
+
+        Raises:
+            ValueError: 檢查點參數不一致，或輸出檔存在但沒有檢查點
+        """
+        done, offset = set(), 0
+        if not restart and os.path.exists(self.checkpoint_path):
+            lines = self._read_checkpoint()
+            if lines and lines[0].get("params") != params:
+                raise ValueError("掃描參數與檢查點不一致，請使用相同參數或加上 --restart")
+            for entry in lines[1:]:
+                done.update(entry["keys"])
+                offset = entry["offset"]
+        elif not restart and os.path.exists(self.path):
+            raise ValueError(f"{self.path} 已存在但沒有檢查點，請加上 --restart 覆寫")
+
+        if done:
+            # 捨棄上次中斷時寫入一半、尚未記錄到檢查點的資料
+            self.output = open(self.path, "r+", encoding="utf-8")
+            self.output.truncate(offset)
+            self.output.seek(offset)
+            self.checkpoint = open(self.checkpoint_path, "a", encoding="utf-8")
+        else:
+            self.output = open(self.path, "w", encoding="utf-8")
+            self.checkpoint = open(self.checkpoint_path, "w", encoding="utf-8")
+            self._append_checkpoint({"params": params})
+        return done
+
+    def write_chunk(self, keys, rows):
+        """寫入一個工作單位的紀錄並更新檢查點"""
+        for row in rows:
+            self.output.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.output.flush()
+        os.fsync(self.output.fileno())
+        self._append_checkpoint({"keys": keys, "offset": self.output.tell()})
+
+    def close(self):
+        for f in (self.output, self.checkpoint):
+            if f is not None:
+                f.close()
+
+    def _append_checkpoint(self, entry):
+        self.checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.checkpoint.flush()
+
+    def _read_checkpoint(self):
+        """
+        讀取檢查點；最後一行若在寫入時中斷 (沒有換行或不是完整的 JSON) 則捨棄並截斷，
+        該工作單位會重新掃描，之後附加的檢查點也不會接在不完整的行後面
+
+        Returns:
+            檢查點項目列表
+        """
+        entries, valid_size = [], 0
+        with open(self.checkpoint_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("不完整的檢查點")
+                    if line.strip():
+                        entries.append(json.loads(line))
+                except ValueError:
+                    # 只有最後一行可能不完整，其他位置損毀時不猜測
+                    if f.read():
+                        raise
+                    print(f"⚠️ 捨棄檢查點中不完整的最後一行: {self.checkpoint_path}")
+                    break
+                valid_size += len(line)
+        if valid_size < os.path.getsize(self.checkpoint_path):
+            with open(self.checkpoint_path, "r+b") as f:
+                f.truncate(valid_size)
+        return entries
+
+
+class SqliteIndexWriter:
+    """將出現紀錄寫入 SQLite，紀錄與檢查點在同一個交易中提交"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 資料庫檔案路徑
+        """
+        self.path = path
+        self.conn = None
+
+    def open(self, params, restart=False):
+        """
+        開啟資料庫並讀取檢查點
+
+        Args:
+            params: 掃描參數，續跑時必須與資料庫中記錄的一致
+            restart: 清除既有紀錄重新掃描
+
+        Returns:
+            已完成的項目鍵集合
+
+        Raises:
+            ValueError: 掃描參數不一致
+        """
+        self.conn = sqlite3.connect(self.path)
+        with self.conn:
+            if restart:
+                self.conn.executescript(
+                    "DROP TABLE IF EXISTS appearances; DROP TABLE IF EXISTS scan_done; "
+                    "DROP TABLE IF EXISTS scan_params;")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS appearances (
+                    source TEXT, frame INTEGER, timestamp REAL,
+                    box_top INTEGER, box_right INTEGER, box_bottom INTEGER, box_left INTEGER,
+                    label TEXT, distance REAL);
+                CREATE INDEX IF NOT EXISTS appearances_label ON appearances (label, source, timestamp);
+                CREATE TABLE IF NOT EXISTS scan_done (key TEXT PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS scan_params (params TEXT);
+            """)
+            row = self.conn.execute("SELECT params FROM scan_params").fetchone()
+            if row is None:
+                self.conn.execute("INSERT INTO scan_params VALUES (?)", (json.dumps(params, sort_keys=True),))
+            elif json.loads(row[0]) != params:
+                raise ValueError("掃描參數與資料庫中的紀錄不一致，請使用相同參數或加上 --restart")
+        return {key for key, in self.conn.execute("SELECT key FROM scan_done")}
+
+    def write_chunk(self, keys, rows):
+        """寫入一個工作單位的紀錄並更新檢查點"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO appearances VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row["source"], row["frame"], row["timestamp"], *row["box"], row["label"], row["distance"])
+                 for row in rows])
+            self.conn.executemany("INSERT OR IGNORE INTO scan_done VALUES (?)", [(key,) for key in keys])
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def create_index_writer(path):
+    """依副檔名選擇輸出格式：.db / .sqlite / .sqlite3 為 SQLite，其餘為 JSON Lines"""
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SqliteIndexWriter(path)
+    return JsonlIndexWriter(path)
+
+
+def collect_sources(paths):
+    """
+    展開輸入路徑 (資料夾會遞迴搜尋)
+
+    Returns:
+        (影片路徑列表, 照片路徑列表)
+    """
+    videos, images = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            files = []
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files = [path]
+        for file in files:
+            ext = os.path.splitext(file)[1].lower()
+            if ext in VIDEO_EXTENSIONS:
+                videos.append(file)
+            elif ext in IMAGE_EXTENSIONS:
+                images.append(file)
+    return videos, images
+
+
+def plan_chunks(videos, images, stride_seconds, chunk_seconds, image_chunk, done):
+    """
+    將影片切成固定長度的段落、照片分組，略過檢查點中已完成的部分
+
+    Args:
+        videos: 影片路徑列表
+        images: 照片路徑列表
+        stride_seconds: 影片取樣間隔 (秒)
+        chunk_seconds: 每段影片的長度 (秒)
+        image_chunk: 每組照片數
+        done: 已完成的項目鍵集合
+
+    Returns:
+        ScanChunk 列表
+    """
+    chunks = []
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            print(f"❌ 無法開啟影片: {path}")
+            continue
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        stride = max(1, round(stride_seconds * fps))
+        # 段落長度取為取樣間隔的整數倍，各段的取樣點與整段連續掃描相同
+        chunk_frames = max(1, round(chunk_seconds * fps / stride)) * stride
+        starts = list(range(0, frame_count, chunk_frames)) or [0]
+        for i, start in enumerate(starts):
+            key = f"{path}@{start}"
+            if key in done:
+                continue
+            # 最後一段讀到檔案結尾 (幀數資訊可能不準確)
+            end = start + chunk_frames if i < len(starts) - 1 else None
+            chunks.append(ScanChunk("video", path, [key], start, end, fps, stride))
+
+    remaining = [path for path in images if path not in done]
+    for i in range(0, len(remaining), image_chunk):
+        paths = remaining[i:i + image_chunk]
+        chunks.append(ScanChunk("images", os.path.dirname(paths[0]), paths, paths=paths))
+    return chunks
+
+
+def scan_chunk(chunk):
+    """
+    在工作行程中檢測並編碼一個工作單位
+
+    Returns:
+        (chunk, 人臉紀錄列表, 取樣畫面數, 涵蓋的影片秒數)；紀錄不含身分，由主行程比對
+    """
+    if chunk.kind == "images":
+        return chunk, _scan_images(chunk.paths), len(chunk.paths), 0.0
+
+    cap = _open_video_at(chunk.path, chunk.start)
+
+    records, pending = [], []
+    index, frames = chunk.start, 0
+    try:
+        while chunk.end is None or index < chunk.end:
+            if (index - chunk.start) % chunk.stride:
+                # 未取樣的畫面只解碼不轉換
+                if not cap.grab():
+                    break
+            else:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                pending.append((index, frame))
+                frames += 1
+                if len(pending) >= FRAMES_PER_BATCH:
+                    records.extend(_scan_video_frames(chunk, pending))
+                    pending = []
+            index += 1
+        records.extend(_scan_video_frames(chunk, pending))
+    finally:
+        cap.release()
+    return chunk, records, frames, (index - chunk.start) / chunk.fps
+
+
+def _open_video_at(path, frame_index):
+    """
+    開啟影片並定位到指定幀
+
+    CAP_PROP_POS_FRAMES 的跳轉會落在附近的關鍵幀，部分檔案 (可變幀率、B 幀) 位置並不準確；
+    跳轉後以 CAP_PROP_POS_FRAMES 確認實際位置，不足時逐幀 grab 到目標，
+    超過或無法回報位置時從頭逐幀讀取，讓各段的取樣點與整段連續掃描相同
+
+    Args:
+        path: 影片路徑
+        frame_index: 目標幀
+
+    Returns:
+        下一次讀取即為 frame_index 的 cv2.VideoCapture
+    """
+    cap = cv2.VideoCapture(path)
+    if frame_index <= 0:
+        return cap
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if not 0 <= position <= frame_index:
+        cap.release()
+        cap = cv2.VideoCapture(path)
+        position = 0
+    while position < frame_index and cap.grab():
+        position += 1
+    return cap
+
+
+def _scan_video_frames(chunk, frames):
+    """在縮小畫面上檢測、以原始畫面批次編碼"""
+    if not frames:
+        return []
+    scale, upsample = _worker_settings["scale"], _worker_settings["upsample"]
+    batch = []
+    for _, frame in frames:
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        small = rgb_frame
+        if scale != 1:
+            small = cv2.resize(rgb_frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        locations = _worker_handler.detect_faces(small, upsample=upsample)
+        batch.append((rgb_frame, scale_face_locations(locations, 1.0 / scale)))
+
+    records = []
+    for (index, _), (_, locations), encodings in zip(frames, batch, _worker_handler.encode_faces_batch(batch)):
+        for location, encoding in zip(locations, encodings):
+            records.append({"source": chunk.path, "frame": index, "timestamp": round(index / chunk.fps, 3),
+                            "box": location, "encoding": encoding})
+    return records
+
+
+def _scan_images(paths):
+    """檢測並編碼每張照片，座標轉回原始尺寸"""
+    records = []
+    for path in paths:
+        try:
+            rgb_image, scale = load_rgb_image(path, _worker_settings["image_max_side"])
+        except Exception as e:
+            print(f"讀取圖片 {path} 失敗: {e}")
+            continue
+        locations = _worker_handler.detect_faces(rgb_image, upsample=_worker_settings["upsample"])
+        encodings = _worker_handler.encode_faces(rgb_image, locations)
+        for location, encoding in zip(scale_face_locations(locations, 1.0 / scale), encodings):
+            records.append({"source": path, "frame": None, "timestamp": None,
+                            "box": location, "encoding": encoding})
+    return records
+
+
+def _init_worker(settings, ignore_interrupt=True):
+    """工作行程初始化：載入人臉模型"""
+    global _worker_handler, _worker_settings
+    if ignore_interrupt:
+        # Ctrl+C 由主行程處理並關閉行程池
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from face_recognition_handler import FaceRecognitionHandler
+    _worker_handler = FaceRecognitionHandler()
+    _worker_settings = settings
+
+
+def match_records(face_handler, records, threshold, all_faces):
+    """
+    以特徵庫比對紀錄的身分
+
+    Args:
+        face_handler: 已載入特徵庫的人臉識別處理器
+        records: scan_chunk 產生的紀錄
+        threshold: 判定為已知身分的距離上限
+        all_faces: 是否保留未識別的人臉 (label 為 None)
+
+    Returns:
+        可寫入索引的紀錄列表
+    """
+    if not records:
+        return []
+    matches = face_handler.match_identities([record["encoding"] for record in records])
+    rows = []
+    for record, (label, distance) in zip(records, matches):
+        if label is None or distance > threshold:
+            if not all_faces:
+                continue
+            label = None
+        rows.append({"source": record["source"], "frame": record["frame"], "timestamp": record["timestamp"],
+                     "box": [int(v) for v in record["box"]], "label": label, "distance": round(distance, 4)})
+    return rows
+
+
+def run_scan(chunks, face_handler, writer, settings, workers, threshold, all_faces):
+    """
+    以行程池掃描所有工作單位，依完成順序寫入索引
+
+    Returns:
+        統計資料字典
+    """
+    stats = {"chunks": 0, "frames": 0, "media_seconds": 0.0, "rows": 0}
+    started = time.monotonic()
+
+    def record(result):
+        chunk, records, frames, media_seconds = result
+        rows = match_records(face_handler, records, threshold, all_faces)
+        writer.write_chunk(chunk.keys, rows)
+        stats["chunks"] += 1
+        stats["frames"] += frames
+        stats["media_seconds"] += media_seconds
+        stats["rows"] += len(rows)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        print(f"[{stats['chunks']}/{len(chunks)}] {chunk.path} +{len(rows)} 筆 | "
+              f"{stats['frames'] / elapsed:.1f} 幀/秒 | 影片 {stats['media_seconds'] / elapsed:.1f}x 即時")
+
+    if workers == 1:
+        _init_worker(settings, ignore_interrupt=False)
+        for chunk in chunks:
+            record(scan_chunk(chunk))
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,))
+        try:
+            # 同時排入的工作單位數有上限，避免結果堆積在記憶體中
+            queued = iter(chunks)
+            pending = set()
+            for chunk in queued:
+                pending.add(executor.submit(scan_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result())
+                    chunk = next(queued, None)
+                    if chunk is not None:
+                        pending.add(executor.submit(scan_chunk, chunk))
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    stats["elapsed"] = time.monotonic() - started
+    return stats
+
+
+def main():
+    """離線批次掃描主程式"""
+    parser = argparse.ArgumentParser(description="掃描影片檔與照片資料夾，建立已登錄身分的出現索引")
+    parser.add_argument("paths", nargs="+", help="影片檔、照片或資料夾 (遞迴搜尋)")
+    parser.add_argument("--output", default="appearances.jsonl",
+                        help="輸出檔案，.db / .sqlite 為 SQLite，其餘為 JSON Lines")
+    parser.add_argument("--workers", type=int, default=BATCH_SCAN_WORKERS, help="工作行程數，0 表示使用全部 CPU 核心")
+    parser.add_argument("--stride", type=float, default=BATCH_SCAN_STRIDE, help="影片取樣間隔 (秒)")
+    parser.add_argument("--scale", type=float, default=BATCH_SCAN_SCALE, help="影片畫面的檢測縮放比例")
+    parser.add_argument("--upsample", type=int, default=BATCH_SCAN_UPSAMPLE, help="HOG 檢測前的放大次數")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD, help="判定為已知身分的距離上限")
+    parser.add_argument("--all-faces", action="store_true", help="同時記錄未識別的人臉 (label 為 null)")
+    parser.add_argument("--restart", action="store_true", help="捨棄既有輸出與檢查點重新掃描")
+    args = parser.parse_args()
+
+    videos, images = collect_sources(args.paths)
+    if not videos and not images:
+        print("錯誤: 找不到可掃描的影片或照片")
+        return
+
+    settings = {"scale": args.scale, "upsample": args.upsample, "image_max_side": BATCH_SCAN_IMAGE_MAX_SIDE}
+    params = dict(settings, stride=args.stride, threshold=args.threshold, all_faces=args.all_faces,
+                  chunk_seconds=BATCH_SCAN_CHUNK_SECONDS)
+
+    writer = create_index_writer(args.output)
+    try:
+        done = writer.open(params, restart=args.restart)
+    except ValueError as e:
+        print(f"錯誤: {e}")
+        writer.close()
+        return
+
+    chunks = plan_chunks(videos, images, args.stride, BATCH_SCAN_CHUNK_SECONDS, BATCH_SCAN_IMAGE_CHUNK, done)
+    print(f"🎬 {len(videos)} 部影片、{len(images)} 張照片，共 {len(chunks)} 個工作單位"
+          + (f" (已完成 {len(done)} 項，從檢查點繼續)" if done else ""))
+    if not chunks:
+        writer.close()
+        print("✅ 全部已掃描完成")
+        return
+
+    print("正在載入臉部特徵數據庫...")
+    from face_recognition_handler import FaceRecognitionHandler
+    face_handler = FaceRecognitionHandler()
+    if not len(face_handler.load_or_create_encodings(KNOWN_PEOPLE)):
+        print("錯誤: 沒有可用的已登錄人臉")
+        writer.close()
+        return
+
+    workers = args.workers or os.cpu_count() or 1
+    try:
+        stats = run_scan(chunks, face_handler, writer, settings, workers, args.threshold, args.all_faces)
+    except KeyboardInterrupt:
+        print("\n掃描已中斷，再次執行相同指令即可從檢查點繼續")
+        return
+    finally:
+        writer.close()
+
+    elapsed = max(stats["elapsed"], 1e-6)
+    print(f"\n{'='*50}")
+    print(f"✅ 掃描完成: {stats['frames']} 幀，{stats['rows']} 筆出現紀錄 → {args.output}")
+    print(f"耗時 {elapsed:.1f}s | {stats['frames'] / elapsed:.1f} 幀/秒 | "
+          f"影片 {stats['media_seconds']:.0f}s ({stats['media_seconds'] / elapsed:.1f}x 即時)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+import cv2
+import numpy as np
+import config
+from config import KNOWN_PEOPLE, CAMERA_WIDTH, CAMERA_HEIGHT
+from face_recognition_handler import FaceRecognitionHandler
+from friend_detector import FriendDetector
+from metrics import StageTimer, summarize_durations, peak_rss_mb
+from utils import letterbox
+
+
+class HeadlessVideoPlayer:
+    """不開啟視窗的影片播放器，只記錄觸發次數"""
+
+    def __init__(self):
+        self.is_playing = False
+        self.trigger_count = 0
+
+    def play(self):
+        self.trigger_count += 1
+
+    def stop(self):
+        pass
+
+
+def iter_video_frames(video_path, max_frames, loop=True):
+    """
+    從影片檔讀取畫面並縮放到攝影機解析度
+
+    Args:
+        video_path: 影片檔案路徑
+        max_frames: 最多讀取的畫面數
+        loop: 影片結束時是否從頭重播
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"無法開啟影片: {video_path}")
+
+    produced = 0
+    try:
+        while produced < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                if not loop or produced == 0:
+                    break
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                continue
+            produced += 1
+            yield cv2.resize(frame, (CAMERA_WIDTH, CAMERA_HEIGHT))
+    finally:
+        cap.release()
+
+
+def iter_image_frames(image_dir, max_frames):
+    """
+    以資料夾中的照片合成攝影機畫面 (等比縮放後置中貼到黑底)
+
+    Args:
+        image_dir: 照片資料夾
+        max_frames: 最多產生的畫面數
+    """
+    paths = sorted(p for p in glob.glob(os.path.join(image_dir, "*"))
+                   if os.path.splitext(p)[1].lower() in (".jpg", ".jpeg", ".png"))
+    frames = [letterbox(image, CAMERA_WIDTH, CAMERA_HEIGHT) for image in map(cv2.imread, paths) if image is not None]
+    if not frames:
+        raise RuntimeError(f"資料夾中沒有可用的照片: {image_dir}")
+
+    for i in range(max_frames):
+        # 每次都給新的副本，因為檢測器會直接在畫面上繪製
+        yield frames[i % len(frames)].copy()
+
+
+def run_benchmark(frames, warmup=10, fps=30.0, trace_alloc=False):
+    """
+    以無視窗模式執行 FriendDetector.process_frame 並收集效能資料
+
+    Args:
+        frames: 畫面產生器
+        warmup: 不計入統計的暖身畫面數
+        fps: 模擬的攝影機幀率；檢測排程以實際時間計算，0 表示不限速
+        trace_alloc: 以 tracemalloc 記錄每幀暫時配置的記憶體峰值 (會降低速度)
+
+    Returns:
+        效能結果字典
+    """
+    face_handler = FaceRecognitionHandler()
+    face_handler.load_or_create_encodings(KNOWN_PEOPLE)
+
+    player = HeadlessVideoPlayer()
+    timer = StageTimer()
+    detector = FriendDetector(face_handler, player, timer=timer)
+
+    latencies = []
+    alloc_peaks = []
+    start_time = None
+    if trace_alloc:
+        tracemalloc.start()
+    next_due = time.perf_counter()
+    for index, frame in enumerate(frames):
+        # 依攝影機幀率送入畫面，處理落後時不補送，從目前時間重新排程
+        if fps > 0:
+            delay = next_due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_due = max(next_due, time.perf_counter()) + 1.0 / fps
+
+        if index == warmup:
+            timer.samples.clear()
+            timer.counters.clear()
+            start_time = time.perf_counter()
+
+        if trace_alloc:
+            tracemalloc.reset_peak()
+            alloc_base = tracemalloc.get_traced_memory()[0]
+        frame_start = time.perf_counter()
+        detector.process_frame(frame)
+        if index >= warmup:
+            latencies.append(time.perf_counter() - frame_start)
+            if trace_alloc:
+                alloc_peaks.append(tracemalloc.get_traced_memory()[1] - alloc_base)
+    # 等待觸發事件處理完畢，trigger_latency 才完整
+    detector.close()
+    if trace_alloc:
+        tracemalloc.stop()
+
+    if start_time is None or not latencies:
+        raise RuntimeError("畫面數不足，請增加 --frames 或減少 --warmup")
+
+    elapsed = time.perf_counter() - start_time
+    frame_count = len(latencies)
+    busy = float(np.sum(latencies))
+    return {
+        "frames": frame_count,
+        # 依 --fps 送入畫面時的實際幀率，上限為模擬的攝影機幀率
+        "paced_fps": frame_count / elapsed,
+        # 只計算處理時間的幀率，代表不受限速時的處理能力
+        "processing_fps": frame_count / max(busy, 1e-9),
+        # 處理時間佔實際時間的比例，越接近 1 表示越跟不上攝影機
+        "busy_fraction": busy / elapsed,
+        "frame_latency": summarize_durations(latencies),
+        "stages": timer.summary(),
+        "counters": dict(timer.counters),
+        "triggers": player.trigger_count,
+        "buffer_bytes_per_frame": timer.counters.get("buffer_bytes_allocated", 0) / frame_count,
+        "frame_alloc_peak_kb": {
+            "p50": float(np.percentile(alloc_peaks, 50)) / 1024,
+            "max": float(np.max(alloc_peaks)) / 1024,
+        } if alloc_peaks else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def collect_environment():
+    """記錄可重現比較所需的環境資訊"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    settings = {name: getattr(config, name) for name in dir(config)
+                if name.isupper() and isinstance(getattr(config, name), (int, float, bool, str))}
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "cpu_count": os.cpu_count(),
+        "config": settings,
+    }
+
+
+def print_report(result):
+    """輸出易讀的效能報告"""
+    latency = result["frame_latency"]
+    print(f"\n{'='*50}")
+    print(f"畫面數: {result['frames']} | 送入 FPS: {result['paced_fps']:.1f} | "
+          f"處理 FPS: {result['processing_fps']:.1f} | 忙碌比例: {result['busy_fraction']:.1%} | "
+          f"觸發次數: {result['triggers']}")
+    print(f"單幀延遲 p50 {latency['p50_ms']:.1f}ms | p95 {latency['p95_ms']:.1f}ms | "
+          f"p99 {latency['p99_ms']:.1f}ms")
+    print(f"緩衝區配置: 每幀 {result['buffer_bytes_per_frame']:.0f} bytes", end="")
+    if result["frame_alloc_peak_kb"] is not None:
+        peak = result["frame_alloc_peak_kb"]
+        print(f" | 每幀暫時配置峰值 p50 {peak['p50']:.0f}KB 最大 {peak['max']:.0f}KB", end="")
+    print()
+    if result["peak_rss_mb"] is not None:
+        print(f"最大記憶體: {result['peak_rss_mb']:.0f}MB")
+    print(f"\n{'階段':<10} {'次數':>6} {'平均ms':>8} {'p95ms':>8} {'總計ms':>10}")
+    for name, stage in sorted(result["stages"].items()):
+        print(f"{name:<10} {stage['count']:>6} {stage['mean_ms']:>8.2f} "
+              f"{stage['p95_ms']:>8.2f} {stage['total_ms']:>10.1f}")
+
+
+def main():
+    """效能測試主程式"""
+    parser = argparse.ArgumentParser(description="朋友檢測系統無視窗效能測試")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--video", default="update.mp4", help="作為攝影機輸入的影片檔")
+    source.add_argument("--images", help="以此資料夾中的照片合成畫面 (例如 02)")
+    parser.add_argument("--frames", type=int, default=300, help="測試畫面數")
+    parser.add_argument("--warmup", type=int, default=10, help="不計入統計的暖身畫面數")
+    parser.add_argument("--fps", type=float, default=30.0, help="模擬的攝影機幀率，0 表示不限速")
+    parser.add_argument("--trace-alloc", action="store_true", help="記錄每幀暫時配置的記憶體峰值 (會降低速度)")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔案，方便比較不同版本")
+    args = parser.parse_args()
+
+    total_frames = args.frames + args.warmup
+    if args.images:
+        frames = iter_image_frames(args.images, total_frames)
+        source_name = args.images
+    else:
+        frames = iter_video_frames(args.video, total_frames)
+        source_name = args.video
+
+    result = run_benchmark(frames, warmup=args.warmup, fps=args.fps, trace_alloc=args.trace_alloc)
+    result["source"] = source_name
+    result["environment"] = collect_environment()
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 結果已寫入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import argparse
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+from config import (
+    KNOWN_PEOPLE, CAMERA_WIDTH, CAMERA_HEIGHT, ENCODING_SCALE, ENCODINGS_FILE, ENCODINGS_MANIFEST_FILE,
+    DETECTION_SCALE, DETECTION_UPSAMPLE, CONFIDENCE_THRESHOLD
+)
+from encoding_cache import EncodingCache
+from face_gallery import FaceGallery
+from face_recognition_handler import FaceRecognitionHandler, ENROLLMENT_PARAMS
+from utils import load_rgb_image, letterbox, scale_face_locations
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def parse_floats(value):
+    """解析以逗號分隔的數值列表"""
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def parse_ints(value):
+    """解析以逗號分隔的整數列表"""
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_threshold_range(value):
+    """解析 "起點:終點:間隔" 格式的門檻範圍 (含終點)"""
+    start, stop, step = (float(v) for v in value.split(":"))
+    return [round(t, 4) for t in np.arange(start, stop + step / 2, step)]
+
+
+def load_enrollment_gallery(face_handler):
+    """
+    載入註冊照片的編碼，並保留每列對應的照片路徑 (留一法需排除查詢照片本身)
+
+    Returns:
+        (FaceGallery, 每列的照片路徑, {照片路徑: 身分標籤})
+    """
+    # 確保快取已包含所有註冊照片
+    face_handler.load_or_create_encodings(KNOWN_PEOPLE)
+
+    cache = EncodingCache(ENCODINGS_FILE, ENCODINGS_MANIFEST_FILE, ENROLLMENT_PARAMS)
+    cache.load()
+    encodings, gallery_labels, gallery_paths = [], [], []
+    present = {}
+    for label, paths in KNOWN_PEOPLE.items():
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            present[path] = label
+            hit, encoding = cache.lookup(path)
+            if hit and encoding is not None:
+                encodings.append(encoding)
+                gallery_labels.append(label)
+                gallery_paths.append(path)
+    return FaceGallery(encodings, gallery_labels), gallery_paths, present
+
+
+def load_camera_frames(paths):
+    """將照片縮放置中到攝影機解析度，模擬即時畫面 (RGB)"""
+    frames = {}
+    for path in paths:
+        try:
+            image, _ = load_rgb_image(path, max(CAMERA_WIDTH, CAMERA_HEIGHT) * 2)
+        except Exception as e:
+            print(f"讀取圖片 {path} 失敗: {e}")
+            continue
+        frames[path] = letterbox(image, CAMERA_WIDTH, CAMERA_HEIGHT)
+    return frames
+
+
+def run_setting(face_handler, frames, scale, upsample):
+    """
+    以與 FriendDetector 相同的流程 (縮小畫面檢測、ENCODING_SCALE 畫面編碼) 處理每張畫面
+
+    Returns:
+        ({照片路徑: 人臉編碼列表}, 平均檢測耗時, 平均編碼耗時)
+    """
+    detect_times, encode_times = [], []
+    encodings = {}
+    for path, frame in frames.items():
+        start = time.perf_counter()
+        small = frame if scale == 1 else cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        locations = face_handler.detect_faces(small, upsample=upsample)
+        detect_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        encode_frame = frame
+        if ENCODING_SCALE != 1:
+            encode_frame = cv2.resize(frame, (0, 0), fx=ENCODING_SCALE, fy=ENCODING_SCALE)
+        encode_locations = scale_face_locations(locations, ENCODING_SCALE / scale)
+        encodings[path] = face_handler.encode_faces(encode_frame, encode_locations)
+        encode_times.append(time.perf_counter() - start)
+    return encodings, float(np.mean(detect_times)), float(np.mean(encode_times))
+
+
+def best_matches(gallery, gallery_paths, path, encodings):
+    """
+    留一法比對：排除查詢照片本身的註冊編碼
+
+    Returns:
+        [(最近身分標籤, 距離), ...]，每張人臉一筆
+    """
+    if not encodings or len(gallery) == 0:
+        return []
+    distances = gallery.distances(encodings)
+    distances[:, [i for i, p in enumerate(gallery_paths) if p == path]] = np.inf
+    nearest = np.argmin(distances, axis=1)
+    return [(gallery.labels[j], float(distances[i, j])) for i, j in enumerate(nearest)]
+
+
+def evaluate(positive_matches, negative_matches, labels, thresholds):
+    """
+    計算每個門檻的真接受率與誤接受率 (以照片為單位，未檢測到人臉視為未接受)
+
+    Returns:
+        [(threshold, true_accept_rate, false_accept_rate), ...]
+    """
+    # 每張照片中正確身分 / 任一身分的最小距離
+    positive_best = np.array([min([d for label, d in matches if label == labels[path]], default=np.inf)
+                              for path, matches in positive_matches.items()])
+    negative_best = np.array([min([d for _, d in matches], default=np.inf)
+                              for matches in negative_matches.values()])
+    results = []
+    for threshold in thresholds:
+        tar = float(np.mean(positive_best <= threshold)) if len(positive_best) else 0.0
+        far = float(np.mean(negative_best <= threshold)) if len(negative_best) else 0.0
+        results.append((threshold, tar, far))
+    return results
+
+
+def pareto_front(rows):
+    """
+    保留 FPS、真接受率、誤接受率三者沒有被其他設定全面超越的列
+
+    同一組縮放與放大次數下結果相同的門檻合併為一列，threshold_max 為該範圍的上限
+    """
+    merged = {}
+    for row in sorted(rows, key=lambda row: row["threshold"]):
+        key = (row["scale"], row["upsample"], row["tar"], row["far"])
+        if key in merged:
+            merged[key]["threshold_max"] = row["threshold"]
+        else:
+            merged[key] = dict(row, threshold_max=row["threshold"])
+
+    candidates = list(merged.values())
+    front = []
+    for row in candidates:
+        dominated = any(
+            other["fps"] >= row["fps"] and other["tar"] >= row["tar"] and other["far"] <= row["far"]
+            and (other["fps"], other["tar"], other["far"]) != (row["fps"], row["tar"], row["far"])
+            for other in candidates)
+        if not dominated:
+            front.append(row)
+    return sorted(front, key=lambda row: (-row["fps"], -row["tar"], row["far"], row["threshold"]))
+
+
+def recommend(rows, min_tar, max_far):
+    """符合準確度目標的設定中最快的一個 (同速時取真接受率較高者)"""
+    candidates = [row for row in rows if row["tar"] >= min_tar and row["far"] <= max_far]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda row: (row["fps"], row["tar"], -row["far"]))
+
+
+def print_table(rows, current):
+    """輸出 Pareto 表，標示目前 config.py 的設定"""
+    print(f"\n{'縮放':>6} {'放大':>4} {'門檻':>11} {'檢測FPS':>8} {'檢測ms':>8} {'編碼ms':>8} {'真接受率':>8} {'誤接受率':>8}")
+    for row in rows:
+        scale, upsample, threshold = current
+        is_current = (row["scale"], row["upsample"]) == (scale, upsample) \
+            and row["threshold"] <= threshold <= row["threshold_max"]
+        marker = " ← 目前設定" if is_current else ""
+        thresholds = f"{row['threshold']:.2f}-{row['threshold_max']:.2f}" \
+            if row["threshold_max"] > row["threshold"] else f"{row['threshold']:.2f}"
+        print(f"{row['scale']:>6.2f} {row['upsample']:>4} {thresholds:>11} {row['fps']:>8.1f} "
+              f"{row['detect_ms']:>8.1f} {row['encode_ms']:>8.1f} {row['tar']:>8.1%} {row['far']:>8.1%}{marker}")
+
+
+def main():
+    """門檻與速度校準主程式"""
+    parser = argparse.ArgumentParser(description="以註冊照片校準檢測縮放、HOG 放大次數與識別門檻")
+    parser.add_argument("--negatives", nargs="+", default=["01"], help="不屬於任何註冊身分的照片資料夾")
+    parser.add_argument("--scales", type=parse_floats, default=[1.0, 0.75, 0.5, 0.35, 0.25],
+                        help="檢測縮放比例，以逗號分隔")
+    parser.add_argument("--upsamples", type=parse_ints, default=[0, 1, 2], help="HOG 放大次數，以逗號分隔")
+    parser.add_argument("--thresholds", type=parse_threshold_range, default=parse_threshold_range("0.30:0.60:0.01"),
+                        help="識別門檻範圍 起點:終點:間隔")
+    parser.add_argument("--min-tar", type=float, default=0.95, help="建議設定需達到的真接受率")
+    parser.add_argument("--max-far", type=float, default=0.0, help="建議設定允許的誤接受率")
+    parser.add_argument("--output", help="將所有設定的結果寫入 JSON 檔案")
+    args = parser.parse_args()
+
+    face_handler = FaceRecognitionHandler()
+    gallery, gallery_paths, labels = load_enrollment_gallery(face_handler)
+    if len(gallery) == 0:
+        print("錯誤: 沒有可用的註冊編碼")
+        return
+
+    negative_paths = sorted(
+        path for folder in args.negatives
+        for path in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+        if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS)
+    positive_frames = load_camera_frames(labels)
+    negative_frames = load_camera_frames(negative_paths)
+    frames = {**positive_frames, **negative_frames}
+    print(f"🎯 特徵庫 {len(gallery)} 筆 | 正樣本 {len(positive_frames)} 張 | 負樣本 {len(negative_frames)} 張")
+
+    rows = []
+    for scale in args.scales:
+        for upsample in args.upsamples:
+            encodings, detect_s, encode_s = run_setting(face_handler, frames, scale, upsample)
+            matches = {path: best_matches(gallery, gallery_paths, path, face_encodings)
+                       for path, face_encodings in encodings.items()}
+            positive_matches = {path: matches[path] for path in positive_frames}
+            negative_matches = {path: matches[path] for path in negative_frames}
+            detected = sum(bool(encodings[path]) for path in positive_frames)
+            print(f"縮放 {scale:.2f} 放大 {upsample}: 檢測 {detect_s * 1000:.1f}ms 編碼 {encode_s * 1000:.1f}ms | "
+                  f"正樣本檢測到人臉 {detected}/{len(positive_frames)}")
+
+            for threshold, tar, far in evaluate(positive_matches, negative_matches, labels, args.thresholds):
+                rows.append({
+                    "scale": scale, "upsample": upsample, "threshold": threshold,
+                    "fps": 1.0 / max(detect_s + encode_s, 1e-9),
+                    "detect_ms": detect_s * 1000, "encode_ms": encode_s * 1000,
+                    "tar": tar, "far": far,
+                })
+
+    front = pareto_front(rows)
+    print(f"\n{'='*50}\nPareto 前緣 ({len(front)}/{len(rows)} 個設定)；檢測 FPS 為單次檢測 + 編碼的速率")
+    current = (DETECTION_SCALE, DETECTION_UPSAMPLE, round(CONFIDENCE_THRESHOLD, 4))
+    print_table(front, current)
+
+    best = recommend(rows, args.min_tar, args.max_far)
+    if best is None:
+        print(f"\n⚠️ 沒有設定同時達到真接受率 ≥ {args.min_tar:.0%} 與誤接受率 ≤ {args.max_far:.0%}")
+    else:
+        print(f"\n✅ 達到目標的最快設定 (真接受率 {best['tar']:.1%}，誤接受率 {best['far']:.1%}):")
+        print(f"DETECTION_SCALE = {best['scale']}")
+        print(f"DETECTION_UPSAMPLE = {best['upsample']}")
+        print(f"CONFIDENCE_THRESHOLD = {best['threshold']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "pareto": front, "recommended": best}, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 結果已寫入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
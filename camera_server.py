@@ -0,0 +1,195 @@
+import argparse
+import os
+import threading
+import time
+import cv2
+from config import (
+    KNOWN_PEOPLE, CAMERA_WIDTH, CAMERA_HEIGHT, SERVER_WORKERS, SERVER_TRIGGER_COOLDOWN,
+    SERVER_STATUS_INTERVAL, METRICS_HTTP_HOST, METRICS_HTTP_PORT
+)
+from face_recognition_handler import FaceRecognitionHandler
+from friend_detector import FriendDetector
+from metrics import MetricsRegistry, MetricsServer
+from recognition_pool import RecognitionPool
+
+
+class SourceTrigger:
+    """無視窗模式的觸發策略：記錄事件並在冷卻時間內不重複觸發"""
+
+    def __init__(self, name, cooldown):
+        """
+        初始化觸發策略
+
+        Args:
+            name: 來源名稱
+            cooldown: 兩次觸發之間的最短間隔 (秒)
+        """
+        self.name = name
+        self.cooldown = cooldown
+        self.last_trigger = None
+        self.trigger_count = 0
+
+    @property
+    def is_playing(self):
+        """冷卻中視同影片播放中，檢測器不會重複觸發"""
+        return self.last_trigger is not None and time.monotonic() - self.last_trigger < self.cooldown
+
+    def play(self):
+        self.last_trigger = time.monotonic()
+        self.trigger_count += 1
+        print(f"🎉 [{self.name}] 觸發 (第 {self.trigger_count} 次)")
+
+    def stop(self):
+        self.last_trigger = None
+
+
+class CameraSource:
+    """單一攝影機或影片來源：自己的擷取執行緒、檢測器狀態與觸發策略"""
+
+    def __init__(self, name, source, face_handler, timer, cooldown, loop=True):
+        """
+        初始化來源
+
+        Args:
+            name: 來源名稱
+            source: 攝影機編號或影片檔 / 串流網址
+            face_handler: 人臉識別處理器 (通常為 PooledFaceHandler)
+            timer: 指標註冊表
+            cooldown: 觸發冷卻時間 (秒)
+            loop: 影片檔結束時是否從頭重播
+        """
+        self.name = name
+        self.source = source
+        self.loop = loop
+        self.trigger = SourceTrigger(name, cooldown)
+        self.detector = FriendDetector(face_handler, self.trigger, timer=timer)
+        self.frames = 0
+        self.running = False
+        self.thread = threading.Thread(target=self._run, name=f"source-{name}", daemon=True)
+
+    def start(self):
+        """開始擷取與檢測"""
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        """停止擷取"""
+        self.running = False
+        self.thread.join(timeout=2)
+        self.detector.close()
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            print(f"❌ [{self.name}] 無法開啟來源: {self.source}")
+            return
+
+        # 影片檔依本身的 FPS 播放，模擬即時攝影機
+        is_file = isinstance(self.source, str) and os.path.exists(self.source)
+        frame_period = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0) if is_file else 0
+        if not is_file:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+
+        next_due = time.monotonic()
+        frame = None
+        try:
+            while self.running:
+                if frame_period:
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_due = max(next_due, time.monotonic()) + frame_period
+
+                ret, frame = cap.read(frame)
+                if not ret:
+                    if is_file and self.loop:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    print(f"[{self.name}] 來源已結束")
+                    break
+
+                image = frame
+                if is_file:
+                    image = self.detector.buffers.resize("source", frame, (CAMERA_WIDTH, CAMERA_HEIGHT))
+                try:
+                    self.detector.analyze_frame(image)
+                except Exception as e:
+                    print(f"[{self.name}] 人臉檢測錯誤: {e}")
+                self.frames += 1
+        finally:
+            cap.release()
+
+
+def parse_source(value):
+    """攝影機編號轉為整數，其餘視為檔案路徑或串流網址"""
+    return int(value) if value.isdigit() else value
+
+
+def print_status(sources, elapsed):
+    """輸出每個來源的處理狀態"""
+    parts = []
+    for source in sources:
+        parts.append(f"{source.name} {source.frames / elapsed:.1f} FPS, "
+                     f"{len(source.detector.face_results)} 人, 觸發 {source.trigger.trigger_count}")
+        source.frames = 0
+    print("📊 " + " | ".join(parts))
+
+
+def main():
+    """多攝影機無視窗伺服器"""
+    parser = argparse.ArgumentParser(description="多攝影機無視窗朋友檢測伺服器")
+    parser.add_argument("--source", action="append", required=True,
+                        help="攝影機編號、影片檔或串流網址，可重複指定")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS,
+                        help="人臉檢測與編碼的工作行程數，0 表示使用全部 CPU 核心")
+    parser.add_argument("--cooldown", type=float, default=SERVER_TRIGGER_COOLDOWN, help="每個來源的觸發冷卻秒數")
+    parser.add_argument("--no-loop", action="store_true", help="影片檔播放完畢後停止該來源")
+    args = parser.parse_args()
+
+    # 特徵庫只在主行程載入一次 (記憶體映射)，各來源共用
+    print("正在初始化臉部特徵數據庫...")
+    local_handler = FaceRecognitionHandler()
+    if len(local_handler.load_or_create_encodings(KNOWN_PEOPLE)) < 3:
+        print("錯誤: 需要至少3張有效朋友照片才能運行！")
+        return
+
+    workers = args.workers or os.cpu_count() or 1
+    pool = RecognitionPool(workers)
+    metrics = MetricsRegistry()
+    server = None
+    if METRICS_HTTP_PORT:
+        server = MetricsServer(metrics, METRICS_HTTP_HOST, METRICS_HTTP_PORT)
+        server.start()
+
+    sources = []
+    for i, value in enumerate(args.source):
+        name = f"cam{i}"
+        handler = pool.handler_for(name, local_handler)
+        sources.append(CameraSource(name, parse_source(value), handler, metrics,
+                                    args.cooldown, loop=not args.no_loop))
+
+    print(f"✅ {len(sources)} 個來源共用 {workers} 個識別行程，按 Ctrl+C 結束")
+    for source in sources:
+        source.start()
+
+    try:
+        last_report = time.monotonic()
+        while any(source.thread.is_alive() for source in sources):
+            time.sleep(0.5)
+            if SERVER_STATUS_INTERVAL and time.monotonic() - last_report >= SERVER_STATUS_INTERVAL:
+                print_status(sources, time.monotonic() - last_report)
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        print("\n程式被用戶中斷")
+    finally:
+        for source in sources:
+            source.stop()
+        pool.shutdown()
+        if server is not None:
+            server.stop()
+        print("伺服器已關閉")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 FRIEND_NAME = "Your Friend"
 CONFIDENCE_THRESHOLD = 0.37
 TRIGGER_DISTANCE = 180
-NO_FRIEND_FRAMES_THRESHOLD = 15
+TRIGGER_DEBOUNCE = 0.2  # 朋友需持續位於觸發範圍內多久才觸發 (秒)
+TRIGGER_LEAVE_AFTER = 1.5  # 朋友消失超過此秒數視為離開
+TRIGGER_COOLDOWN = 0.0  # 同一人兩次觸發之間的最短間隔 (秒)，0 表示離開後再出現即可再次觸發
+TRIGGER_EVENT_LOG = ""  # 觸發事件 JSON Lines 紀錄檔，空字串表示不記錄
+TRIGGER_WEBHOOK_URL = ""  # 觸發事件以 POST 傳送的網址，空字串表示不傳送
 
 # 檔案路徑
-ENCODINGS_FILE = "known_face_encodings.pkl"
+ENCODINGS_FILE = "known_face_encodings.npy"
+ENCODINGS_MANIFEST_FILE = "known_face_encodings.json"
+INDEX_FILE = "known_face_index.npz"
 VIDEO_PATH = "update.mp4"
 
 # 攝影機設定
@@ -12,8 +18,70 @@ CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 
 # 效能設定
-DETECTION_INTERVAL = 3  # 未檢測到朋友時的檢測間隔
 FPS_UPDATE_INTERVAL = 30  # FPS 更新間隔
+DETECTION_SCALE = 0.5  # 人臉檢測 (HOG) 使用的縮放比例
+DETECTION_UPSAMPLE = 1  # 單段 HOG 檢測前的放大次數，越大可檢測越小的人臉
+ENCODING_SCALE = 1.0  # 特徵編碼使用的縮放比例，與 DETECTION_SCALE 相同時直接重用縮小畫面
+MATCH_EARLY_ACCEPT = False  # 分塊比對，所有人臉都低於 CONFIDENCE_THRESHOLD 即提前結束
+GALLERY_CHUNK_SIZE = 1024  # 提前接受模式下每次比對的編碼數量
+ANN_MIN_GALLERY_SIZE = 20000  # 編碼數量達到此值改用 IVF 近似索引 (見 index_benchmark.py)
+IVF_NUM_PROBES = 8  # IVF 每次查詢搜尋的桶數，越大召回率越高、速度越慢
+DETECTION_CPU_BUDGET = 0.5  # 人臉檢測可使用的單核 CPU 比例，決定檢測間隔的下限
+DETECTION_MIN_INTERVAL = 0.05  # 兩次檢測之間的最短間隔 (秒)
+DETECTION_IDLE_MAX_INTERVAL = 2.0  # 畫面靜止且無人時的最長檢測間隔 (秒)
+DETECTION_IDLE_BACKOFF = 2.0  # 畫面靜止且無人時，每次空檢測後檢測間隔的放大倍率
+MOTION_THRESHOLD = 4.0  # 縮圖平均灰階差異 (0-255) 超過此值視為畫面有活動
+MOTION_ROI_ENABLED = True  # 只在畫面有變化的區域與既有人臉附近執行 HOG 檢測
+MOTION_PIXEL_THRESHOLD = 25  # 背景相減時視為變化的灰階差異 (0-255)
+MOTION_ROI_PADDING = 0.5  # 候選區域每邊擴大的比例
+MOTION_ROI_MIN_SIZE = 160  # 候選區域的最小邊長 (原始畫面像素)
+MOTION_ROI_MAX_AREA = 0.5  # 候選區域總面積超過畫面此比例時改為整張檢測
+MOTION_ROI_FULL_FRAME_INTERVAL = 2.0  # 定期整張畫面檢測的間隔 (秒)
+CASCADE_ENABLED = False  # 兩段式檢測：低解析度候選後只在候選區塊以較高解析度 HOG 確認
+CASCADE_COARSE_DETECTOR = "haar"  # 候選檢測器："haar" (OpenCV Haar/LBP 分類器) 或 "hog"
+CASCADE_COARSE_MODEL = "haarcascade_frontalface_default.xml"  # Haar/LBP 分類器檔案
+CASCADE_COARSE_SCALE = 0.5  # 候選檢測使用的縮放比例 (hog 可用 0.25)
+CASCADE_COARSE_UPSAMPLE = 0  # 候選 HOG 檢測前的放大次數 (只用於 hog)
+CASCADE_CONFIRM_SCALE = 1.0  # 確認階段 HOG 使用的縮放比例
+CASCADE_CONFIRM_UPSAMPLE = 1  # 確認階段 HOG 檢測前的放大次數
+CASCADE_CROP_PADDING = 0.5  # 候選框每邊擴大的比例
+CASCADE_CROP_MIN_SIZE = 120  # 確認區塊的最小邊長 (原始畫面像素)
+IDENTITY_VOTE_WINDOW = 5  # 每張人臉保留最近幾次編碼的身分投票
+IDENTITY_VOTE_MIN = 2  # 判定為已註冊身分所需的票數，1 表示單次編碼即判定
+IDENTITY_DISTANCE_EMA = 0.5  # 顯示距離的平滑係數 (0-1，越大越重視最新結果)
+IDENTITY_EXPIRY_DETECTIONS = 2  # 連續幾次檢測都未出現的人臉才移除其身分投票 (以檢測次數計，不受檢測間隔影響)
+REENCODE_MOVE_RATIO = 0.25  # 人臉中心位移超過臉寬此比例時重新編碼
+REENCODE_RESIZE_RATIO = 0.2  # 人臉大小變化超過此比例時重新編碼
+REENCODE_MAX_AGE = 2.0  # 快取編碼的最長使用時間 (秒)
+ENCODING_BATCH_ENABLED = True  # 將所有人臉對齊到共用緩衝區後一次批次計算編碼
+FACE_CHIP_POOL_SIZE = 16  # 對齊人臉緩衝區的初始容量 (不足時自動擴充)
+ENROLLMENT_WORKERS = 0  # 註冊照片編碼的行程數，0 表示使用全部 CPU 核心，1 表示單行程
+ENROLLMENT_CHUNK_SIZE = 4  # 每次提交給子行程的照片數量
+ENROLLMENT_MAX_SIDE = 1600  # 註冊照片解碼後的最長邊上限 (JPEG 以縮小尺寸直接解碼，檢測不到人臉時以原始解析度重試)，0 表示保留原始尺寸
+TRACKING_ENABLED = True  # 檢測間隔中以光流追蹤人臉框與身分
+TRACKING_SCALE = 0.5  # 光流追蹤使用的縮放比例
+TRACKING_RECOGNITION_INTERVAL = 0.5  # 追蹤中重新執行完整識別的間隔 (秒)
+TRACKING_MIN_CONFIDENCE = 0.5  # 追蹤特徵點剩餘比例低於此值時立即重新識別
+VIDEO_PRELOAD = False  # 啟動時於背景將縮放後的影格全部載入記憶體；內建的 update.mp4 縮放到 1080p 約需 286MB，超過下方上限，不適用
+VIDEO_CACHE_MAX_MB = 64  # 預載影格的記憶體上限，超過時改為即時解碼
+VIDEO_SCALED_CACHE = True  # 未預載時於背景寫入已縮放到螢幕尺寸的影片快取檔，觸發播放時只解碼不縮放 (內建影片使用此方式)
+METRICS_HTTP_HOST = "127.0.0.1"  # 指標端點監聽位址
+METRICS_HTTP_PORT = 0  # Prometheus 文字格式 /metrics 端點埠號 (例如 9108)，0 表示關閉
+METRICS_LOG_INTERVAL = 0  # 定期輸出 JSON 指標快照的間隔 (秒)，0 表示關閉
+METRICS_LOG_FILE = "metrics.jsonl"  # JSON 指標快照檔案，空字串表示輸出到終端機
+FAST_START = True  # 先顯示攝影機預覽，人臉模型與特徵編碼於背景載入完成後才開始識別
+USE_PIPELINE = True  # 擷取 / 檢測 / 顯示分別在不同執行緒執行
+PIPELINE_STATS_INTERVAL = 5.0  # 管線統計輸出間隔 (秒)，0 表示不輸出
+SERVER_WORKERS = 0  # camera_server.py 的人臉檢測與編碼工作行程數，0 表示使用全部 CPU 核心
+SERVER_TRIGGER_COOLDOWN = 10.0  # camera_server.py 每個來源兩次觸發之間的最短間隔 (秒)
+SERVER_STATUS_INTERVAL = 10.0  # camera_server.py 輸出各來源狀態的間隔 (秒)，0 表示不輸出
+BATCH_SCAN_WORKERS = 0  # batch_scan.py 的工作行程數，0 表示使用全部 CPU 核心
+BATCH_SCAN_STRIDE = 0.5  # batch_scan.py 影片取樣間隔 (秒)
+BATCH_SCAN_SCALE = 0.5  # batch_scan.py 影片畫面的人臉檢測縮放比例 (編碼使用原始畫面)
+BATCH_SCAN_UPSAMPLE = 1  # batch_scan.py HOG 檢測前的放大次數
+BATCH_SCAN_IMAGE_MAX_SIDE = 1600  # batch_scan.py 照片解碼後的最長邊上限 (像素)
+BATCH_SCAN_CHUNK_SECONDS = 60  # batch_scan.py 每個工作單位涵蓋的影片長度 (秒)，也是續跑的粒度
+BATCH_SCAN_IMAGE_CHUNK = 32  # batch_scan.py 每個工作單位的照片數
 
 # 圖片路徑列表
 IMAGE_PATHS = [
@@ -40,4 +108,9 @@ IMAGE_PATHS = [
     "02/01 (16).png", "02/01 (17).png", "02/01 (18).png", "02/01 (19).png", "02/01 (20).png",
     "02/01 (21).png", "02/01 (22).png", "02/01 (23).png", "02/01 (24).png", "02/01 (25).png",
     "02/01 (26).png", "02/01 (27).png",
-]
\ No newline at end of file
+]
+
+# 已註冊身分：{身分標籤: 圖片路徑列表}
+KNOWN_PEOPLE = {
+    FRIEND_NAME: IMAGE_PATHS,
+}
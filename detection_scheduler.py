@@ -0,0 +1,125 @@
+import time
+import cv2
+import numpy as np
+from frame_buffers import FrameBufferPool
+
+
+class AdaptiveDetectionScheduler:
+    """依檢測耗時、CPU 預算與畫面活動量決定下一次人臉檢測的時間"""
+
+    def __init__(self, cpu_budget=0.5, min_interval=0.05, tracking_interval=0.5,
+                 idle_max_interval=2.0, idle_backoff=2.0, motion_threshold=4.0,
+                 activity_size=(64, 48), buffers=None):
+        """
+        初始化檢測排程器
+
+        Args:
+            cpu_budget: 檢測可使用的單核 CPU 比例 (0-1)
+            min_interval: 兩次檢測之間的最短間隔 (秒)
+            tracking_interval: 追蹤中重新識別的間隔 (秒)
+            idle_max_interval: 畫面靜止且無人時的最長檢測間隔 (秒)
+            idle_backoff: 每次空檢測後間隔的放大倍率
+            motion_threshold: 視為有活動的平均灰階差異 (0-255)
+            activity_size: 計算畫面差異使用的縮圖尺寸 (寬, 高)
+            buffers: 共用的影像緩衝池，預設建立自己的
+        """
+        self.cpu_budget = cpu_budget
+        self.min_interval = min_interval
+        self.tracking_interval = tracking_interval
+        self.idle_max_interval = idle_max_interval
+        self.idle_backoff = idle_backoff
+        self.motion_threshold = motion_threshold
+        self.activity_size = activity_size
+        self.buffers = buffers or FrameBufferPool()
+        self.gray_slot = 0
+
+        self.latency_ema = None
+        self.last_detection = None
+        self.idle_interval = min_interval
+        self.motion_since_detection = 0.0
+        self.prev_small = None
+
+    def observe(self, frame):
+        """
+        以縮小的灰階畫面差異估計畫面活動量
+
+        Args:
+            frame: 攝影機畫面 (BGR)
+
+        Returns:
+            與上一幀的平均灰階差異
+        """
+        small = self.buffers.resize("activity", frame, self.activity_size, interpolation=cv2.INTER_AREA)
+        # 上一幀的灰階縮圖仍需保留，兩塊緩衝區輪流使用
+        self.gray_slot ^= 1
+        small = self.buffers.cvt_color(f"activity_gray_{self.gray_slot}", small, cv2.COLOR_BGR2GRAY, channels=1)
+
+        motion = 0.0
+        if self.prev_small is not None:
+            diff = cv2.absdiff(small, self.prev_small, dst=self.buffers.get("activity_diff", small.shape))
+            motion = float(np.mean(diff))
+        self.prev_small = small
+        self.motion_since_detection = max(self.motion_since_detection, motion)
+        return motion
+
+    def base_interval(self):
+        """依檢測耗時與 CPU 預算計算的最短可持續間隔"""
+        if self.latency_ema is None:
+            return self.min_interval
+        return max(self.min_interval, self.latency_ema / self.cpu_budget)
+
+    def next_interval(self, faces_present, tracking):
+        """
+        計算距離上次檢測應等待的時間
+
+        Args:
+            faces_present: 上次檢測是否有人臉
+            tracking: 是否有人臉正在被追蹤
+
+        Returns:
+            間隔秒數
+        """
+        base = self.base_interval()
+        if tracking:
+            return max(base, self.tracking_interval)
+        if faces_present or self.motion_since_detection >= self.motion_threshold:
+            return base
+        # 畫面靜止且無人：逐步拉長間隔
+        return max(base, self.idle_interval)
+
+    def should_detect(self, faces_present, tracking, now=None):
+        """
+        判斷現在是否應執行檢測
+
+        Args:
+            faces_present: 上次檢測是否有人臉
+            tracking: 是否有人臉正在被追蹤
+            now: 目前的單調時鐘時間，預設為 time.monotonic()
+        """
+        if self.last_detection is None:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - self.last_detection >= self.next_interval(faces_present, tracking)
+
+    def record_detection(self, started, latency, faces_found):
+        """
+        記錄一次檢測結果
+
+        Args:
+            started: 檢測開始的單調時鐘時間
+            latency: 檢測耗時 (秒)
+            faces_found: 是否檢測到人臉
+        """
+        if self.latency_ema is None:
+            self.latency_ema = latency
+        else:
+            self.latency_ema = 0.8 * self.latency_ema + 0.2 * latency
+
+        if faces_found or self.motion_since_detection >= self.motion_threshold:
+            self.idle_interval = self.min_interval
+        else:
+            self.idle_interval = min(max(self.idle_interval, self.base_interval()) * self.idle_backoff,
+                                     self.idle_max_interval)
+
+        self.last_detection = started
+        self.motion_since_detection = 0.0
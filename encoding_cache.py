@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import numpy as np
+from face_gallery import ENCODING_DIM, content_fingerprint
+
+
+CACHE_VERSION = 3
+
+
+class EncodingCache:
+    """以圖片內容雜湊與處理參數為鍵的增量人臉編碼快取
+
+    編碼以 float32 .npy 矩陣保存並以唯讀記憶體映射載入，啟動時不需解析或複製資料，
+    同一台機器上的多個行程共用相同的分頁；清單 (.json) 記錄每張圖片的雜湊、列號與身分標籤。
+    每列的平方範數另存於 <編碼檔名>_norms.npy，矩陣內容指紋記錄在清單中，
+    載入特徵庫與索引時都不需要讀取整個矩陣。
+    """
+
+    def __init__(self, data_path, manifest_path, params):
+        """
+        初始化編碼快取
+
+        Args:
+            data_path: 編碼矩陣 (.npy) 路徑
+            manifest_path: 快取清單 (.json) 路徑
+            params: 影響編碼結果的預處理與模型參數
+        """
+        self.data_path = data_path
+        self.norms_path = os.path.splitext(data_path)[0] + "_norms.npy"
+        self.manifest_path = manifest_path
+        self.params_digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+        self.entries = {}
+        self.encodings = np.empty((0, 0), dtype=np.float32)
+        self.sq_norms = np.empty(0, dtype=np.float32)
+        self.digest = None
+        self._computed_keys = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """載入快取，檔案不存在、版本或參數不符時視為空快取"""
+        if not all(os.path.exists(path) for path in (self.manifest_path, self.data_path, self.norms_path)):
+            return
+
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != CACHE_VERSION or manifest.get("params") != self.params_digest:
+            print("編碼參數已變更，快取失效")
+            return
+
+        encodings = np.load(self.data_path, mmap_mode="r", allow_pickle=False)
+        sq_norms = np.load(self.norms_path, mmap_mode="r", allow_pickle=False)
+        count = manifest.get("count")
+        if encodings.dtype != np.float32 or len(encodings) != count or len(sq_norms) != count:
+            print("編碼檔案與清單不一致，快取失效")
+            return
+        self.encodings = encodings
+        self.sq_norms = sq_norms
+        self.digest = manifest.get("digest")
+        self.entries = manifest["entries"]
+
+    def lookup(self, path):
+        """
+        查詢圖片的快取結果
+
+        Args:
+            path: 圖片路徑
+
+        Returns:
+            (是否命中, 編碼或 None)；命中但編碼為 None 表示此圖片先前處理失敗
+        """
+        if not self.is_current(path):
+            self.misses += 1
+            return False, None
+        entry = self.entries[path]
+
+        self.hits += 1
+        row = entry["row"]
+        # 複製單列，避免結果持有記憶體映射 (Windows 上會阻止之後取代檔案)
+        return True, (None if row is None else np.array(self.encodings[row]))
+
+    def is_current(self, path):
+        """圖片的快取項目是否存在且內容未變更 (大小與修改時間相同時只需 stat)"""
+        entry = self.entries.get(path)
+        if entry is None or not os.path.exists(path):
+            return False
+        return entry["key"] == self._content_key(path, entry)
+
+    def matrix_for(self, paths, labels):
+        """
+        若快取涵蓋 paths 中所有存在的圖片且內容與標籤皆未變更，直接返回記憶體映射的編碼矩陣
+
+        先前未檢測到人臉的圖片 (row 為 None) 不佔矩陣列，不影響直接使用；
+        此時 sq_norms 與 digest 即為該矩陣的平方範數與內容指紋
+
+        Args:
+            paths: 圖片路徑列表
+            labels: 每張圖片的身分標籤
+
+        Returns:
+            (N×128 唯讀矩陣 (不複製), 每列的身分標籤)；無法直接使用時返回 None
+        """
+        expected = {}
+        for path, label in zip(paths, labels):
+            if path in self.entries:
+                expected[path] = label
+            elif os.path.exists(path):
+                # 新增的圖片需要計算編碼
+                return None
+        if len(expected) != len(self.entries):
+            return None
+
+        row_labels = [None] * len(self.encodings)
+        for path, label in expected.items():
+            entry = self.entries[path]
+            if entry.get("label") != label or not self.is_current(path):
+                return None
+            if entry["row"] is not None:
+                row_labels[entry["row"]] = label
+        if any(label is None for label in row_labels):
+            return None
+        return self.encodings, row_labels
+
+    def labels_changed(self, results):
+        """results 中的身分標籤是否與清單記錄不同"""
+        return any(self.entries.get(path, {}).get("label") != label for path, _, label in results)
+
+    def save(self, results):
+        """
+        以本次結果重寫快取，未出現在 results 中的舊項目自動淘汰
+
+        Args:
+            results: [(圖片路徑, 編碼或 None, 身分標籤), ...]
+        """
+        entries = {}
+        rows = []
+        for path, encoding, label in results:
+            stat = os.stat(path)
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "row": None, "label": label}
+            entry["key"] = self._content_key(path, self.entries.get(path, {}), stat)
+            if encoding is not None:
+                entry["row"] = len(rows)
+                rows.append(encoding)
+            entries[path] = entry
+
+        encodings = np.asarray(rows, dtype=np.float32).reshape(len(rows), ENCODING_DIM)
+        sq_norms = np.einsum("ij,ij->i", encodings, encodings)
+        row_labels = [None] * len(rows)
+        for entry in entries.values():
+            if entry["row"] is not None:
+                row_labels[entry["row"]] = entry["label"]
+        digest = content_fingerprint(encodings, row_labels)
+        manifest = {"version": CACHE_VERSION, "params": self.params_digest,
+                    "count": len(rows), "digest": digest, "entries": entries}
+
+        # 釋放舊檔案的記憶體映射後才能取代檔案
+        self.encodings = encodings
+        self.sq_norms = sq_norms
+        self.digest = digest
+
+        # 先寫入暫存檔再取代，避免中斷時留下不一致的快取
+        data_tmp = self.data_path + ".tmp"
+        with open(data_tmp, "wb") as f:
+            np.save(f, encodings)
+        norms_tmp = self.norms_path + ".tmp"
+        with open(norms_tmp, "wb") as f:
+            np.save(f, sq_norms)
+        manifest_tmp = self.manifest_path + ".tmp"
+        with open(manifest_tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(data_tmp, self.data_path)
+        os.replace(norms_tmp, self.norms_path)
+        os.replace(manifest_tmp, self.manifest_path)
+
+        self.entries = entries
+
+    def _content_key(self, path, entry, stat=None):
+        """計算快取鍵；檔案大小與修改時間未變時沿用先前的雜湊，避免重新讀檔"""
+        stat = stat or os.stat(path)
+        if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns and "key" in entry:
+            return entry["key"]
+        if path not in self._computed_keys:
+            self._computed_keys[path] = _hash_file(path, self.params_digest)
+        return self._computed_keys[path]
+
+
+def _hash_file(path, params_digest):
+    """以檔案內容與參數摘要計算 SHA-1"""
+    digest = hashlib.sha1(params_digest.encode("ascii"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,116 @@
+import os
+import cv2
+from frame_buffers import FrameBufferPool
+from utils import scale_face_locations
+
+
+class HaarFaceDetector:
+    """以 OpenCV Haar/LBP 分類器在低解析度畫面上快速提出人臉候選"""
+
+    def __init__(self, scale=0.25, model="haarcascade_frontalface_default.xml",
+                 scale_factor=1.1, min_neighbors=3, min_size=20, buffers=None):
+        """
+        初始化 Haar 候選檢測器
+
+        Args:
+            scale: 候選檢測使用的縮放比例
+            model: 分類器檔案路徑，找不到時改到 OpenCV 內建的資料夾尋找
+            scale_factor: 多尺度搜尋每層的縮放倍率
+            min_neighbors: 候選框最少的鄰近命中數，越小召回率越高
+            min_size: 縮小畫面中的最小人臉邊長 (像素)
+            buffers: 共用的影像緩衝池，預設建立自己的
+
+        Raises:
+            ValueError: 無法載入分類器
+        """
+        self.scale = scale
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.buffers = buffers or FrameBufferPool()
+
+        path = model
+        if not os.path.exists(path) and hasattr(cv2, "data"):
+            path = os.path.join(cv2.data.haarcascades, model)
+        self.classifier = cv2.CascadeClassifier(path)
+        if self.classifier.empty():
+            raise ValueError(f"無法載入分類器: {model}")
+
+    def detect(self, frame):
+        """
+        提出人臉候選位置
+
+        Args:
+            frame: 攝影機畫面 (BGR)
+
+        Returns:
+            原始畫面座標的候選列表 [(top, right, bottom, left), ...]
+        """
+        small = self.buffers.resize("coarse", frame, scale=self.scale, interpolation=cv2.INTER_AREA)
+        gray = self.buffers.cvt_color("coarse_gray", small, cv2.COLOR_BGR2GRAY, channels=1)
+        gray = cv2.equalizeHist(gray, dst=gray)
+        boxes = self.classifier.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size))
+        locations = [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in boxes]
+        return scale_face_locations(locations, 1.0 / self.scale)
+
+
+class HogFaceDetector:
+    """以低解析度的 face_recognition HOG 提出人臉候選"""
+
+    def __init__(self, face_handler, scale=0.25, upsample=0, buffers=None):
+        """
+        初始化 HOG 候選檢測器
+
+        Args:
+            face_handler: 人臉識別處理器
+            scale: 候選檢測使用的縮放比例
+            upsample: HOG 檢測前的放大次數
+            buffers: 共用的影像緩衝池，預設建立自己的
+        """
+        self.face_handler = face_handler
+        self.scale = scale
+        self.upsample = upsample
+        self.buffers = buffers or FrameBufferPool()
+
+    def detect(self, frame):
+        """
+        提出人臉候選位置
+
+        Args:
+            frame: 攝影機畫面 (BGR)
+
+        Returns:
+            原始畫面座標的候選列表 [(top, right, bottom, left), ...]
+        """
+        small = self.buffers.resize("coarse", frame, scale=self.scale, interpolation=cv2.INTER_AREA)
+        rgb_small = self.buffers.cvt_color("coarse_rgb", small, cv2.COLOR_BGR2RGB)
+        locations = self.face_handler.detect_faces(rgb_small, upsample=self.upsample)
+        return scale_face_locations(locations, 1.0 / self.scale)
+
+
+def create_coarse_detector(kind, face_handler, scale, upsample=0, model=None, buffers=None):
+    """
+    依設定建立候選檢測器
+
+    Args:
+        kind: "haar" (Haar/LBP 分類器) 或 "hog"
+        face_handler: 人臉識別處理器 (hog 使用)
+        scale: 候選檢測使用的縮放比例
+        upsample: HOG 檢測前的放大次數 (hog 使用)
+        model: 分類器檔案 (haar 使用)
+        buffers: 共用的影像緩衝池
+
+    Returns:
+        候選檢測器；無法建立時返回 None
+    """
+    if kind == "hog":
+        return HogFaceDetector(face_handler, scale=scale, upsample=upsample, buffers=buffers)
+    if kind == "haar":
+        try:
+            return HaarFaceDetector(scale=scale, model=model, buffers=buffers)
+        except ValueError as e:
+            print(f"⚠️ {e}，改為單段 HOG 檢測")
+            return None
+    raise ValueError(f"未知的候選檢測器: {kind}")
@@ -0,0 +1,86 @@
+import threading
+import dlib
+import numpy as np
+from face_recognition import api as face_api
+
+
+# 與 face_recognition.face_encodings 預設 (5 點特徵點 model="small") 使用的對齊參數相同
+FACE_CHIP_SIZE = 150
+FACE_CHIP_PADDING = 0.25
+
+
+class FaceChipPool:
+    """預先配置的對齊人臉圖塊緩衝區，容量不足時加倍擴充"""
+
+    def __init__(self, capacity=16):
+        """
+        初始化緩衝區
+
+        Args:
+            capacity: 初始可容納的人臉數量
+        """
+        self.buffer = np.empty((capacity, FACE_CHIP_SIZE, FACE_CHIP_SIZE, 3), dtype=np.uint8)
+
+    def acquire(self, count):
+        """
+        取得可容納 count 張人臉的緩衝區
+
+        Returns:
+            count×150×150×3 的 uint8 陣列 (與下次呼叫共用記憶體)
+        """
+        capacity = len(self.buffer)
+        if count > capacity:
+            while capacity < count:
+                capacity *= 2
+            self.buffer = np.empty((capacity, FACE_CHIP_SIZE, FACE_CHIP_SIZE, 3), dtype=np.uint8)
+        return self.buffer[:count]
+
+
+class BatchFaceEncoder:
+    """將多張人臉 (可跨多張畫面) 對齊到共用緩衝區後一次批次計算編碼"""
+
+    def __init__(self, pool_size=16):
+        """
+        初始化批次編碼器
+
+        Args:
+            pool_size: 緩衝區初始容量
+        """
+        self.pool = FaceChipPool(pool_size)
+        self.lock = threading.Lock()
+
+    def encode(self, batch):
+        """
+        批次計算人臉編碼
+
+        Args:
+            batch: [(rgb_frame, face_locations), ...]，每張畫面可有多張人臉
+
+        Returns:
+            與 batch 對應的編碼列表 [[encoding, ...], ...]
+        """
+        shapes = []
+        for rgb_frame, face_locations in batch:
+            # dlib 需要連續記憶體 (裁切後的畫面可能不是)
+            rgb_frame = np.ascontiguousarray(rgb_frame)
+            for top, right, bottom, left in face_locations:
+                rect = dlib.rectangle(left, top, right, bottom)
+                shapes.append((rgb_frame, face_api.pose_predictor_5_point(rgb_frame, rect)))
+
+        if not shapes:
+            return [[] for _ in batch]
+
+        with self.lock:
+            chips = self.pool.acquire(len(shapes))
+            for chip, (rgb_frame, shape) in zip(chips, shapes):
+                chip[:] = dlib.get_face_chip(rgb_frame, shape, size=FACE_CHIP_SIZE, padding=FACE_CHIP_PADDING)
+            descriptors = face_api.face_encoder.compute_face_descriptor(list(chips))
+
+        # 依畫面拆回各自的編碼
+        encodings = [np.array(descriptor) for descriptor in descriptors]
+        results = []
+        offset = 0
+        for _, face_locations in batch:
+            results.append(encodings[offset:offset + len(face_locations)])
+            offset += len(face_locations)
+        return results
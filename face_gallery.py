@@ -0,0 +1,150 @@
+import hashlib
+import json
+import numpy as np
+
+
+ENCODING_DIM = 128
+
+
+class FaceGallery:
+    """人臉特徵庫：以連續 float32 (N×128) 矩陣保存已知編碼並批次比對"""
+
+    def __init__(self, encodings=None, labels=None, chunk_size=1024):
+        """
+        初始化人臉特徵庫
+
+        Args:
+            encodings: 已知人臉編碼 (列表或 N×128 陣列)
+            labels: 每個編碼對應的身分標籤，預設為 None
+            chunk_size: 提前接受模式下每次比對的編碼數量
+        """
+        self.chunk_size = max(1, int(chunk_size))
+        self.set_encodings([] if encodings is None else encodings, labels)
+
+    def set_encodings(self, encodings, labels=None, sq_norms=None, fingerprint=None):
+        """
+        重建特徵矩陣並預先計算範數
+
+        Args:
+            encodings: 已知人臉編碼 (列表或 N×128 陣列)
+            labels: 每個編碼對應的身分標籤
+            sq_norms: 預先計算的平方範數 (例如快取中記憶體映射的範數)，None 時重新計算
+            fingerprint: 預先計算的內容指紋，None 時於第一次使用才計算
+        """
+        matrix = np.asarray(encodings, dtype=np.float32)
+        self.matrix = np.ascontiguousarray(matrix.reshape(-1, ENCODING_DIM))
+        if sq_norms is None:
+            sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        elif len(sq_norms) != len(self.matrix):
+            raise ValueError("sq_norms 數量與編碼數量不一致")
+        self.sq_norms = sq_norms
+        self._fingerprint = fingerprint
+
+        if labels is None:
+            labels = [None] * len(self.matrix)
+        if len(labels) != len(self.matrix):
+            raise ValueError("labels 數量與編碼數量不一致")
+        self.labels = list(labels)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @property
+    def fingerprint(self):
+        """特徵庫內容的指紋 (未由快取提供時才雜湊整個矩陣)"""
+        if self._fingerprint is None:
+            self._fingerprint = content_fingerprint(self.matrix, self.labels)
+        return self._fingerprint
+
+    def distances(self, encodings):
+        """
+        計算每張人臉與整個特徵庫的歐氏距離
+
+        Args:
+            encodings: 人臉編碼列表 (M 個)
+
+        Returns:
+            M×N 距離矩陣
+        """
+        queries, q_sq_norms = self._prepare_queries(encodings)
+        sq_distances = self._squared_distances(queries, q_sq_norms, 0, len(self))
+        return np.sqrt(sq_distances)
+
+    def match(self, encodings, top_k=None, accept_threshold=None):
+        """
+        以單一矩陣運算比對所有人臉
+
+        Args:
+            encodings: 人臉編碼列表 (M 個)
+            top_k: 回傳最近的 k 個編碼；None 時只回傳最近的一個
+            accept_threshold: 設定時分塊比對，所有人臉都已低於此距離即提前結束
+
+        Returns:
+            (distances, indices)；top_k 為 None 時形狀為 (M,)，否則為 (M, k) 並由近到遠排序
+        """
+        queries, q_sq_norms = self._prepare_queries(encodings)
+        num_queries = len(queries)
+        k = 1 if top_k is None else max(1, min(int(top_k), len(self)))
+
+        if num_queries == 0 or len(self) == 0:
+            empty_shape = (num_queries,) if top_k is None else (num_queries, 0)
+            return np.empty(empty_shape, dtype=np.float32), np.empty(empty_shape, dtype=np.int64)
+
+        chunk_size = len(self) if accept_threshold is None else self.chunk_size
+        accept_sq = None if accept_threshold is None else accept_threshold ** 2
+
+        best_sq = np.empty((num_queries, 0), dtype=np.float32)
+        best_idx = np.empty((num_queries, 0), dtype=np.int64)
+
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            chunk_sq = self._squared_distances(queries, q_sq_norms, start, stop)
+            chunk_idx = np.broadcast_to(np.arange(start, stop), chunk_sq.shape)
+
+            best_sq = np.concatenate([best_sq, chunk_sq], axis=1)
+            best_idx = np.concatenate([best_idx, chunk_idx], axis=1)
+
+            # 只保留目前最近的 k 個候選
+            if best_sq.shape[1] > k:
+                keep = np.argpartition(best_sq, k - 1, axis=1)[:, :k]
+                best_sq = np.take_along_axis(best_sq, keep, axis=1)
+                best_idx = np.take_along_axis(best_idx, keep, axis=1)
+
+            if accept_sq is not None and np.all(best_sq.min(axis=1) < accept_sq):
+                break
+
+        order = np.argsort(best_sq, axis=1)
+        best_sq = np.take_along_axis(best_sq, order, axis=1)
+        best_idx = np.take_along_axis(best_idx, order, axis=1)
+        best_distances = np.sqrt(best_sq)
+
+        if top_k is None:
+            return best_distances[:, 0], best_idx[:, 0]
+        return best_distances, best_idx
+
+    def _prepare_queries(self, encodings):
+        """將查詢編碼轉為 float32 矩陣並計算範數"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        return queries, np.einsum("ij,ij->i", queries, queries)
+
+    def _squared_distances(self, queries, q_sq_norms, start, stop):
+        """利用 |q|² + |g|² - 2q·g 計算平方距離"""
+        gallery = self.matrix[start:stop]
+        sq_distances = q_sq_norms[:, None] + self.sq_norms[None, start:stop] - 2.0 * (queries @ gallery.T)
+        return np.maximum(sq_distances, 0.0, out=sq_distances)
+
+
+def content_fingerprint(matrix, labels):
+    """
+    計算編碼矩陣與身分標籤的 SHA-1 指紋
+
+    Args:
+        matrix: N×128 float32 編碼矩陣
+        labels: 每列的身分標籤
+
+    Returns:
+        十六進位指紋字串
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+    digest.update(json.dumps(list(labels), ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
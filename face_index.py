@@ -0,0 +1,230 @@
+import os
+import numpy as np
+
+
+class BruteForceIndex:
+    """精確暴力搜尋索引，適用於小型特徵庫"""
+
+    kind = "brute"
+
+    def __init__(self, gallery):
+        """
+        初始化暴力搜尋索引
+
+        Args:
+            gallery: FaceGallery 特徵庫
+        """
+        self.gallery = gallery
+
+    def search(self, encodings, k=1, accept_threshold=None):
+        """
+        搜尋最近的 k 個編碼
+
+        Args:
+            encodings: 人臉編碼列表 (M 個)
+            k: 回傳的鄰居數量
+            accept_threshold: 提前接受距離，None 表示完整比對
+
+        Returns:
+            (distances, indices)，形狀皆為 (M, k)
+        """
+        return self.gallery.match(encodings, top_k=k, accept_threshold=accept_threshold)
+
+    def _state(self):
+        """索引需持久化的陣列"""
+        return {}
+
+
+class IVFIndex:
+    """倒排檔 (IVF) 近似最近鄰索引：以 k-means 分桶，只搜尋最近的幾個桶"""
+
+    kind = "ivf"
+
+    def __init__(self, gallery, num_lists=None, num_probes=8, iterations=20, seed=0):
+        """
+        初始化 IVF 索引
+
+        Args:
+            gallery: FaceGallery 特徵庫
+            num_lists: 分桶數量，預設為 sqrt(N)
+            num_probes: 每次查詢搜尋的桶數
+            iterations: k-means 迭代次數
+            seed: 隨機種子
+        """
+        self.gallery = gallery
+        self.num_probes = max(1, int(num_probes))
+        self.iterations = iterations
+        self.seed = seed
+        if num_lists is None:
+            num_lists = int(round(np.sqrt(len(gallery))))
+        self.num_lists = max(1, min(int(num_lists), len(gallery)))
+        self.centroids = None
+        self.list_ids = None
+        self.list_offsets = None
+
+    def train(self):
+        """以 k-means 訓練桶中心並建立倒排表"""
+        rng = np.random.default_rng(self.seed)
+        data = self.gallery.matrix
+        # 大型特徵庫只以抽樣資料訓練桶中心
+        max_train_points = 64 * self.num_lists
+        if len(data) > max_train_points:
+            data = data[np.sort(rng.choice(len(data), max_train_points, replace=False))]
+        centroids = data[rng.choice(len(data), self.num_lists, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            assignments = _nearest_centroids(data, centroids)
+            counts = np.bincount(assignments, minlength=self.num_lists)
+            non_empty = counts > 0
+
+            # 依桶排序後以 reduceat 一次加總每個桶的向量
+            order = np.argsort(assignments, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[non_empty]
+            sums = np.add.reduceat(data[order], starts, axis=0)
+            centroids[non_empty] = sums / counts[non_empty, None]
+            # 空桶重新以隨機樣本初始化
+            empty = np.flatnonzero(~non_empty)
+            if len(empty):
+                centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+        self._build_lists(centroids, _nearest_centroids(self.gallery.matrix, centroids))
+        return self
+
+    def search(self, encodings, k=1, accept_threshold=None):
+        """
+        只在最近的 num_probes 個桶中搜尋最近的 k 個編碼
+
+        Args:
+            encodings: 人臉編碼列表 (M 個)
+            k: 回傳的鄰居數量
+            accept_threshold: 未使用，保留與 BruteForceIndex 相同的介面
+
+        Returns:
+            (distances, indices)，形狀皆為 (M, k)；候選不足時以 inf / -1 補齊
+        """
+        queries, q_sq_norms = self.gallery._prepare_queries(encodings)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        if len(queries) == 0 or len(self.gallery) == 0:
+            return distances, indices
+
+        num_probes = min(self.num_probes, self.num_lists)
+        centroid_sq = _squared_distances(queries, self.centroids)
+        probes = np.argpartition(centroid_sq, num_probes - 1, axis=1)[:, :num_probes]
+
+        for row, query_probes in enumerate(probes):
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in query_probes
+            ])
+            if len(candidates) == 0:
+                continue
+
+            vectors = self.gallery.matrix[candidates]
+            cand_sq = (q_sq_norms[row] + self.gallery.sq_norms[candidates]
+                       - 2.0 * (vectors @ queries[row]))
+            np.maximum(cand_sq, 0.0, out=cand_sq)
+
+            top = min(k, len(candidates))
+            best = np.argpartition(cand_sq, top - 1)[:top]
+            best = best[np.argsort(cand_sq[best])]
+            distances[row, :top] = np.sqrt(cand_sq[best])
+            indices[row, :top] = candidates[best]
+
+        return distances, indices
+
+    def _build_lists(self, centroids, assignments):
+        """依分桶結果建立連續的倒排表"""
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.list_ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=self.num_lists)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def _state(self):
+        """索引需持久化的陣列"""
+        return {
+            "centroids": self.centroids,
+            "list_ids": self.list_ids,
+            "list_offsets": self.list_offsets,
+        }
+
+
+def build_index(gallery, ann_min_size, num_probes=8):
+    """
+    依特徵庫大小選擇索引：小型特徵庫用暴力搜尋，大型特徵庫用 IVF
+
+    Args:
+        gallery: FaceGallery 特徵庫
+        ann_min_size: 啟用 IVF 的最小編碼數量
+        num_probes: IVF 每次查詢搜尋的桶數
+
+    Returns:
+        BruteForceIndex 或 IVFIndex
+    """
+    if len(gallery) < ann_min_size:
+        return BruteForceIndex(gallery)
+    return IVFIndex(gallery, num_probes=num_probes).train()
+
+
+def gallery_fingerprint(gallery):
+    """特徵庫內容的指紋，用於判斷持久化索引是否過期 (由編碼快取載入時直接沿用清單中的摘要)"""
+    return gallery.fingerprint
+
+
+def save_index(index, path):
+    """
+    將索引保存為 .npz 檔案
+
+    Args:
+        index: BruteForceIndex 或 IVFIndex
+        path: 索引檔案路徑
+    """
+    with open(path, "wb") as f:
+        np.savez(f, kind=index.kind, fingerprint=gallery_fingerprint(index.gallery), **index._state())
+
+
+def load_index(path, gallery, num_probes=8):
+    """
+    載入索引，檔案不存在或與特徵庫不一致時返回 None
+
+    Args:
+        path: 索引檔案路徑
+        gallery: FaceGallery 特徵庫
+        num_probes: IVF 每次查詢搜尋的桶數
+
+    Returns:
+        BruteForceIndex、IVFIndex 或 None
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as data:
+        if str(data["fingerprint"]) != gallery_fingerprint(gallery):
+            return None
+
+        kind = str(data["kind"])
+        if kind == BruteForceIndex.kind:
+            return BruteForceIndex(gallery)
+        if kind == IVFIndex.kind:
+            index = IVFIndex(gallery, num_lists=len(data["centroids"]), num_probes=num_probes)
+            index.centroids = data["centroids"]
+            index.list_ids = data["list_ids"]
+            index.list_offsets = data["list_offsets"]
+            return index
+    return None
+
+
+def _squared_distances(queries, points):
+    """計算查詢與點集合的平方距離矩陣"""
+    q_sq = np.einsum("ij,ij->i", queries, queries)
+    p_sq = np.einsum("ij,ij->i", points, points)
+    sq_distances = q_sq[:, None] + p_sq[None, :] - 2.0 * (queries @ points.T)
+    return np.maximum(sq_distances, 0.0, out=sq_distances)
+
+
+def _nearest_centroids(data, centroids, chunk_size=8192):
+    """分塊計算每個點最近的桶中心，避免建立 N×C 的完整矩陣"""
+    assignments = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        assignments[start:start + chunk_size] = _squared_distances(chunk, centroids).argmin(axis=1)
+    return assignments
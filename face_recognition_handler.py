@@ -1,9 +1,33 @@
 import os
-import pickle
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 import face_recognition
-from utils import preprocess_image
-from config import ENCODINGS_FILE
+from encoding_cache import EncodingCache
+from face_chips import BatchFaceEncoder
+from face_gallery import FaceGallery
+from face_index import BruteForceIndex, build_index, load_index, save_index
+from utils import preprocess_image, iter_preprocessed_images, PREPROCESS_VERSION
+from config import (
+    FRIEND_NAME, ENCODINGS_FILE, ENCODINGS_MANIFEST_FILE, INDEX_FILE, CONFIDENCE_THRESHOLD,
+    MATCH_EARLY_ACCEPT, GALLERY_CHUNK_SIZE, ANN_MIN_GALLERY_SIZE, IVF_NUM_PROBES,
+    ENROLLMENT_WORKERS, ENROLLMENT_CHUNK_SIZE, ENCODING_BATCH_ENABLED, FACE_CHIP_POOL_SIZE,
+    ENROLLMENT_MAX_SIDE
+)
+
+
+# 舊版只保存編碼列表的 pickle 檔，沒有照片路徑，無法轉入以照片為單位的快取
+LEGACY_ENCODINGS_FILE = "known_face_encodings.pkl"
+
+# 影響註冊編碼結果的參數，變更後快取自動失效
+ENROLLMENT_PARAMS = {
+    "preprocess": PREPROCESS_VERSION,
+    "max_side": ENROLLMENT_MAX_SIDE,
+    "model": "hog",
+    "upsample": 1,
+    "num_jitters": 1,
+    # 縮小後檢測不到人臉時以原始解析度重試
+    "full_size_retry": True,
+}
 
 
 class FaceRecognitionHandler:
@@ -12,96 +36,138 @@ class FaceRecognitionHandler:
     def __init__(self):
         """初始化人臉識別處理器"""
         self.known_face_encodings = []
+        self.known_face_labels = []
+        self.gallery = FaceGallery(chunk_size=GALLERY_CHUNK_SIZE)
+        self.index = BruteForceIndex(self.gallery)
+        self.batch_encoder = BatchFaceEncoder(FACE_CHIP_POOL_SIZE) if ENCODING_BATCH_ENABLED else None
     
     def load_or_create_encodings(self, image_paths):
         """
-        載入或創建人臉編碼
+        載入或創建人臉編碼，只重新計算新增或變更的圖片
         
         Args:
-            image_paths: 圖片路径列表
+            image_paths: 圖片路径列表，或 {身分標籤: 圖片路径列表} 字典
         
         Returns:
-            人臉編碼列表
+            人臉編碼列表 (或唯讀的 N×128 編碼矩陣)
         """
-        # 嘗試從檔案載入編碼
-        if os.path.exists(ENCODINGS_FILE):
-            try:
-                with open(ENCODINGS_FILE, "rb") as f:
-                    print("從文件加載預計算的臉部特徵...")
-                    self.known_face_encodings = pickle.load(f)
-                    return self.known_face_encodings
-            except Exception as e:
-                print(f"載入編碼檔案失敗: {e}")
-                print("重新計算臉部特徵...")
-
-        # 重新計算編碼
-        print("計算臉部特徵中...")
+        image_paths, image_labels = _flatten_known_people(image_paths)
+        
+        # 載入增量快取
+        cache = EncodingCache(ENCODINGS_FILE, ENCODINGS_MANIFEST_FILE, ENROLLMENT_PARAMS)
+        if os.path.exists(LEGACY_ENCODINGS_FILE) and not os.path.exists(ENCODINGS_MANIFEST_FILE):
+            print(f"⚠️ {LEGACY_ENCODINGS_FILE} 為舊版格式，不再使用；將重新計算所有照片，完成後可刪除該檔案")
+        try:
+            cache.load()
+        except Exception as e:
+            print(f"載入編碼快取失敗: {e}")
+            print("重新計算臉部特徵...")
+        
+        # 快取與照片列表完全一致時直接使用記憶體映射的矩陣，不逐張複製
+        cached = cache.matrix_for(image_paths, image_labels)
+        if cached is not None:
+            matrix, labels = cached
+            print(f"✅ 已映射 {len(matrix)} 筆特徵編碼 ({ENCODINGS_FILE})")
+            self._set_known_encodings(matrix, labels, cache.sq_norms, cache.digest)
+            return matrix
+        
+        results = []
         known_encodings = []
+        known_labels = []
         valid_images = 0
         failed_images = []
 
+        # 先查詢快取，收集需要重新計算的圖片
+        lookups = []
+        pending_paths = []
+        for path in image_paths:
+            if not os.path.exists(path):
+                lookups.append(None)
+                continue
+            hit, encoding = cache.lookup(path)
+            lookups.append((hit, encoding))
+            if not hit:
+                pending_paths.append(path)
+
+        computed = {}
+        if pending_paths:
+            print("計算臉部特徵中...")
+            computed = self._encode_enrollment_images(pending_paths)
+
         for i, path in enumerate(image_paths):
-            print(f"處理進度: {i+1}/{len(image_paths)} - {os.path.basename(path)}")
+            if lookups[i] is None:
+                print(f"❌ 文件不存在: {path}")
+                failed_images.append(path)
+                continue
             
-            try:
-                if not os.path.exists(path):
-                    print(f"❌ 文件不存在: {path}")
-                    failed_images.append(path)
-                    continue
-                
-                # 預處理圖片
-                image = preprocess_image(path)
-                if image is None:
-                    failed_images.append(path)
-                    continue
-                
-                # 檢測人臉
-                face_locations = face_recognition.face_locations(image, model="hog")
-                
-                if not face_locations:
-                    print(f"❌ 未檢測到人臉")
-                    failed_images.append(path)
-                    continue
-
-                # 選擇最大的人臉
-                if len(face_locations) > 1:
-                    largest_face = max(face_locations, 
-                                     key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
-                    face_locations = [largest_face]
-
-                # 提取特徵編碼
-                encodings = face_recognition.face_encodings(image, known_face_locations=face_locations)
-                
-                if encodings:
-                    known_encodings.append(encodings[0])
-                    valid_images += 1
-                    print(f"✅ 成功提取特徵")
-                else:
-                    print(f"❌ 特徵提取失敗")
-                    failed_images.append(path)
-                    
-            except Exception as e:
-                print(f"❌ 處理錯誤: {str(e)}")
+            hit, encoding = lookups[i]
+            if not hit:
+                encoding = computed[path]
+            
+            results.append((path, encoding, image_labels[i]))
+            if encoding is None:
                 failed_images.append(path)
+                continue
+            
+            known_encodings.append(encoding)
+            known_labels.append(image_labels[i])
+            valid_images += 1
+
+        print(f"快取命中: {cache.hits} 張，重新計算: {cache.misses} 張")
 
         # 結果統計
         self._print_processing_summary(len(image_paths), valid_images, failed_images)
 
-        # 保存編碼
-        if valid_images >= 3:
-            self._save_encodings(known_encodings)
-        else:
+        # 保存快取 (自動淘汰已移除的圖片)
+        if cache.misses or len(cache.entries) != len(results) or cache.labels_changed(results):
+            self._save_encodings(cache, results)
+        
+        if valid_images < 3:
             print(f"\n❌ 錯誤: 只有 {valid_images} 張有效照片，至少需要3張")
 
-        self.known_face_encodings = known_encodings
+        self._set_known_encodings(known_encodings, known_labels)
         return known_encodings
     
+    def _encode_enrollment_images(self, paths):
+        """
+        計算多張註冊照片的編碼；ENROLLMENT_WORKERS 不為 1 時以多行程平行處理
+        
+        Args:
+            paths: 圖片路径列表
+        
+        Returns:
+            {圖片路径: 編碼或 None}
+        """
+        workers = ENROLLMENT_WORKERS or os.cpu_count() or 1
+        workers = min(workers, len(paths))
+        
+        if workers <= 1:
+            # 單行程時以產生器逐張解碼，同一時間只保留一張圖片
+            images = iter_preprocessed_images(paths, ENROLLMENT_MAX_SIDE)
+            outcomes = (_encode_preprocessed_image(image, path) for path, image in images)
+        else:
+            print(f"使用 {workers} 個行程平行計算 {len(paths)} 張照片")
+            executor = ProcessPoolExecutor(max_workers=workers)
+            # map 依提交順序回傳結果，輸出與單行程模式一致
+            outcomes = executor.map(_encode_enrollment_image, paths, chunksize=ENROLLMENT_CHUNK_SIZE)
+        
+        computed = {}
+        try:
+            for i, (path, (encoding, message)) in enumerate(zip(paths, outcomes)):
+                print(f"處理進度: {i+1}/{len(paths)} - {os.path.basename(path)}")
+                print(message)
+                computed[path] = encoding
+        finally:
+            if workers > 1:
+                executor.shutdown()
+        return computed
+    
     def recognize_faces(self, frame):
         """
         識別畫面中的人臉
         
         Args:
-            frame: 攝影機畫面
+            frame: 攝影機畫面 (BGR)
         
         Returns:
             (face_locations, face_encodings, face_distances)
@@ -110,22 +176,159 @@ class FaceRecognitionHandler:
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
         # 檢測人臉位置
-        face_locations = face_recognition.face_locations(rgb_frame, model="hog")
+        face_locations = self.detect_faces(rgb_frame)
         
         if not face_locations:
             return [], [], []
         
         # 獲取人臉編碼
-        face_encodings = face_recognition.face_encodings(rgb_frame, known_face_locations=face_locations)
+        face_encodings = self.encode_faces(rgb_frame, face_locations)
         
         # 計算距離
-        face_distances_list = []
-        for face_encoding in face_encodings:
-            distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-            face_distances_list.append(distances)
+        face_distances_list = self.compute_face_distances(face_encodings)
         
         return face_locations, face_encodings, face_distances_list
     
+    def detect_faces(self, rgb_frame, upsample=1):
+        """
+        在 RGB 畫面中檢測人臉位置
+        
+        Args:
+            rgb_frame: RGB 格式畫面
+            upsample: HOG 檢測前的放大次數
+        
+        Returns:
+            人臉位置列表 [(top, right, bottom, left), ...]
+        """
+        return face_recognition.face_locations(
+            rgb_frame, number_of_times_to_upsample=upsample, model="hog")
+    
+    def detect_faces_in_regions(self, rgb_frame, regions, upsample=1):
+        """
+        只在指定區域內檢測人臉 (HOG 耗時與像素面積成正比)
+        
+        Args:
+            rgb_frame: RGB 格式畫面
+            regions: 不互相重疊的區域列表 [(top, right, bottom, left), ...]，座標對應 rgb_frame
+            upsample: HOG 檢測前的放大次數
+        
+        Returns:
+            rgb_frame 座標的人臉位置列表 [(top, right, bottom, left), ...]
+        """
+        face_locations = []
+        for top, right, bottom, left in regions:
+            crop = rgb_frame[top:bottom, left:right]
+            if crop.size == 0:
+                continue
+            for t, r, b, l in self.detect_faces(crop, upsample=upsample):
+                face_locations.append((t + top, r + left, b + top, l + left))
+        return face_locations
+    
+    def encode_faces(self, rgb_frame, face_locations):
+        """
+        只針對給定的人臉位置計算特徵編碼
+        
+        Args:
+            rgb_frame: RGB 格式畫面
+            face_locations: 對應 rgb_frame 座標的人臉位置列表
+        
+        Returns:
+            人臉編碼列表
+        """
+        if not face_locations:
+            return []
+        return self.encode_faces_batch([(rgb_frame, face_locations)])[0]
+    
+    def encode_faces_batch(self, batch):
+        """
+        一次計算多張畫面中所有人臉的編碼
+        
+        Args:
+            batch: [(rgb_frame, face_locations), ...]
+        
+        Returns:
+            與 batch 對應的編碼列表 [[encoding, ...], ...]
+        """
+        if self.batch_encoder is not None:
+            return self.batch_encoder.encode(batch)
+        return [face_recognition.face_encodings(rgb_frame, known_face_locations=face_locations)
+                if face_locations else []
+                for rgb_frame, face_locations in batch]
+    
+    def compute_face_distances(self, face_encodings):
+        """
+        計算每張人臉與已知編碼的距離
+        
+        Args:
+            face_encodings: 人臉編碼列表
+        
+        Returns:
+            每張人臉對應的距離陣列列表
+        """
+        if not len(face_encodings):
+            return []
+        return list(self.gallery.distances(face_encodings))
+    
+    def match_faces(self, face_encodings, top_k=None):
+        """
+        以特徵庫批次比對所有人臉
+        
+        Args:
+            face_encodings: 人臉編碼列表
+            top_k: 回傳最近的 k 個編碼；None 時只回傳最近的一個
+        
+        Returns:
+            (min_distances, indices)
+        """
+        accept_threshold = CONFIDENCE_THRESHOLD if MATCH_EARLY_ACCEPT else None
+        return self.gallery.match(face_encodings, top_k=top_k, accept_threshold=accept_threshold)
+    
+    def match_identities(self, face_encodings):
+        """
+        透過索引比對人臉身分
+        
+        Args:
+            face_encodings: 人臉編碼列表
+        
+        Returns:
+            [(身分標籤, 距離), ...]，找不到候選時標籤為 None
+        """
+        if not len(face_encodings) or len(self.gallery) == 0:
+            return []
+        
+        accept_threshold = CONFIDENCE_THRESHOLD if MATCH_EARLY_ACCEPT else None
+        distances, indices = self.index.search(face_encodings, k=1, accept_threshold=accept_threshold)
+        
+        matches = []
+        for distance, index in zip(distances[:, 0], indices[:, 0]):
+            label = self.gallery.labels[index] if index >= 0 else None
+            matches.append((label, float(distance)))
+        return matches
+    
+    def _set_known_encodings(self, encodings, labels, sq_norms=None, fingerprint=None):
+        """更新已知編碼並重建特徵矩陣與索引 (快取提供的範數與指紋直接沿用)"""
+        self.known_face_encodings = encodings
+        self.known_face_labels = list(labels)
+        self.gallery.set_encodings(encodings, self.known_face_labels, sq_norms, fingerprint)
+        self._load_or_build_index()
+    
+    def _load_or_build_index(self):
+        """載入與特徵庫一致的索引，否則重新建立"""
+        try:
+            index = load_index(INDEX_FILE, self.gallery, num_probes=IVF_NUM_PROBES)
+        except Exception as e:
+            print(f"載入索引檔案失敗: {e}")
+            index = None
+        
+        if index is None:
+            index = build_index(self.gallery, ANN_MIN_GALLERY_SIZE, num_probes=IVF_NUM_PROBES)
+            try:
+                save_index(index, INDEX_FILE)
+            except Exception as e:
+                print(f"保存索引檔案失敗: {e}")
+        
+        self.index = index
+    
     def _print_processing_summary(self, total_images, valid_images, failed_images):
         """打印處理結果統計"""
         print(f"\n{'='*50}")
@@ -135,11 +338,89 @@ class FaceRecognitionHandler:
         print(f"失敗數量: {len(failed_images)}")
         print(f"成功率: {valid_images/total_images*100:.1f}%")
     
-    def _save_encodings(self, encodings):
-        """保存編碼到檔案"""
+    def _save_encodings(self, cache, results):
+        """保存編碼快取到檔案"""
         try:
-            with open(ENCODINGS_FILE, "wb") as f:
-                pickle.dump(encodings, f)
+            cache.save(results)
             print(f"\n✅ 特徵編碼已保存到 {ENCODINGS_FILE}")
         except Exception as e:
-            print(f"保存編碼檔案失敗: {e}")
\ No newline at end of file
+            print(f"保存編碼檔案失敗: {e}")
+
+
+def _encode_enrollment_image(path):
+    """
+    預處理單張註冊照片並提取最大人臉的特徵編碼 (可在子行程中執行)
+    
+    Args:
+        path: 圖片路径
+    
+    Returns:
+        (人臉編碼或 None, 處理結果訊息)
+    """
+    return _encode_preprocessed_image(preprocess_image(path, ENROLLMENT_MAX_SIDE), path)
+
+
+def _encode_preprocessed_image(image, path=None):
+    """
+    從預處理後的註冊照片提取最大人臉的特徵編碼
+    
+    Args:
+        image: 預處理後的 RGB 圖像陣列，預處理失敗時為 None
+        path: 圖片路径；縮小後的圖片檢測不到人臉時以原始解析度重新預處理並重試
+    
+    Returns:
+        (人臉編碼或 None, 處理結果訊息)
+    """
+    if image is None:
+        return None, f"❌ 預處理失敗"
+    
+    try:
+        # 檢測人臉
+        face_locations = _locate_enrollment_faces(image)
+        
+        # 團體照或遠景中的小臉縮小後可能低於 HOG 的最小偵測尺寸
+        downscaled = ENROLLMENT_MAX_SIDE and max(image.shape[:2]) >= ENROLLMENT_MAX_SIDE
+        if not face_locations and path is not None and downscaled:
+            full_image = preprocess_image(path)
+            if full_image is not None:
+                image = full_image
+                face_locations = _locate_enrollment_faces(image)
+        
+        if not face_locations:
+            return None, f"❌ 未檢測到人臉"
+
+        # 選擇最大的人臉
+        if len(face_locations) > 1:
+            largest_face = max(face_locations, 
+                             key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+            face_locations = [largest_face]
+
+        # 提取特徵編碼
+        encodings = face_recognition.face_encodings(
+            image, known_face_locations=face_locations,
+            num_jitters=ENROLLMENT_PARAMS["num_jitters"])
+        
+        if encodings:
+            return encodings[0], f"✅ 成功提取特徵"
+        return None, f"❌ 特徵提取失敗"
+            
+    except Exception as e:
+        return None, f"❌ 處理錯誤: {str(e)}"
+
+
+def _locate_enrollment_faces(image):
+    """以註冊參數檢測人臉位置"""
+    return face_recognition.face_locations(
+        image, number_of_times_to_upsample=ENROLLMENT_PARAMS["upsample"],
+        model=ENROLLMENT_PARAMS["model"])
+
+
+def _flatten_known_people(image_paths):
+    """將 {身分標籤: 圖片路径列表} 展開為 (路径列表, 標籤列表)"""
+    if isinstance(image_paths, dict):
+        paths, labels = [], []
+        for label, person_paths in image_paths.items():
+            paths.extend(person_paths)
+            labels.extend([label] * len(person_paths))
+        return paths, labels
+    return list(image_paths), [FRIEND_NAME] * len(image_paths)
@@ -0,0 +1,186 @@
+import cv2
+import numpy as np
+from frame_buffers import FrameBufferPool
+
+
+class FaceTrack:
+    """單一人臉的追蹤狀態，攜帶最近一次識別的身分與距離"""
+
+    def __init__(self, box, points, label, distance, is_friend):
+        """
+        初始化追蹤狀態
+
+        Args:
+            box: 追蹤影像座標的人臉框 [top, right, bottom, left] (float)
+            points: 人臉框內的特徵點 (N×1×2 float32)
+            label: 身分標籤
+            distance: 識別距離
+            is_friend: 是否為朋友
+        """
+        self.box = np.asarray(box, dtype=np.float32)
+        self.points = points
+        self.initial_points = len(points)
+        self.label = label
+        self.distance = distance
+        self.is_friend = is_friend
+        self.confidence = 1.0
+
+
+class FaceTracker:
+    """以金字塔 Lucas-Kanade 光流在檢測間隔中延續人臉框與身分 (只由單一執行緒使用，管線模式下為檢測執行緒)"""
+
+    def __init__(self, scale=0.5, max_points=40, min_points=6, min_confidence=0.5, max_fb_error=1.0,
+                 buffers=None):
+        """
+        初始化人臉追蹤器
+
+        Args:
+            scale: 追蹤使用的縮放比例
+            max_points: 每張人臉最多追蹤的特徵點數
+            min_points: 低於此點數視為追蹤失敗
+            min_confidence: 剩餘特徵點比例低於此值時要求重新識別
+            max_fb_error: 前後向光流誤差上限 (像素)
+            buffers: 共用的影像緩衝池，預設建立自己的
+        """
+        self.scale = scale
+        self.max_points = max_points
+        self.min_points = min_points
+        self.min_confidence = min_confidence
+        self.max_fb_error = max_fb_error
+        self.buffers = buffers or FrameBufferPool()
+        self.gray_slot = 0
+
+        self.tracks = []
+        self.prev_gray = None
+        self.lost = False
+        self.frames_since_reset = 0
+
+    def reset(self, frame, face_results):
+        """
+        以最新的識別結果重新建立追蹤
+
+        Args:
+            frame: 識別所使用的畫面 (BGR)
+            face_results: [(face_location, label, distance, is_friend), ...]
+        """
+        gray = self._prepare(frame)
+        tracks = []
+        for face_location, label, distance, is_friend in face_results:
+            box = np.asarray(face_location, dtype=np.float32) * self.scale
+            points = self._seed_points(gray, box)
+            # 特徵點不足的人臉不追蹤，只在識別幀顯示
+            if points is not None:
+                tracks.append(FaceTrack(box, points, label, distance, is_friend))
+
+        self.tracks = tracks
+        self.prev_gray = gray
+        self.lost = False
+        self.frames_since_reset = 0
+
+    def update(self, frame):
+        """
+        將所有人臉框追蹤到新畫面
+
+        Args:
+            frame: 新的攝影機畫面 (BGR)
+
+        Returns:
+            [(face_location, label, distance, is_friend), ...]
+        """
+        gray = self._prepare(frame)
+        self.frames_since_reset += 1
+        if self.tracks and self.prev_gray is not None and self.prev_gray.shape == gray.shape:
+            self._track(self.prev_gray, gray)
+        self.prev_gray = gray
+        return self._results()
+
+    @property
+    def has_tracks(self):
+        """是否有正在追蹤的人臉"""
+        return bool(self.tracks)
+
+    def needs_recognition(self):
+        """追蹤失敗或信心度下降時需要重新執行完整識別"""
+        return self.lost or any(track.confidence < self.min_confidence for track in self.tracks)
+
+    def _track(self, prev_gray, gray):
+        """以一次前向與後向光流更新所有追蹤"""
+        prev_points = np.concatenate([track.points for track in self.tracks])
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, prev_points, None)
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, next_points, None)
+
+        fb_error = np.linalg.norm((prev_points - back_points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.max_fb_error)
+
+        tracks = []
+        offset = 0
+        for track in self.tracks:
+            count = len(track.points)
+            track_good = good[offset:offset + count]
+            old = track.points[track_good].reshape(-1, 2)
+            new = next_points[offset:offset + count][track_good].reshape(-1, 2)
+            offset += count
+
+            if len(new) < self.min_points:
+                self.lost = True
+                continue
+
+            track.box = _move_box(track.box, old, new)
+            track.points = new.reshape(-1, 1, 2)
+            track.confidence = len(new) / track.initial_points
+            tracks.append(track)
+        self.tracks = tracks
+
+    def _seed_points(self, gray, box):
+        """在人臉框中央區域挑選適合追蹤的特徵點"""
+        top, right, bottom, left = box
+        # 內縮人臉框，避免選到背景的特徵點
+        margin_x = (right - left) * 0.15
+        margin_y = (bottom - top) * 0.15
+        mask = self.buffers.get("track_mask", gray.shape)
+        mask.fill(0)
+        cv2.rectangle(mask,
+                      (int(left + margin_x), int(top + margin_y)),
+                      (int(right - margin_x), int(bottom - margin_y)), 255, -1)
+
+        points = cv2.goodFeaturesToTrack(gray, self.max_points, 0.01, 3, mask=mask)
+        if points is None or len(points) < self.min_points:
+            return None
+        return points.astype(np.float32)
+
+    def _prepare(self, frame):
+        """縮放並轉為灰階 (上一幀的灰階仍用於光流，兩塊緩衝區輪流使用)"""
+        if self.scale != 1:
+            frame = self.buffers.resize("track", frame, scale=self.scale)
+        self.gray_slot ^= 1
+        return self.buffers.cvt_color(f"track_gray_{self.gray_slot}", frame, cv2.COLOR_BGR2GRAY, channels=1)
+
+    def _results(self):
+        """將追蹤結果轉回原始畫面座標"""
+        results = []
+        for track in self.tracks:
+            top, right, bottom, left = (int(round(v / self.scale)) for v in track.box)
+            results.append(((top, right, bottom, left), track.label, track.distance, track.is_friend))
+        return results
+
+
+def _move_box(box, old, new):
+    """依特徵點的中位數位移與縮放更新人臉框"""
+    shift = np.median(new - old, axis=0)
+
+    # 以特徵點到中心距離的中位數比例估計縮放
+    scale = 1.0
+    if len(old) >= 2:
+        old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+        new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+        valid = old_spread > 1e-3
+        if np.any(valid):
+            scale = float(np.median(new_spread[valid] / old_spread[valid]))
+
+    top, right, bottom, left = box
+    center_x = (left + right) / 2 + shift[0]
+    center_y = (top + bottom) / 2 + shift[1]
+    half_w = (right - left) / 2 * scale
+    half_h = (bottom - top) / 2 * scale
+    return np.array([center_y - half_h, center_x + half_w, center_y + half_h, center_x - half_w],
+                    dtype=np.float32)
@@ -0,0 +1,117 @@
+import threading
+import cv2
+import numpy as np
+
+
+class FrameBufferPool:
+    """以名稱保存預先配置的影像緩衝區，縮放與色彩轉換透過 OpenCV 的 dst 參數重複寫入同一塊記憶體"""
+
+    def __init__(self, timer=None):
+        """
+        初始化緩衝池
+
+        Args:
+            timer: 指標註冊表；新配置緩衝區時累加 buffer_bytes_allocated
+        """
+        self.timer = timer
+        self.buffers = {}
+        self.allocated_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, shape, dtype=np.uint8):
+        """
+        取得指定名稱的緩衝區，大小或型別改變時才重新配置
+
+        Args:
+            key: 緩衝區名稱 (同一名稱只能由一個使用者同時使用)
+            shape: 陣列形狀
+            dtype: 資料型別
+
+        Returns:
+            緩衝區 (內容為上次寫入的資料)
+        """
+        with self.lock:
+            buffer = self.buffers.get(key)
+            if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+                buffer = np.empty(shape, dtype=dtype)
+                self.buffers[key] = buffer
+                self.allocated_bytes += buffer.nbytes
+                if self.timer is not None:
+                    self.timer.increment("buffer_bytes_allocated", buffer.nbytes)
+            return buffer
+
+    def resize(self, key, src, size=None, scale=None, interpolation=cv2.INTER_LINEAR):
+        """
+        縮放到緩衝區
+
+        Args:
+            key: 緩衝區名稱
+            src: 來源影像
+            size: 目標大小 (width, height)
+            scale: 縮放比例 (未指定 size 時使用，與 cv2.resize 的 fx/fy 取整方式相同)
+            interpolation: 插值方式
+
+        Returns:
+            縮放後的影像 (緩衝區)
+        """
+        if size is None:
+            size = (int(round(src.shape[1] * scale)), int(round(src.shape[0] * scale)))
+        dst = self.get(key, (size[1], size[0]) + src.shape[2:], src.dtype)
+        return cv2.resize(src, size, dst=dst, interpolation=interpolation)
+
+    def cvt_color(self, key, src, code, channels=3):
+        """
+        色彩轉換到緩衝區
+
+        Args:
+            key: 緩衝區名稱
+            src: 來源影像
+            code: cv2.COLOR_* 轉換代碼
+            channels: 輸出通道數，1 表示灰階
+
+        Returns:
+            轉換後的影像 (緩衝區)
+        """
+        shape = src.shape[:2] if channels == 1 else src.shape[:2] + (channels,)
+        return cv2.cvtColor(src, code, dst=self.get(key, shape, src.dtype))
+
+
+class FrameRecycler:
+    """跨執行緒重複使用整張畫面大小的緩衝區 (管線中的擷取畫面與檢測副本)"""
+
+    def __init__(self, timer=None):
+        """
+        初始化畫面回收器
+
+        Args:
+            timer: 指標註冊表；新配置緩衝區時累加 buffer_bytes_allocated
+        """
+        self.timer = timer
+        self.free = []
+        self.lock = threading.Lock()
+
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        取得一張可寫入的畫面緩衝區
+
+        Args:
+            shape: 畫面形狀；為 None 時返回 None (讓 cap.read 自行配置第一張)
+            dtype: 資料型別
+        """
+        if shape is None:
+            return None
+        with self.lock:
+            for i, buffer in enumerate(self.free):
+                if buffer.shape == tuple(shape) and buffer.dtype == dtype:
+                    return self.free.pop(i)
+        buffer = np.empty(shape, dtype=dtype)
+        if self.timer is not None:
+            self.timer.increment("buffer_bytes_allocated", buffer.nbytes)
+        return buffer
+
+    def release(self, buffer):
+        """歸還不再使用的畫面緩衝區"""
+        if buffer is None:
+            return
+        with self.lock:
+            self.free.append(buffer)
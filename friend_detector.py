@@ -1,36 +1,129 @@
 import cv2
 import numpy as np
 import time
-from utils import cv2_puttext_chinese, calculate_face_center_distance
+from detection_scheduler import AdaptiveDetectionScheduler
+from face_cascade import create_coarse_detector
+from face_tracker import FaceTracker
+from frame_buffers import FrameBufferPool
+from identity_tracker import IdentityTracker
+from metrics import NullTimer
+from motion_regions import (
+    MotionRegionDetector, pad_regions, merge_regions, regions_area, regions_overlap
+)
+from overlay import OverlayRenderer
+from trigger_engine import TriggerEngine, PlayerAction, FileSink, WebhookAction
+from utils import calculate_face_center_distance, scale_face_locations
 from config import (
-    FRIEND_NAME, CONFIDENCE_THRESHOLD, TRIGGER_DISTANCE, 
-    NO_FRIEND_FRAMES_THRESHOLD, DETECTION_INTERVAL, FPS_UPDATE_INTERVAL
+    CONFIDENCE_THRESHOLD, TRIGGER_DISTANCE, FPS_UPDATE_INTERVAL,
+    TRIGGER_DEBOUNCE, TRIGGER_LEAVE_AFTER, TRIGGER_COOLDOWN, TRIGGER_EVENT_LOG, TRIGGER_WEBHOOK_URL,
+    DETECTION_SCALE, ENCODING_SCALE, TRACKING_ENABLED, TRACKING_SCALE,
+    TRACKING_MIN_CONFIDENCE, DETECTION_CPU_BUDGET, DETECTION_MIN_INTERVAL,
+    TRACKING_RECOGNITION_INTERVAL, DETECTION_IDLE_MAX_INTERVAL, DETECTION_IDLE_BACKOFF,
+    MOTION_THRESHOLD, MOTION_ROI_ENABLED, MOTION_ROI_PADDING, MOTION_ROI_MIN_SIZE,
+    MOTION_ROI_MAX_AREA, MOTION_ROI_FULL_FRAME_INTERVAL, MOTION_PIXEL_THRESHOLD,
+    DETECTION_UPSAMPLE, CASCADE_ENABLED, CASCADE_COARSE_DETECTOR, CASCADE_COARSE_SCALE,
+    CASCADE_COARSE_UPSAMPLE, CASCADE_COARSE_MODEL, CASCADE_CONFIRM_SCALE,
+    CASCADE_CONFIRM_UPSAMPLE, CASCADE_CROP_PADDING, CASCADE_CROP_MIN_SIZE,
+    IDENTITY_VOTE_WINDOW, IDENTITY_VOTE_MIN, IDENTITY_DISTANCE_EMA, IDENTITY_EXPIRY_DETECTIONS,
+    REENCODE_MOVE_RATIO, REENCODE_RESIZE_RATIO, REENCODE_MAX_AGE
 )
 
 
 class FriendDetector:
     """朋友檢測器"""
     
-    def __init__(self, face_handler, video_player):
+    def __init__(self, face_handler, video_player, timer=None):
         """
         初始化朋友檢測器
         
         Args:
             face_handler: 人臉識別處理器
             video_player: 影片播放器
+            timer: 各階段計時器 (metrics.StageTimer 或 metrics.MetricsRegistry)，預設不計時
         """
         self.face_handler = face_handler
         self.video_player = video_player
+        self.timer = timer or NullTimer()
+        
+        # 觸發事件：以實際時間判斷進入 / 離開，動作在各自的執行緒執行，不阻塞畫面處理
+        self.triggers = TriggerEngine(
+            debounce=TRIGGER_DEBOUNCE,
+            leave_after=TRIGGER_LEAVE_AFTER,
+            cooldown=TRIGGER_COOLDOWN,
+            timer=self.timer,
+        )
+        self.triggers.subscribe(PlayerAction(video_player, timer=self.timer))
+        if TRIGGER_EVENT_LOG:
+            self.triggers.subscribe(FileSink(TRIGGER_EVENT_LOG))
+        if TRIGGER_WEBHOOK_URL:
+            self.triggers.subscribe(WebhookAction(TRIGGER_WEBHOOK_URL))
+        
+        # 最近一次的檢測或追蹤結果；每次整個替換為新的 tuple，管線的顯示端可直接讀取快照
+        self.face_results = ()
+        
+        # 縮放與色彩轉換的預先配置緩衝區，各階段重複使用
+        self.buffers = FrameBufferPool(self.timer)
+        
+        # 界面文字渲染器
+        self.overlay = OverlayRenderer()
+        
+        # 檢測間隔中以光流追蹤延續人臉框與身分
+        self.tracker = None
+        if TRACKING_ENABLED:
+            self.tracker = FaceTracker(scale=TRACKING_SCALE, min_confidence=TRACKING_MIN_CONFIDENCE,
+                                       buffers=self.buffers)
         
-        # 檢測狀態
-        self.friend_detected = False
-        self.no_friend_frames = 0
+        # 跨檢測延續身分：快取編碼並以投票判定身分
+        self.identities = IdentityTracker(
+            CONFIDENCE_THRESHOLD,
+            vote_window=IDENTITY_VOTE_WINDOW,
+            min_votes=IDENTITY_VOTE_MIN,
+            distance_ema=IDENTITY_DISTANCE_EMA,
+            move_ratio=REENCODE_MOVE_RATIO,
+            resize_ratio=REENCODE_RESIZE_RATIO,
+            max_age=REENCODE_MAX_AGE,
+            expiry_detections=IDENTITY_EXPIRY_DETECTIONS,
+        )
+        
+        # 依檢測耗時、CPU 預算與畫面活動量安排檢測時間
+        self.scheduler = AdaptiveDetectionScheduler(
+            cpu_budget=DETECTION_CPU_BUDGET,
+            min_interval=DETECTION_MIN_INTERVAL,
+            tracking_interval=TRACKING_RECOGNITION_INTERVAL,
+            idle_max_interval=DETECTION_IDLE_MAX_INTERVAL,
+            idle_backoff=DETECTION_IDLE_BACKOFF,
+            motion_threshold=MOTION_THRESHOLD,
+            buffers=self.buffers,
+        )
+        
+        # 只在有變化的區域與既有人臉附近執行 HOG
+        self.motion_regions = None
+        if MOTION_ROI_ENABLED:
+            self.motion_regions = MotionRegionDetector(pixel_threshold=MOTION_PIXEL_THRESHOLD, buffers=self.buffers)
+        self.last_full_frame_detection = None
+        
+        # 兩段式檢測：低解析度候選 + 高解析度 HOG 確認
+        self.coarse_detector = None
+        if CASCADE_ENABLED:
+            self.coarse_detector = create_coarse_detector(
+                CASCADE_COARSE_DETECTOR, face_handler, CASCADE_COARSE_SCALE,
+                upsample=CASCADE_COARSE_UPSAMPLE, model=CASCADE_COARSE_MODEL,
+                buffers=self.buffers)
         
         # 計數器
         self.frame_count = 0
         self.fps_start_time = time.time()
         self.current_fps = 0
     
+    @property
+    def friend_detected(self):
+        """是否有朋友位於觸發範圍內"""
+        return bool(self.triggers.active_labels)
+    
+    def close(self):
+        """停止觸發引擎，等待已送出的事件處理完畢"""
+        self.triggers.close()
+    
     def process_frame(self, frame):
         """
         處理單一畫面
@@ -44,14 +137,14 @@ class FriendDetector:
         self.frame_count += 1
         current_time = time.time()
         
-        # 決定是否執行檢測
-        should_detect = self._should_detect_this_frame()
-        
-        if should_detect:
-            self._detect_faces_in_frame(frame)
+        # 檢測或追蹤人臉
+        draw_faces = self.analyze_frame(frame)
         
-        # 繪製界面資訊
-        frame = self._draw_interface(frame)
+        # 繪製人臉與界面資訊
+        with self.timer.stage("overlay"):
+            if draw_faces:
+                self._draw_face_results(frame, self.face_results)
+            frame = self._draw_interface(frame)
         
         # 更新 FPS
         if self.frame_count % FPS_UPDATE_INTERVAL == 0:
@@ -59,91 +152,260 @@ class FriendDetector:
         
         return frame
     
-    def _should_detect_this_frame(self):
-        """判斷是否應該在此幀執行檢測"""
-        if self.friend_detected:
-            return (self.frame_count % 2 == 0)  # 檢測到朋友時更頻繁檢測
-        else:
-            return (self.frame_count % DETECTION_INTERVAL == 0)  # 未檢測到時降低頻率
+    def analyze_frame(self, frame):
+        """
+        依排程執行檢測，否則以追蹤更新人臉位置，不在畫面上繪製 (無視窗模式也使用)
+        
+        Args:
+            frame: 攝影機畫面 (不會被修改)
+        
+        Returns:
+            "detect" (執行檢測)、"track" (以追蹤更新) 或 None (沿用先前結果)；
+            不為 None 時 face_results 對應此幀
+        """
+        if self.should_detect(frame):
+            self.detect_faces(frame)
+            return "detect"
+        
+        self.timer.increment("frames_skipped")
+        return "track" if self.track_faces(frame) else None
+    
+    def detect_faces(self, frame):
+        """
+        執行人臉檢測並更新觸發狀態，不在畫面上繪製
+        
+        Args:
+            frame: 攝影機畫面 (不會被修改)
+        
+        Returns:
+            [(face_location, label, distance, is_friend), ...]
+        """
+        self.timer.increment("detections")
+        started = time.monotonic()
+        face_results = self._detect_faces_in_frame(frame)
+        self.scheduler.record_detection(started, time.monotonic() - started, bool(face_results))
+        if self.tracker is not None:
+            with self.timer.stage("track"):
+                self.tracker.reset(frame, face_results)
+        self.face_results = tuple(face_results)
+        return self.face_results
+    
+    def track_faces(self, frame):
+        """
+        在檢測間隔中以追蹤更新人臉位置，並持續檢查朋友的觸發距離
+        
+        Args:
+            frame: 攝影機畫面 (不會被修改)
+        
+        Returns:
+            face_results 是否已更新為此幀的追蹤結果
+        """
+        if self.tracker is None or not self.tracker.has_tracks:
+            return False
+        with self.timer.stage("track"):
+            self.face_results = tuple(self.tracker.update(frame))
+        self._observe_triggers(self.face_results, frame.shape)
+        return True
+    
+    def render_frame(self, frame):
+        """
+        在畫面上繪製最近一次的檢測結果與界面資訊 (管線模式的顯示端使用)
+        
+        只讀取 face_results 快照，追蹤與觸發狀態一律由檢測執行緒更新
+        
+        Args:
+            frame: 攝影機畫面
+        
+        Returns:
+            處理後的畫面
+        """
+        self.frame_count += 1
+        current_time = time.time()
+        
+        face_results = self.face_results
+        with self.timer.stage("overlay"):
+            self._draw_face_results(frame, face_results)
+            frame = self._draw_interface(frame)
+        
+        if self.frame_count % FPS_UPDATE_INTERVAL == 0:
+            self._update_fps(current_time)
+        
+        return frame
+    
+    def should_detect(self, frame):
+        """
+        判斷是否應該在此幀執行檢測
+        
+        Args:
+            frame: 攝影機畫面 (用於估計畫面活動量，不會被修改)
+        
+        Returns:
+            是否執行檢測
+        """
+        with self.timer.stage("motion"):
+            self.scheduler.observe(frame)
+        
+        tracking = self.tracker is not None and self.tracker.has_tracks
+        if self.tracker is not None and (tracking or self.tracker.lost) and self.tracker.needs_recognition():
+            # 追蹤信心度下降或追蹤遺失時立即重新識別
+            return True
+        faces_present = bool(self.face_results) or self.friend_detected
+        return self.scheduler.should_detect(faces_present, tracking)
     
     def _detect_faces_in_frame(self, frame):
-        """在畫面中檢測人臉"""
-        # 縮小幀以提高處理速度
-        small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-        
-        # 檢測人臉位置
-        face_locations = self.face_handler.recognize_faces(rgb_small_frame)[0]
-        
-        friend_found_this_frame = False
-        
-        if face_locations:
-            # 轉換座標到原始尺寸
-            face_locations = [(int(top * 2), int(right * 2), int(bottom * 2), int(left * 2))
-                            for (top, right, bottom, left) in face_locations]
-            
-            # 獲取完整解析度的人臉編碼
-            _, _, face_distances_list = self.face_handler.recognize_faces(frame)
-            
-            for i, (face_location, face_distances) in enumerate(zip(face_locations, face_distances_list)):
-                if len(face_distances) > 0:
-                    min_distance = min(face_distances)
-                    is_friend = min_distance < CONFIDENCE_THRESHOLD
-                    
-                    # 繪製人臉框和資訊
-                    self._draw_face_info(frame, face_location, min_distance, is_friend)
-                    
-                    if is_friend:
-                        friend_found_this_frame = True
-                        self._handle_friend_detection(face_location, frame.shape)
-        
-        # 處理朋友離開邏輯
-        self._handle_friend_absence(friend_found_this_frame)
-    
-    def _draw_face_info(self, frame, face_location, distance, is_friend):
-        """繪製人臉框和資訊"""
+        """在畫面中檢測人臉並返回檢測結果"""
+        # 每個縮放比例的 RGB 畫面只轉換一次，檢測與編碼共用
+        rgb_frames = {}
+        
+        # 可行時限縮到動態區域
+        regions = self._detection_regions(frame)
+        with self.timer.stage("detect"):
+            face_locations = self._locate_faces(frame, regions, rgb_frames)
+        
+        face_results = []
+        
+        # 沒有人臉時也要關聯，讓離開畫面的身分追蹤依檢測次數過期
+        tracks = self.identities.associate(face_locations)
+        now = time.monotonic()
+        
+        # 只針對新出現、移動、縮放或編碼過舊的人臉計算編碼
+        stale = [i for i, track in enumerate(tracks) if self.identities.needs_encoding(track, now)]
+        self.timer.increment("encodings_reused", len(tracks) - len(stale))
+        if stale:
+            with self.timer.stage("encode"):
+                rgb_encode_frame = self._rgb_frame(frame, ENCODING_SCALE, rgb_frames)
+                encode_locations = scale_face_locations([face_locations[i] for i in stale], ENCODING_SCALE)
+                face_encodings = self.face_handler.encode_faces(rgb_encode_frame, encode_locations)
+            with self.timer.stage("match"):
+                matches = self.face_handler.match_identities(face_encodings)
+            for i, encoding, (label, min_distance) in zip(stale, face_encodings, matches):
+                self.identities.add_observation(tracks[i], encoding, label, min_distance, now)
+        
+        for face_location, track in zip(face_locations, tracks):
+            # 以最近數次編碼的投票結果判定身分，避免單幀誤判觸發
+            label, distance, is_friend = self.identities.identity(track)
+            face_results.append((face_location, label, distance, is_friend))
+        
+        self._observe_triggers(face_results, frame.shape)
+        return face_results
+    
+    def _locate_faces(self, frame, regions, rgb_frames):
+        """
+        檢測人臉位置
+        
+        Args:
+            frame: 攝影機畫面 (BGR)
+            regions: 原始畫面座標的候選區域，None 表示整張畫面
+            rgb_frames: {縮放比例: RGB 畫面} 快取
+        
+        Returns:
+            原始畫面座標的人臉位置列表
+        """
+        if self.coarse_detector is None:
+            # 單段：在 DETECTION_SCALE 畫面上執行 HOG
+            rgb_small_frame = self._rgb_frame(frame, DETECTION_SCALE, rgb_frames)
+            if regions is None:
+                small_locations = self.face_handler.detect_faces(rgb_small_frame, upsample=DETECTION_UPSAMPLE)
+            else:
+                small_locations = self.face_handler.detect_faces_in_regions(
+                    rgb_small_frame, scale_face_locations(regions, DETECTION_SCALE), upsample=DETECTION_UPSAMPLE)
+            return scale_face_locations(small_locations, 1.0 / DETECTION_SCALE)
+        
+        # 兩段：低解析度候選，再於較高解析度的候選區塊上以 HOG 確認
+        with self.timer.stage("coarse"):
+            candidates = self.coarse_detector.detect(frame)
+        if regions is not None:
+            candidates = [c for c in candidates if any(regions_overlap(c, r) for r in regions)]
+        self.timer.increment("cascade_candidates", len(candidates))
+        if not candidates:
+            return []
+        
+        crops = pad_regions(candidates, frame.shape, CASCADE_CROP_PADDING, CASCADE_CROP_MIN_SIZE)
+        crops = merge_regions(crops)
+        rgb_confirm_frame = self._rgb_frame(frame, CASCADE_CONFIRM_SCALE, rgb_frames)
+        confirm_locations = self.face_handler.detect_faces_in_regions(
+            rgb_confirm_frame, scale_face_locations(crops, CASCADE_CONFIRM_SCALE),
+            upsample=CASCADE_CONFIRM_UPSAMPLE)
+        return scale_face_locations(confirm_locations, 1.0 / CASCADE_CONFIRM_SCALE)
+    
+    def _rgb_frame(self, frame, scale, rgb_frames):
+        """取得 (或建立) 指定縮放比例的 RGB 畫面 (寫入緩衝池，下次檢測前有效)"""
+        rgb_frame = rgb_frames.get(scale)
+        if rgb_frame is None:
+            with self.timer.stage("resize"):
+                if scale != 1:
+                    frame = self.buffers.resize(f"detect_{scale}", frame, scale=scale)
+                rgb_frame = self.buffers.cvt_color(f"detect_rgb_{scale}", frame, cv2.COLOR_BGR2RGB)
+            rgb_frames[scale] = rgb_frame
+        return rgb_frame
+    
+    def _detection_regions(self, frame):
+        """
+        計算本次檢測的候選區域 (原始畫面座標)
+        
+        Returns:
+            區域列表；需要整張畫面檢測時返回 None
+        """
+        if self.motion_regions is None:
+            return None
+        
+        with self.timer.stage("motion_roi"):
+            regions = self.motion_regions.update(frame)
+        
+        # 定期整張畫面檢測，找回靜止不動且未被追蹤的人臉
+        now = time.monotonic()
+        if (self.last_full_frame_detection is None
+                or now - self.last_full_frame_detection >= MOTION_ROI_FULL_FRAME_INTERVAL):
+            self.last_full_frame_detection = now
+            self.timer.increment("full_frame_detections")
+            return None
+        
+        # 加入上次檢測或追蹤到的人臉位置
+        regions = regions + [face_location for face_location, _, _, _ in self.face_results]
+        regions = pad_regions(regions, frame.shape, MOTION_ROI_PADDING, MOTION_ROI_MIN_SIZE)
+        regions = merge_regions(regions)
+        
+        # 變化範圍太大時直接整張檢測較省事
+        if regions_area(regions) > MOTION_ROI_MAX_AREA * frame.shape[0] * frame.shape[1]:
+            self.last_full_frame_detection = now
+            self.timer.increment("full_frame_detections")
+            return None
+        
+        self.timer.increment("roi_detections")
+        return regions
+    
+    def _draw_face_results(self, frame, face_results):
+        """繪製所有人臉框和資訊"""
+        for face_location, label, distance, is_friend in face_results:
+            self._draw_face_info(frame, face_location, label, distance, is_friend)
+    
+    def _draw_face_info(self, frame, face_location, label, distance, is_friend):
+        """繪製人臉框和資訊 (直接修改 frame)"""
         top, right, bottom, left = face_location
         
         if is_friend:
             # 朋友 - 綠色框
             cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            info_text = f"{FRIEND_NAME} ({distance:.3f})"
+            info_text = f"{label} ({distance:.3f})"
             color = (0, 255, 0)
         else:
             # 陌生人 - 紅色框
             cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
-            info_text = f"Unknown ({distance:.3f})"
+            # 尚未有任何比對結果 (例如特徵庫為空) 時只顯示 Unknown
+            info_text = "Unknown" if distance is None else f"Unknown ({distance:.3f})"
             color = (0, 0, 255)
         
-        frame = cv2_puttext_chinese(frame, info_text, (left, top - 30), 15, color)
-        return frame
+        # 人臉框上方空間不足時改畫在框下方
+        label_y = top - 30 if top >= 30 else bottom + 5
+        self.overlay.draw_text(frame, info_text, (left, label_y), 15, color)
     
-    def _handle_friend_detection(self, face_location, frame_shape):
-        """處理檢測到朋友的邏輯"""
-        # 計算臉部中心距離
-        distance = calculate_face_center_distance(face_location, frame_shape)
-        
-        # 如果朋友在觸發距離內且影片未播放，開始播放
-        if distance < TRIGGER_DISTANCE and not self.video_player.is_playing:
-            self.video_player.play()
-            print(f"🎉 檢測到 {FRIEND_NAME}！開始播放影片")
-        
-        # 更新檢測狀態
-        if distance < TRIGGER_DISTANCE:
-            self.friend_detected = True
-            self.no_friend_frames = 0
-    
-    def _handle_friend_absence(self, friend_found_this_frame):
-        """處理朋友離開的邏輯"""
-        if self.friend_detected:
-            if not friend_found_this_frame:
-                self.no_friend_frames += 1
-                if self.no_friend_frames >= NO_FRIEND_FRAMES_THRESHOLD:
-                    self.friend_detected = False
-                    self.no_friend_frames = 0
-                    print(f"👋 {FRIEND_NAME} 已離開")
-            else:
-                self.no_friend_frames = 0
+    def _observe_triggers(self, face_results, frame_shape):
+        """將位於觸發距離內的朋友交給觸發引擎 (不會阻塞)"""
+        labels = {
+            label for face_location, label, _, is_friend in face_results
+            if is_friend and calculate_face_center_distance(face_location, frame_shape) < TRIGGER_DISTANCE
+        }
+        self.triggers.observe(labels)
     
     def _draw_interface(self, frame):
         """繪製界面資訊"""
@@ -151,17 +413,19 @@ class FriendDetector:
         status = "檢測中" if self.friend_detected else "監控中"
         video_status = "播放中" if self.video_player.is_playing else "待機"
         status_text = f"狀態: {status} | 影片: {video_status}"
-        frame = cv2_puttext_chinese(frame, status_text, (10, 30), 20, (255, 255, 255))
+        self.overlay.add_text(status_text, (10, 30), 20, (255, 255, 255))
         
         # FPS 顯示
         if self.current_fps > 0:
             fps_text = f"FPS: {int(self.current_fps)}"
-            frame = cv2_puttext_chinese(frame, fps_text, (frame.shape[1] - 120, 30), 15, (255, 255, 255))
+            self.overlay.add_text(fps_text, (frame.shape[1] - 120, 30), 15, (255, 255, 255))
         
-        return frame
+        # 一次合成本幀所有文字
+        return self.overlay.flush(frame)
     
     def _update_fps(self, current_time):
         """更新 FPS 計算"""
         time_diff = current_time - self.fps_start_time + 0.001
         self.current_fps = FPS_UPDATE_INTERVAL / time_diff
-        self.fps_start_time = current_time
\ No newline at end of file
+        self.fps_start_time = current_time
+
@@ -0,0 +1,175 @@
+from collections import Counter, deque
+import numpy as np
+
+
+class IdentityTrack:
+    """跨檢測延續的人臉身分狀態：快取最近一次編碼並累積身分投票"""
+
+    def __init__(self, box, vote_window):
+        """
+        初始化身分追蹤
+
+        Args:
+            box: 人臉位置 (top, right, bottom, left)
+            vote_window: 保留的最近投票數量
+        """
+        self.box = box
+        self.encoded_box = None
+        self.encoding = None
+        self.encoded_at = None
+        self.missed = 0
+        self.nearest_label = None
+        self.distance = None
+        self.votes = deque(maxlen=vote_window)
+
+    def add_observation(self, box, encoding, label, distance, now, threshold, distance_ema):
+        """
+        加入一次新計算的編碼與比對結果
+
+        Args:
+            box: 計算編碼時的人臉位置
+            encoding: 人臉編碼
+            label: 最接近的身分標籤
+            distance: 與該身分的距離
+            now: 目前的單調時鐘時間
+            threshold: 視為同一人的距離門檻
+            distance_ema: 距離估計的平滑係數 (0-1，越大越重視最新結果)
+        """
+        self.encoded_box = box
+        self.encoding = encoding
+        self.encoded_at = now
+        self.nearest_label = label
+        if self.distance is None:
+            self.distance = distance
+        else:
+            self.distance = distance_ema * distance + (1 - distance_ema) * self.distance
+        self.votes.append(label if label is not None and distance < threshold else None)
+
+    def voted_label(self, min_votes):
+        """
+        最近投票中達到 min_votes 票的身分
+
+        Returns:
+            身分標籤，沒有身分達到票數時返回 None
+        """
+        counts = Counter(label for label in self.votes if label is not None)
+        if not counts:
+            return None
+        label, count = counts.most_common(1)[0]
+        return label if count >= min_votes else None
+
+
+class IdentityTracker:
+    """以位置關聯檢測結果與身分追蹤，只在人臉移動、縮放或編碼過舊時重新編碼"""
+
+    def __init__(self, threshold, vote_window=5, min_votes=2, distance_ema=0.5,
+                 match_iou=0.3, move_ratio=0.25, resize_ratio=0.2, max_age=2.0, expiry_detections=2):
+        """
+        初始化身分追蹤器
+
+        Args:
+            threshold: 視為同一人的距離門檻
+            vote_window: 每個追蹤保留的最近投票數量
+            min_votes: 判定身分所需的票數
+            distance_ema: 距離估計的平滑係數
+            match_iou: 檢測框與追蹤關聯所需的最小 IoU
+            move_ratio: 中心位移超過人臉寬度此比例時重新編碼
+            resize_ratio: 人臉大小變化超過此比例時重新編碼
+            max_age: 編碼超過此秒數時重新編碼
+            expiry_detections: 連續此次數的檢測都未關聯到的追蹤會被移除 (以檢測次數計，不受檢測間隔影響)
+        """
+        self.threshold = threshold
+        self.vote_window = vote_window
+        self.min_votes = min_votes
+        self.distance_ema = distance_ema
+        self.match_iou = match_iou
+        self.move_ratio = move_ratio
+        self.resize_ratio = resize_ratio
+        self.max_age = max_age
+        self.expiry_detections = expiry_detections
+        self.tracks = []
+
+    def associate(self, face_locations):
+        """
+        將本次檢測到的人臉關聯到既有追蹤，無法關聯的建立新追蹤
+
+        每次檢測都需呼叫 (沒有人臉時傳入空列表)，追蹤以未關聯的檢測次數老化
+
+        Args:
+            face_locations: 人臉位置列表 [(top, right, bottom, left), ...]
+
+        Returns:
+            與 face_locations 對應的追蹤列表
+        """
+        # 依 IoU 由大到小貪婪配對
+        pairs = sorted(((_iou(location, track.box), i, j)
+                        for i, location in enumerate(face_locations)
+                        for j, track in enumerate(self.tracks)), reverse=True)
+        assigned = [None] * len(face_locations)
+        used = set()
+        for iou, i, j in pairs:
+            if iou < self.match_iou:
+                break
+            if assigned[i] is None and j not in used:
+                assigned[i] = self.tracks[j]
+                used.add(j)
+
+        for j, track in enumerate(self.tracks):
+            track.missed = 0 if j in used else track.missed + 1
+        self.tracks = [track for track in self.tracks if track.missed < self.expiry_detections]
+
+        for i, location in enumerate(face_locations):
+            if assigned[i] is None:
+                assigned[i] = IdentityTrack(location, self.vote_window)
+                self.tracks.append(assigned[i])
+            assigned[i].box = location
+        return assigned
+
+    def needs_encoding(self, track, now):
+        """
+        判斷追蹤是否需要重新計算編碼
+
+        Args:
+            track: 身分追蹤
+            now: 目前的單調時鐘時間
+        """
+        # 尚未累積足夠票數前每次都重新編碼，讓身分盡快確定
+        if track.encoding is None or len(track.votes) < self.min_votes:
+            return True
+        if now - track.encoded_at > self.max_age:
+            return True
+
+        top, right, bottom, left = track.box
+        old_top, old_right, old_bottom, old_left = track.encoded_box
+        width = max(old_right - old_left, 1)
+        shift = np.hypot((left + right - old_left - old_right) / 2, (top + bottom - old_top - old_bottom) / 2)
+        if shift > self.move_ratio * width:
+            return True
+        return abs((right - left) / width - 1) > self.resize_ratio
+
+    def add_observation(self, track, encoding, label, distance, now):
+        """記錄追蹤新計算的編碼與比對結果"""
+        track.add_observation(track.box, encoding, label, distance, now, self.threshold, self.distance_ema)
+
+    def identity(self, track):
+        """
+        取得追蹤目前的身分判定
+
+        Returns:
+            (身分標籤, 平滑後的距離, 是否為已註冊身分)
+        """
+        label = track.voted_label(self.min_votes)
+        if label is not None:
+            return label, track.distance, True
+        return track.nearest_label, track.distance, False
+
+
+def _iou(a, b):
+    """兩個 (top, right, bottom, left) 框的交集比聯集"""
+    inter_h = min(a[2], b[2]) - max(a[0], b[0])
+    inter_w = min(a[1], b[1]) - max(a[3], b[3])
+    if inter_h <= 0 or inter_w <= 0:
+        return 0.0
+    inter = inter_h * inter_w
+    union = (a[2] - a[0]) * (a[1] - a[3]) + (b[2] - b[0]) * (b[1] - b[3]) - inter
+    return inter / union
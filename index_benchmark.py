@@ -0,0 +1,93 @@
+import argparse
+import time
+import numpy as np
+from face_gallery import FaceGallery, ENCODING_DIM
+from face_index import BruteForceIndex, IVFIndex
+
+
+def make_synthetic_gallery(num_identities, per_identity, seed=0):
+    """
+    產生模擬人臉編碼分佈的合成特徵庫
+
+    身分中心間距約 0.8，同一身分內距離約 0.5，與 dlib 編碼的距離尺度相近。
+
+    Returns:
+        (gallery, queries, query_labels)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0.0, 0.05, size=(num_identities, ENCODING_DIM))
+    labels = np.repeat(np.arange(num_identities), per_identity)
+    encodings = centers[labels] + rng.normal(0.0, 0.03, size=(len(labels), ENCODING_DIM))
+
+    query_labels = rng.integers(0, num_identities, size=200)
+    queries = centers[query_labels] + rng.normal(0.0, 0.03, size=(len(query_labels), ENCODING_DIM))
+
+    gallery = FaceGallery(encodings, labels=labels.tolist())
+    return gallery, queries.astype(np.float32), query_labels
+
+
+def evaluate_index(index, reference, queries, query_labels, k=1):
+    """
+    以暴力搜尋為基準評估索引
+
+    Args:
+        index: 待評估索引
+        reference: 暴力搜尋的 (distances, indices) 結果
+        queries: 查詢編碼
+        query_labels: 查詢的真實身分
+        k: 鄰居數量
+
+    Returns:
+        {"recall": 最近鄰召回率, "identity_accuracy": 身分正確率, "ms_per_query": 平均延遲}
+    """
+    start = time.perf_counter()
+    for query in queries:
+        index.search([query], k=k)
+    elapsed = time.perf_counter() - start
+
+    _, indices = index.search(queries, k=k)
+    _, ref_indices = reference
+    recall = np.mean([len(set(found) & set(expected)) / k
+                      for found, expected in zip(indices, ref_indices)])
+    labels = np.asarray(index.gallery.labels)
+    identity_accuracy = np.mean(labels[indices[:, 0]] == query_labels)
+
+    return {
+        "recall": float(recall),
+        "identity_accuracy": float(identity_accuracy),
+        "ms_per_query": elapsed / len(queries) * 1000,
+    }
+
+
+def main():
+    """比較暴力搜尋與 IVF 在不同特徵庫大小下的召回率與延遲"""
+    parser = argparse.ArgumentParser(description="人臉索引召回率與延遲測試")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 100000])
+    parser.add_argument("--per-identity", type=int, default=50)
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--k", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'編碼數':>8} {'索引':>10} {'召回率':>8} {'身分正確':>8} {'ms/查詢':>10} {'建立秒數':>8}")
+    for size in args.sizes:
+        num_identities = max(1, size // args.per_identity)
+        gallery, queries, query_labels = make_synthetic_gallery(num_identities, args.per_identity)
+
+        brute = BruteForceIndex(gallery)
+        reference = brute.search(queries, k=args.k)
+        result = evaluate_index(brute, reference, queries, query_labels, k=args.k)
+        print(f"{len(gallery):>8} {'brute':>10} {result['recall']:>8.3f} "
+              f"{result['identity_accuracy']:>8.3f} {result['ms_per_query']:>10.3f} {0.0:>8.2f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex(gallery).train()
+        build_seconds = time.perf_counter() - start
+        for num_probes in args.probes:
+            ivf.num_probes = num_probes
+            result = evaluate_index(ivf, reference, queries, query_labels, k=args.k)
+            print(f"{len(gallery):>8} {f'ivf/{num_probes}':>10} {result['recall']:>8.3f} "
+                  f"{result['identity_accuracy']:>8.3f} {result['ms_per_query']:>10.3f} {build_seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
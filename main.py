@@ -1,9 +1,17 @@
 import cv2
 import time
-from config import IMAGE_PATHS, VIDEO_PATH, CAMERA_WIDTH, CAMERA_HEIGHT
-from face_recognition_handler import FaceRecognitionHandler
-from video_player import VideoPlayer
-from friend_detector import FriendDetector
+from config import (
+    KNOWN_PEOPLE, VIDEO_PATH, CAMERA_WIDTH, CAMERA_HEIGHT, USE_PIPELINE, PIPELINE_STATS_INTERVAL,
+    METRICS_HTTP_HOST, METRICS_HTTP_PORT, METRICS_LOG_INTERVAL, METRICS_LOG_FILE, FAST_START
+)
+from pipeline import FramePipeline
+from metrics import MetricsRegistry, MetricsServer, MetricsLogger
+from startup import StartupProfile, BackgroundLoader
+
+# face_recognition (dlib 模型)、pyautogui 與 PIL 載入較慢，於 load_components 中才匯入
+
+
+WINDOW_NAME = "Friend Detector"
 
 
 def initialize_camera():
@@ -30,57 +38,174 @@ def initialize_camera():
     
     return cap
 
-def main():
-    """主程式"""
-    print("🚀 朋友檢測系統啟動中...")
+def run_sequential(cap, detector):
+    """
+    單執行緒模式：依序擷取、處理並顯示畫面
+    
+    Args:
+        cap: 攝影機物件
+        detector: 朋友檢測器
+    """
+    timer = detector.timer
+    frame = None
+    while True:
+        # 重複使用上一幀的記憶體 (畫面已顯示完畢)
+        with timer.stage("capture"):
+            ret, frame = cap.read(frame)
+        if not ret:
+            print("無法讀取攝影機畫面")
+            time.sleep(0.1)
+            continue
+
+        # 處理畫面
+        processed_frame = detector.process_frame(frame)
+        
+        # 顯示畫面
+        with timer.stage("display"):
+            cv2.imshow(WINDOW_NAME, processed_frame)
+            key = cv2.waitKey(1) & 0xFF
+        
+        # 檢查退出鍵
+        if key == ord('q'):
+            break
+
+
+def start_metrics_exporters(registry):
+    """
+    依設定啟動指標 HTTP 端點與定期 JSON 紀錄
+    
+    Args:
+        registry: 指標註冊表
+    
+    Returns:
+        已啟動的匯出器列表
+    """
+    exporters = []
+    if METRICS_HTTP_PORT:
+        try:
+            exporters.append(MetricsServer(registry, METRICS_HTTP_HOST, METRICS_HTTP_PORT))
+        except OSError as e:
+            print(f"指標端點啟動失敗: {e}")
+    if METRICS_LOG_INTERVAL > 0:
+        exporters.append(MetricsLogger(registry, METRICS_LOG_INTERVAL, METRICS_LOG_FILE or None))
+    for exporter in exporters:
+        exporter.start()
+    return exporters
+
+
+def load_components(metrics, profile):
+    """
+    載入人臉模型、特徵編碼、影片播放器與朋友檢測器 (可在背景執行緒執行)
+    
+    Args:
+        metrics: 指標註冊表
+        profile: 啟動時間紀錄
+    
+    Returns:
+        (朋友檢測器, 影片播放器)，有效照片不足時返回 None
+    """
+    with profile.step("載入模型"):
+        from face_recognition_handler import FaceRecognitionHandler
     
     # 初始化人臉識別處理器
     print("正在初始化臉部特徵數據庫...")
-    face_handler = FaceRecognitionHandler()
-    known_face_encodings = face_handler.load_or_create_encodings(IMAGE_PATHS)
+    with profile.step("特徵編碼"):
+        face_handler = FaceRecognitionHandler()
+        known_face_encodings = face_handler.load_or_create_encodings(KNOWN_PEOPLE)
     
     # 檢查編碼數量
-    if not known_face_encodings or len(known_face_encodings) < 3:
+    if len(known_face_encodings) < 3:
         print("錯誤: 需要至少3張有效朋友照片才能運行！")
         print("請檢查:")
         print("1. 圖片路徑是否正確")
         print("2. 圖片中是否有清楚的人臉")
         print("3. 圖片格式是否支援")
-        return
+        return None
+    
+    # 初始化影片播放器與朋友檢測器
+    with profile.step("影片與檢測器"):
+        from video_player import VideoPlayer
+        from friend_detector import FriendDetector
+        video_player = VideoPlayer(VIDEO_PATH)
+        detector = FriendDetector(face_handler, video_player, timer=metrics)
+    
+    return detector, video_player
+
+
+def show_preview_until_ready(cap, loader, profile):
+    """
+    載入期間先顯示攝影機預覽畫面
+    
+    Args:
+        cap: 攝影機物件
+        loader: 背景載入器
+        profile: 啟動時間紀錄
+    
+    Returns:
+        載入完成時返回 True，使用者按下 'q' 時返回 False
+    """
+    first_frame = True
+    while not loader.ready:
+        ret, frame = cap.read()
+        if not ret:
+            time.sleep(0.05)
+            continue
+        
+        if first_frame:
+            profile.mark("首幀顯示")
+            first_frame = False
+        
+        # 預覽階段不載入 PIL，以 OpenCV 內建字體顯示狀態
+        cv2.putText(frame, "Loading face models...", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.imshow(WINDOW_NAME, frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            return False
+    return True
 
-    # 初始化影片播放器
-    video_player = VideoPlayer(VIDEO_PATH)
+
+def main():
+    """主程式"""
+    profile = StartupProfile()
+    print("🚀 朋友檢測系統啟動中...")
     
-    # 初始化攝影機
-    cap = initialize_camera()
+    # 先開啟攝影機，讓預覽畫面可以立即顯示
+    with profile.step("攝影機"):
+        cap = initialize_camera()
     if cap is None:
         return
     
-    # 初始化朋友檢測器
-    detector = FriendDetector(face_handler, video_player)
-    
-    # 主要檢測循環
-    print("系統已啟動！")
-    print("按 'q' 退出")
-    print("影片播放時按 ESC 可關閉影片")
+    # 初始化指標
+    metrics = MetricsRegistry()
+    exporters = start_metrics_exporters(metrics)
+    detector = None
+    video_player = None
     
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("無法讀取攝影機畫面")
-                time.sleep(0.1)
-                continue
-
-            # 處理畫面
-            processed_frame = detector.process_frame(frame)
-            
-            # 顯示畫面
-            cv2.imshow("Friend Detector", processed_frame)
-            
-            # 檢查退出鍵
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        if FAST_START:
+            # 模型與編碼於背景載入，載入期間顯示預覽
+            loader = BackgroundLoader(load_components, metrics, profile).start()
+            if not show_preview_until_ready(cap, loader, profile):
+                return
+            components = loader.wait()
+        else:
+            components = load_components(metrics, profile)
+        if components is None:
+            return
+        detector, video_player = components
+        
+        profile.report()
+        metrics.record("startup", profile.elapsed())
+        
+        # 主要檢測循環
+        print("系統已啟動！")
+        print("按 'q' 退出")
+        print("影片播放時按 ESC 可關閉影片")
+        
+        if USE_PIPELINE:
+            FramePipeline(cap, detector, window_name=WINDOW_NAME, stats_interval=PIPELINE_STATS_INTERVAL).run()
+        else:
+            run_sequential(cap, detector)
 
     except KeyboardInterrupt:
         print("\n程式被用戶中斷")
@@ -89,12 +214,16 @@ def main():
     finally:
         # 清理資源
         print("正在清理資源...")
-        if video_player.is_playing:
+        if detector is not None:
+            detector.close()
+        if video_player is not None and video_player.is_playing:
             video_player.stop()
+        for exporter in exporters:
+            exporter.stop()
         cap.release()
         cv2.destroyAllWindows()
         print("程式已安全關閉")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
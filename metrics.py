@@ -0,0 +1,342 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+
+# 直方圖的區間上限 (秒)
+DEFAULT_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+
+
+class StageTimer:
+    """記錄各處理階段的耗時"""
+
+    def __init__(self):
+        """初始化計時器"""
+        self.samples = defaultdict(list)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        計時一個處理階段
+
+        Args:
+            name: 階段名稱
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        """直接記錄一筆耗時"""
+        self.samples[name].append(seconds)
+
+    def increment(self, name, amount=1):
+        """累加計數器"""
+        self.counters[name] += amount
+
+    def summary(self):
+        """
+        彙整各階段耗時
+
+        Returns:
+            {階段名稱: {count, total_ms, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}
+        """
+        return {name: summarize_durations(samples) for name, samples in self.samples.items()}
+
+
+class NullTimer:
+    """不記錄任何資料的計時器，作為預設值避免額外開銷"""
+
+    def stage(self, name):
+        return nullcontext()
+
+    def record(self, name, seconds):
+        pass
+
+    def increment(self, name, amount=1):
+        pass
+
+
+class Histogram:
+    """固定區間的耗時直方圖 (執行緒安全)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        初始化直方圖
+
+        Args:
+            buckets: 各區間上限 (秒，遞增)
+        """
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        """記錄一筆耗時"""
+        index = len(self.buckets)
+        for i, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                index = i
+                break
+        with self.lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def snapshot(self):
+        """
+        取得目前數值
+
+        Returns:
+            {"count", "sum", "buckets": [(上限, 累積次數), ...]}
+        """
+        with self.lock:
+            cumulative = np.cumsum(self.bucket_counts).tolist()
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "buckets": list(zip(self.buckets + (float("inf"),), cumulative)),
+            }
+
+
+class MetricsRegistry:
+    """執行期指標：各階段耗時直方圖與事件計數器，介面與 StageTimer 相容"""
+
+    def __init__(self, prefix="friend_detector"):
+        """
+        初始化指標註冊表
+
+        Args:
+            prefix: Prometheus 指標名稱前綴
+        """
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        計時一個處理階段
+
+        Args:
+            name: 階段名稱
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        """記錄一筆階段耗時"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        histogram.observe(seconds)
+
+    def increment(self, name, amount=1):
+        """累加計數器"""
+        with self.lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        """
+        取得所有指標的目前數值
+
+        Returns:
+            可序列化為 JSON 的字典
+        """
+        with self.lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+
+        stages = {}
+        for name, histogram in histograms.items():
+            data = histogram.snapshot()
+            stages[name] = {
+                "count": data["count"],
+                "mean_ms": data["sum"] / data["count"] * 1000 if data["count"] else 0.0,
+                "buckets_ms": {("+Inf" if upper == float("inf") else f"{upper * 1000:g}"): count
+                               for upper, count in data["buckets"]},
+            }
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": time.time() - self.start_time,
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def render_prometheus(self):
+        """
+        以 Prometheus 文字格式輸出所有指標
+
+        Returns:
+            指標文字
+        """
+        with self.lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+
+        metric = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {metric} Processing time per pipeline stage.",
+                 f"# TYPE {metric} histogram"]
+        for name in sorted(histograms):
+            data = histograms[name].snapshot()
+            for upper, count in data["buckets"]:
+                le = "+Inf" if upper == float("inf") else f"{upper:g}"
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {data["sum"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {data["count"]}')
+
+        for name in sorted(counters):
+            counter = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {counter} counter")
+            lines.append(f"{counter} {counters[name]}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """在本機提供 Prometheus 文字格式的 /metrics 端點"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9108):
+        """
+        初始化指標伺服器
+
+        Args:
+            registry: 指標註冊表
+            host: 監聽位址
+            port: 監聽埠號
+        """
+        handler = _make_metrics_handler(registry)
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        """於背景執行緒開始服務"""
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        print(f"📈 指標端點: http://{host}:{port}/metrics")
+
+    def stop(self):
+        """停止服務"""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsLogger:
+    """定期將指標快照寫入 JSON Lines 檔案 (或輸出到終端機)"""
+
+    def __init__(self, registry, interval, path=None):
+        """
+        初始化指標紀錄器
+
+        Args:
+            registry: 指標註冊表
+            interval: 紀錄間隔 (秒)
+            path: JSON Lines 檔案路徑，None 表示輸出到終端機
+        """
+        self.registry = registry
+        self.interval = interval
+        self.path = path
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """於背景執行緒開始紀錄"""
+        self.thread.start()
+
+    def stop(self):
+        """停止紀錄並寫入最後一筆快照"""
+        self.stop_event.set()
+        self.thread.join(timeout=1)
+        self._write()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        line = json.dumps(self.registry.snapshot(), ensure_ascii=False)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        else:
+            print(f"📈 {line}")
+
+
+def _make_metrics_handler(registry):
+    """建立綁定註冊表的 HTTP 處理類別"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 不在終端機輸出每次請求
+            pass
+
+    return MetricsHandler
+
+
+def summarize_durations(samples):
+    """
+    計算耗時統計
+
+    Args:
+        samples: 耗時列表 (秒)
+
+    Returns:
+        統計資料字典 (毫秒)
+    """
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    if len(values) == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(len(values)),
+        "total_ms": float(values.sum()),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max()),
+    }
+
+
+def peak_rss_mb():
+    """
+    取得本行程的最大常駐記憶體
+
+    Returns:
+        MB，平台不支援時返回 None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 單位為 KB，macOS 為 bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
@@ -0,0 +1,124 @@
+import cv2
+import numpy as np
+from frame_buffers import FrameBufferPool
+
+
+class MotionRegionDetector:
+    """以背景相減找出畫面中有變化的區域，作為人臉檢測的候選範圍"""
+
+    def __init__(self, size=(160, 120), learning_rate=0.05, pixel_threshold=25, min_area=4, buffers=None):
+        """
+        初始化動態區域檢測器
+
+        Args:
+            size: 背景模型使用的縮圖尺寸 (寬, 高)
+            learning_rate: 背景模型的更新速率 (0-1)
+            pixel_threshold: 視為變化的灰階差異 (0-255)
+            min_area: 縮圖中忽略小於此面積的變化區域 (像素)
+            buffers: 共用的影像緩衝池，預設建立自己的
+        """
+        self.size = size
+        self.learning_rate = learning_rate
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.background = None
+        self.buffers = buffers or FrameBufferPool()
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    def update(self, frame):
+        """
+        更新背景模型並返回有變化的區域
+
+        Args:
+            frame: 攝影機畫面 (BGR)
+
+        Returns:
+            原始畫面座標的區域列表 [(top, right, bottom, left), ...]
+        """
+        small = self.buffers.resize("motion", frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = self.buffers.cvt_color("motion_gray", small, cv2.COLOR_BGR2GRAY, channels=1)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0, dst=self.buffers.get("motion_blur", gray.shape))
+
+        if self.background is None:
+            self.background = gray.astype(np.float32)
+            return []
+
+        diff = self.buffers.get("motion_diff", gray.shape)
+        cv2.convertScaleAbs(self.background, dst=diff)
+        cv2.absdiff(gray, diff, dst=diff)
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=diff)
+        mask = cv2.dilate(mask, self.kernel, dst=self.buffers.get("motion_mask", gray.shape), iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        scale_x = frame.shape[1] / self.size[0]
+        scale_y = frame.shape[0] / self.size[1]
+        regions = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h < self.min_area:
+                continue
+            regions.append((int(y * scale_y), int((x + w) * scale_x),
+                            int((y + h) * scale_y), int(x * scale_x)))
+        return regions
+
+
+def pad_regions(regions, frame_shape, padding=0.5, min_size=0):
+    """
+    擴大區域並裁切到畫面範圍內
+
+    Args:
+        regions: 區域列表 [(top, right, bottom, left), ...]
+        frame_shape: 畫面形狀 (高, 寬, ...)
+        padding: 每邊擴大的比例 (相對於區域寬高)
+        min_size: 區域的最小邊長 (像素)
+
+    Returns:
+        擴大後的區域列表
+    """
+    height, width = frame_shape[:2]
+    padded = []
+    for top, right, bottom, left in regions:
+        pad_x = max((right - left) * padding, (min_size - (right - left)) / 2, 0)
+        pad_y = max((bottom - top) * padding, (min_size - (bottom - top)) / 2, 0)
+        padded.append((max(int(top - pad_y), 0), min(int(right + pad_x), width),
+                       min(int(bottom + pad_y), height), max(int(left - pad_x), 0)))
+    return padded
+
+
+def merge_regions(regions):
+    """
+    合併互相重疊的區域，避免同一張人臉被重複檢測
+
+    Args:
+        regions: 區域列表 [(top, right, bottom, left), ...]
+
+    Returns:
+        不互相重疊的區域列表
+    """
+    merged = [list(region) for region in regions]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if regions_overlap(a, b):
+                    merged[i] = [min(a[0], b[0]), max(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3])]
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return [tuple(region) for region in merged]
+
+
+def regions_overlap(a, b):
+    """兩個 (top, right, bottom, left) 區域是否重疊"""
+    return a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]
+
+
+def regions_area(regions):
+    """計算不重疊區域的總面積"""
+    return sum((bottom - top) * (right - left) for top, right, bottom, left in regions)
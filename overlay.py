@@ -0,0 +1,142 @@
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+# 依序嘗試的字體：Windows 微軟雅黑、備用字體
+FONT_CANDIDATES = ("msyh.ttc", "arial.ttf")
+
+
+@lru_cache(maxsize=16)
+def load_font(font_size):
+    """
+    載入指定大小的字體 (每種大小只載入一次)
+
+    Args:
+        font_size: 字體大小
+
+    Returns:
+        PIL 字體物件
+    """
+    for font_name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(font_name, font_size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+class TextSprite:
+    """預先點陣化的文字圖塊"""
+
+    def __init__(self, alpha, color, offset):
+        """
+        初始化文字圖塊
+
+        Args:
+            alpha: 文字遮罩 (h×w×1 uint16，0-255)
+            color: 文字顏色 (B, G, R)
+            offset: 圖塊左上角相對於文字位置的偏移 (dx, dy)
+        """
+        self.alpha = alpha
+        self.inverse_alpha = 255 - alpha
+        self.color = np.asarray(color, dtype=np.uint16) * alpha
+        self.offset = offset
+
+
+class OverlayRenderer:
+    """文字疊加渲染器：快取點陣化文字並只混合文字所在的區域"""
+
+    def __init__(self, sprite_cache_size=256):
+        """
+        初始化渲染器
+
+        Args:
+            sprite_cache_size: 文字圖塊 LRU 快取的容量
+        """
+        self.sprite_cache_size = sprite_cache_size
+        self._sprites = OrderedDict()
+        self._pending = []
+
+    def add_text(self, text, position, font_size, color):
+        """
+        加入本幀要繪製的文字，於 flush 時一次合成
+
+        Args:
+            text: 要繪製的文字
+            position: 文字位置 (x, y)
+            font_size: 字體大小
+            color: 文字顏色 (B, G, R)
+        """
+        self._pending.append((text, position, font_size, tuple(color)))
+
+    def flush(self, frame):
+        """
+        將所有待繪製文字合成到畫面 (直接修改 frame)
+
+        Args:
+            frame: OpenCV 圖像 (BGR)
+
+        Returns:
+            繪製文字後的圖像
+        """
+        for text, position, font_size, color in self._pending:
+            self._blend(frame, self._get_sprite(text, font_size, color), position)
+        self._pending.clear()
+        return frame
+
+    def draw_text(self, frame, text, position, font_size, color):
+        """
+        立即在畫面上繪製文字，只修改文字所在的矩形區域 (直接修改 frame，不複製整張畫面)
+
+        Args:
+            frame: OpenCV 圖像 (BGR)
+            text: 要繪製的文字
+            position: 文字位置 (x, y)
+            font_size: 字體大小
+            color: 文字顏色 (B, G, R)
+        """
+        self._blend(frame, self._get_sprite(text, font_size, tuple(color)), position)
+
+    def _get_sprite(self, text, font_size, color):
+        """取得 (或建立) 文字圖塊"""
+        key = (text, font_size, color)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            return sprite
+
+        font = load_font(font_size)
+        left, top, right, bottom = font.getbbox(text)
+        width, height = max(right - left, 1), max(bottom - top, 1)
+
+        mask = Image.new("L", (width, height), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+        alpha = np.asarray(mask, dtype=np.uint16)[:, :, None]
+
+        sprite = TextSprite(alpha, color, (left, top))
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.sprite_cache_size:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def _blend(self, frame, sprite, position):
+        """以整數 alpha 混合將圖塊疊加到畫面區域，超出畫面的部分會被裁切"""
+        x = position[0] + sprite.offset[0]
+        y = position[1] + sprite.offset[1]
+        height, width = sprite.alpha.shape[:2]
+
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, frame.shape[1]), min(y + height, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        sx, sy = x0 - x, y0 - y
+        sprite_rows = slice(sy, sy + (y1 - y0))
+        sprite_cols = slice(sx, sx + (x1 - x0))
+
+        region = frame[y0:y1, x0:x1]
+        blended = (region * sprite.inverse_alpha[sprite_rows, sprite_cols]
+                   + sprite.color[sprite_rows, sprite_cols] + 127) // 255
+        region[:] = blended
@@ -0,0 +1,240 @@
+import queue
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from frame_buffers import FrameRecycler
+
+
+class PipelineStats:
+    """管線執行統計：佇列深度、畫面延遲與各階段速率"""
+
+    def __init__(self, max_samples=1000):
+        """
+        初始化統計資料
+
+        Args:
+            max_samples: 每個統計區間最多保留的延遲樣本數 (不輸出統計時也不會無限增長)
+        """
+        self.lock = threading.Lock()
+        self.max_samples = max_samples
+        self.reset()
+
+    def reset(self):
+        """清除目前統計區間的資料"""
+        with self.lock:
+            self.interval_start = time.monotonic()
+            self.captured_frames = 0
+            self.dropped_frames = 0
+            self.displayed_frames = 0
+            self.inferred_frames = 0
+            self.frame_ages = deque(maxlen=self.max_samples)
+            self.inference_times = deque(maxlen=self.max_samples)
+            self.max_inference_depth = 0
+            self.max_display_depth = 0
+
+    def record_capture(self, dropped):
+        """記錄一張擷取畫面與顯示端來不及顯示而丟棄的舊畫面數量"""
+        with self.lock:
+            self.captured_frames += 1
+            self.dropped_frames += dropped
+
+    def record_inference(self, seconds, queue_depth):
+        """記錄一次檢測耗時與檢測佇列深度"""
+        with self.lock:
+            self.inferred_frames += 1
+            self.inference_times.append(seconds)
+            self.max_inference_depth = max(self.max_inference_depth, queue_depth)
+
+    def record_display(self, frame_age, queue_depth):
+        """記錄一次顯示的端到端畫面延遲與顯示佇列深度"""
+        with self.lock:
+            self.displayed_frames += 1
+            self.frame_ages.append(frame_age)
+            self.max_display_depth = max(self.max_display_depth, queue_depth)
+
+    def summary(self):
+        """
+        彙整目前統計區間
+
+        Returns:
+            統計資料字典 (時間單位為毫秒)
+        """
+        with self.lock:
+            elapsed = max(time.monotonic() - self.interval_start, 1e-6)
+            ages = np.asarray(self.frame_ages) * 1000
+            inference = np.asarray(self.inference_times) * 1000
+            return {
+                "capture_fps": self.captured_frames / elapsed,
+                "display_fps": self.displayed_frames / elapsed,
+                "inference_fps": self.inferred_frames / elapsed,
+                "dropped_frames": self.dropped_frames,
+                "max_inference_queue": self.max_inference_depth,
+                "max_display_queue": self.max_display_depth,
+                "frame_age_ms_avg": float(ages.mean()) if len(ages) else 0.0,
+                "frame_age_ms_max": float(ages.max()) if len(ages) else 0.0,
+                "inference_ms_avg": float(inference.mean()) if len(inference) else 0.0,
+            }
+
+
+class FramePipeline:
+    """擷取 / 檢測 / 顯示三段式管線，以有界佇列連接並只保留最新畫面"""
+
+    def __init__(self, cap, detector, window_name="Friend Detector", stats_interval=5.0):
+        """
+        初始化管線
+
+        Args:
+            cap: 攝影機物件
+            detector: 朋友檢測器
+            window_name: 顯示視窗名稱
+            stats_interval: 輸出統計資訊的間隔秒數，0 表示不輸出
+        """
+        self.cap = cap
+        self.detector = detector
+        self.window_name = window_name
+        self.stats_interval = stats_interval
+        self.stats = PipelineStats()
+        # 擷取畫面與檢測副本在處理完後歸還，重複使用而不是每幀配置
+        self.frames = FrameRecycler(detector.timer)
+
+        # 有界佇列：檢測端只需要最新一張，顯示端保留少量緩衝
+        self.inference_queue = queue.Queue(maxsize=1)
+        self.display_queue = queue.Queue(maxsize=2)
+
+        self.running = False
+        self.threads = []
+
+    def run(self):
+        """啟動擷取與檢測執行緒，並在主執行緒執行顯示循環直到按下 'q'"""
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+        try:
+            self._display_loop()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """停止所有執行緒"""
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=1)
+
+    def _capture_loop(self):
+        """擷取執行緒：持續讀取攝影機，讓驅動緩衝不會累積舊畫面"""
+        frame_id = 0
+        frame_shape = None
+        timer = self.detector.timer
+        while self.running:
+            buffer = self.frames.acquire(frame_shape)
+            with timer.stage("capture"):
+                ret, frame = self.cap.read(buffer)
+            if not ret:
+                self.frames.release(buffer)
+                print("無法讀取攝影機畫面")
+                time.sleep(0.1)
+                continue
+            frame_shape = frame.shape
+
+            frame_id += 1
+            captured_at = time.monotonic()
+            # 檢測端使用獨立副本，避免顯示端繪製時修改同一張畫面
+            inference_frame = self.frames.acquire(frame_shape)
+            np.copyto(inference_frame, frame)
+            _put_latest(self.inference_queue, (frame_id, captured_at, inference_frame), self._release_item)
+            dropped = _put_latest(self.display_queue, (frame_id, captured_at, frame), self._release_item)
+            self.stats.record_capture(dropped)
+
+    def _inference_loop(self):
+        """檢測執行緒：以 CPU 能負擔的速率對最新畫面執行人臉檢測"""
+        while self.running:
+            try:
+                _, _, frame = self.inference_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            try:
+                # 依排程器決定檢測或追蹤，畫面靜止時檢測執行緒大多只做畫面差異；
+                # 追蹤與觸發判斷也只在此執行緒進行，顯示端只讀取結果快照
+                start = time.perf_counter()
+                if self.detector.analyze_frame(frame) == "detect":
+                    self.stats.record_inference(time.perf_counter() - start, self.inference_queue.qsize())
+            except Exception as e:
+                # 單幀錯誤不結束檢測執行緒，否則檢測與觸發會永久停止
+                print(f"人臉檢測錯誤: {e}")
+            finally:
+                self.frames.release(frame)
+
+    def _display_loop(self):
+        """顯示循環：以攝影機速率繪製最新的檢測結果"""
+        last_report = time.monotonic()
+        while self.running:
+            try:
+                _, captured_at, frame = self.display_queue.get(timeout=0.1)
+            except queue.Empty:
+                frame = None
+
+            if frame is not None:
+                processed_frame = self.detector.render_frame(frame)
+                with self.detector.timer.stage("display"):
+                    cv2.imshow(self.window_name, processed_frame)
+                self.stats.record_display(time.monotonic() - captured_at, self.display_queue.qsize())
+                self.frames.release(frame)
+
+            # 檢查退出鍵
+            with self.detector.timer.stage("display_wait"):
+                key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                break
+
+            if self.stats_interval and time.monotonic() - last_report >= self.stats_interval:
+                self._print_stats()
+                last_report = time.monotonic()
+
+    def _print_stats(self):
+        """輸出並重置統計資料"""
+        s = self.stats.summary()
+        print(f"📊 擷取 {s['capture_fps']:.1f} FPS | 顯示 {s['display_fps']:.1f} FPS | "
+              f"檢測 {s['inference_fps']:.1f} FPS ({s['inference_ms_avg']:.0f}ms) | "
+              f"佇列 檢測≤{s['max_inference_queue']} 顯示≤{s['max_display_queue']} | "
+              f"丟棄 {s['dropped_frames']} | "
+              f"畫面延遲 平均 {s['frame_age_ms_avg']:.0f}ms 最大 {s['frame_age_ms_max']:.0f}ms")
+        self.stats.reset()
+
+    def _release_item(self, item):
+        """歸還被丟棄的佇列項目中的畫面"""
+        self.frames.release(item[2])
+
+
+def _put_latest(q, item, on_drop=None):
+    """
+    放入佇列，佇列已滿時丟棄最舊的項目
+
+    Args:
+        q: 有界佇列
+        item: 要放入的項目
+        on_drop: 處理被丟棄項目的函數
+
+    Returns:
+        被丟棄的項目數量
+    """
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                old = q.get_nowait()
+                dropped += 1
+                if on_drop is not None:
+                    on_drop(old)
+            except queue.Empty:
+                pass
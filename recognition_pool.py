@@ -0,0 +1,163 @@
+import signal
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+# 子行程中的人臉識別處理器 (由 _init_worker 建立)
+_worker_handler = None
+
+
+class RoundRobinGate:
+    """限制同時執行的識別工作數量，並讓等待中的來源依序輪流取得名額"""
+
+    def __init__(self, slots):
+        """
+        初始化輪替閘門
+
+        Args:
+            slots: 同時執行的工作數量上限 (通常等於工作行程數)
+        """
+        self.slots = slots
+        self.waiting = deque()
+        self.cond = threading.Condition()
+
+    def acquire(self, source_id):
+        """
+        等待輪到此來源且有空閒名額
+
+        Args:
+            source_id: 來源識別碼
+        """
+        with self.cond:
+            self.waiting.append(source_id)
+            while not (self.slots > 0 and self.waiting[0] == source_id):
+                self.cond.wait()
+            self.waiting.popleft()
+            self.slots -= 1
+            self.cond.notify_all()
+
+    def release(self):
+        """歸還名額"""
+        with self.cond:
+            self.slots += 1
+            self.cond.notify_all()
+
+
+class RecognitionPool:
+    """多個攝影機來源共用的人臉檢測與編碼工作行程池"""
+
+    def __init__(self, workers):
+        """
+        初始化工作行程池
+
+        Args:
+            workers: 工作行程數
+        """
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        self.gate = RoundRobinGate(workers)
+
+    def call(self, source_id, fn, *args):
+        """
+        在工作行程中執行 fn，各來源公平輪流
+
+        Args:
+            source_id: 來源識別碼
+            fn: 模組層級函數 (可被 pickle)
+            args: 傳給 fn 的參數
+
+        Returns:
+            fn 的返回值
+        """
+        self.gate.acquire(source_id)
+        try:
+            return self.executor.submit(fn, *args).result()
+        finally:
+            self.gate.release()
+
+    def handler_for(self, source_id, local_handler):
+        """
+        建立某個來源使用的人臉識別處理器代理
+
+        Args:
+            source_id: 來源識別碼
+            local_handler: 已載入特徵庫的本行程處理器 (用於比對)
+        """
+        return PooledFaceHandler(self, source_id, local_handler)
+
+    def shutdown(self):
+        """關閉工作行程"""
+        self.executor.shutdown(cancel_futures=True)
+
+
+class PooledFaceHandler:
+    """與 FaceRecognitionHandler 相同介面：檢測與編碼交給工作行程，比對使用本行程共用的特徵庫"""
+
+    def __init__(self, pool, source_id, local_handler):
+        """
+        初始化處理器代理
+
+        Args:
+            pool: 工作行程池
+            source_id: 來源識別碼
+            local_handler: 已載入特徵庫的本行程處理器
+        """
+        self.pool = pool
+        self.source_id = source_id
+        self.local_handler = local_handler
+
+    def detect_faces(self, rgb_frame, upsample=1):
+        """在工作行程中檢測人臉位置"""
+        return self.pool.call(self.source_id, _worker_detect_faces, rgb_frame, upsample)
+
+    def detect_faces_in_regions(self, rgb_frame, regions, upsample=1):
+        """在工作行程中只檢測指定區域，只傳送區域影像以減少行程間資料量"""
+        crops = [rgb_frame[top:bottom, left:right] for top, right, bottom, left in regions]
+        crop_locations = self.pool.call(self.source_id, _worker_detect_crops, crops, upsample)
+
+        face_locations = []
+        for (top, _, _, left), locations in zip(regions, crop_locations):
+            for t, r, b, l in locations:
+                face_locations.append((t + top, r + left, b + top, l + left))
+        return face_locations
+
+    def encode_faces(self, rgb_frame, face_locations):
+        """在工作行程中計算人臉編碼，每張人臉只傳送擴大後的周圍區域"""
+        if not face_locations:
+            return []
+        height, width = rgb_frame.shape[:2]
+        batch = []
+        for top, right, bottom, left in face_locations:
+            # 對齊只使用人臉框附近的像素，擴大半個臉寬即可得到相同的編碼
+            pad_x, pad_y = (right - left) // 2, (bottom - top) // 2
+            y0, x0 = max(top - pad_y, 0), max(left - pad_x, 0)
+            y1, x1 = min(bottom + pad_y, height), min(right + pad_x, width)
+            batch.append((rgb_frame[y0:y1, x0:x1], [(top - y0, right - x0, bottom - y0, left - x0)]))
+        results = self.pool.call(self.source_id, _worker_encode_batch, batch)
+        return [encodings[0] for encodings in results]
+
+    def match_identities(self, face_encodings):
+        """以共用特徵庫比對身分"""
+        return self.local_handler.match_identities(face_encodings)
+
+
+def _init_worker():
+    """工作行程初始化：載入人臉模型"""
+    global _worker_handler
+    # Ctrl+C 由主行程處理並關閉行程池
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from face_recognition_handler import FaceRecognitionHandler
+    _worker_handler = FaceRecognitionHandler()
+
+
+def _worker_detect_faces(rgb_frame, upsample):
+    return _worker_handler.detect_faces(rgb_frame, upsample=upsample)
+
+
+def _worker_detect_crops(crops, upsample):
+    return [_worker_handler.detect_faces(crop, upsample=upsample) if crop.size else [] for crop in crops]
+
+
+def _worker_encode_batch(batch):
+    return _worker_handler.encode_faces_batch(batch)
@@ -0,0 +1,117 @@
+import threading
+import time
+
+
+class StartupProfile:
+    """記錄啟動過程各步驟的耗時"""
+
+    def __init__(self):
+        """初始化啟動紀錄，以建立時間作為起點"""
+        self.start = time.perf_counter()
+        self.steps = []
+        self.lock = threading.Lock()
+
+    def step(self, name):
+        """
+        計時一個啟動步驟
+
+        Args:
+            name: 步驟名稱
+
+        Returns:
+            context manager
+        """
+        return _StartupStep(self, name)
+
+    def mark(self, name):
+        """記錄從啟動到目前為止的時間點 (例如第一張畫面顯示)"""
+        self._add(name, time.perf_counter() - self.start)
+
+    def elapsed(self):
+        """從啟動到目前為止的秒數"""
+        return time.perf_counter() - self.start
+
+    def report(self):
+        """
+        輸出啟動時間明細
+
+        Returns:
+            [(步驟名稱, 秒數), ...]
+        """
+        with self.lock:
+            steps = list(self.steps)
+        parts = " | ".join(f"{name} {seconds:.2f}s" for name, seconds in steps)
+        print(f"⏱️ 啟動時間: {parts} | 總計 {self.elapsed():.2f}s")
+        return steps
+
+    def _add(self, name, seconds):
+        with self.lock:
+            self.steps.append((name, seconds))
+
+
+class _StartupStep:
+    """StartupProfile.step 使用的計時區塊"""
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile._add(self.name, time.perf_counter() - self.begin)
+        return False
+
+
+class BackgroundLoader:
+    """在背景執行緒執行耗時的初始化，主執行緒可同時顯示預覽畫面"""
+
+    def __init__(self, target, *args):
+        """
+        初始化背景載入器
+
+        Args:
+            target: 載入函數，其返回值會存放在 result
+            args: 傳給 target 的參數
+        """
+        self.target = target
+        self.args = args
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="loader", daemon=True)
+
+    def start(self):
+        """開始載入"""
+        self.thread.start()
+        return self
+
+    @property
+    def ready(self):
+        """是否已載入完成 (成功或失敗)"""
+        return self.done.is_set()
+
+    def wait(self):
+        """
+        等待載入完成
+
+        Returns:
+            target 的返回值
+
+        Raises:
+            載入過程中發生的例外
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _run(self):
+        try:
+            self.result = self.target(*self.args)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
@@ -0,0 +1,91 @@
+import json
+import pytest
+from batch_scan import JsonlIndexWriter, SqliteIndexWriter, plan_chunks
+
+
+PARAMS = {"stride": 1.0, "scale": 0.5}
+
+
+def _row(frame):
+    return {"source": "a.mp4", "frame": frame, "timestamp": frame / 30, "box": [1, 2, 3, 4],
+            "label": "alice", "distance": 0.3}
+
+
+def _read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_resume_drops_rows_written_after_the_last_checkpoint(tmp_path):
+    path = str(tmp_path / "scan.jsonl")
+    writer = JsonlIndexWriter(path)
+    assert writer.open(PARAMS) == set()
+    writer.write_chunk(["a.mp4@0"], [_row(0), _row(30)])
+    # 中斷：紀錄已寫入但尚未記錄檢查點
+    writer.output.write(json.dumps(_row(60)) + "\n")
+    writer.close()
+
+    writer = JsonlIndexWriter(path)
+    assert writer.open(PARAMS) == {"a.mp4@0"}
+    writer.write_chunk(["a.mp4@90"], [_row(90)])
+    writer.close()
+
+    assert [row["frame"] for row in _read_rows(path)] == [0, 30, 90]
+
+
+def test_jsonl_resume_ignores_a_torn_checkpoint_line(tmp_path):
+    path = str(tmp_path / "scan.jsonl")
+    writer = JsonlIndexWriter(path)
+    writer.open(PARAMS)
+    writer.write_chunk(["a.mp4@0"], [_row(0)])
+    writer.write_chunk(["a.mp4@90"], [_row(90)])
+    writer.close()
+    with open(writer.checkpoint_path, "rb+") as f:
+        content = f.read()
+        f.truncate(len(content) - 5)
+
+    writer = JsonlIndexWriter(path)
+    assert writer.open(PARAMS) == {"a.mp4@0"}
+    writer.write_chunk(["a.mp4@90"], [_row(90)])
+    writer.close()
+
+    assert [row["frame"] for row in _read_rows(path)] == [0, 90]
+    with open(writer.checkpoint_path, encoding="utf-8") as f:
+        assert len([json.loads(line) for line in f]) == 3
+
+
+def test_jsonl_rejects_changed_params_and_untracked_output(tmp_path):
+    path = str(tmp_path / "scan.jsonl")
+    writer = JsonlIndexWriter(path)
+    writer.open(PARAMS)
+    writer.close()
+    with pytest.raises(ValueError):
+        JsonlIndexWriter(path).open(dict(PARAMS, scale=1.0))
+
+    other = tmp_path / "other.jsonl"
+    other.write_text("{}\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        JsonlIndexWriter(str(other)).open(PARAMS)
+
+
+def test_sqlite_resume_returns_completed_keys(tmp_path):
+    path = str(tmp_path / "scan.db")
+    writer = SqliteIndexWriter(path)
+    writer.open(PARAMS)
+    writer.write_chunk(["a.mp4@0"], [_row(0)])
+    writer.close()
+
+    writer = SqliteIndexWriter(path)
+    assert writer.open(PARAMS) == {"a.mp4@0"}
+    count, = writer.conn.execute("SELECT COUNT(*) FROM appearances").fetchone()
+    writer.close()
+    assert count == 1
+
+
+def test_plan_chunks_skips_completed_photos():
+    images = [f"photos/{i}.jpg" for i in range(5)]
+
+    chunks = plan_chunks([], images, 1.0, 60.0, image_chunk=2, done={"photos/1.jpg"})
+
+    assert [chunk.paths for chunk in chunks] == [
+        ["photos/0.jpg", "photos/2.jpg"], ["photos/3.jpg", "photos/4.jpg"]]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from detection_scheduler import AdaptiveDetectionScheduler
+
+
+def _scheduler(**kwargs):
+    params = dict(cpu_budget=0.5, min_interval=0.05, tracking_interval=0.5,
+                  idle_max_interval=2.0, idle_backoff=2.0, motion_threshold=4.0)
+    params.update(kwargs)
+    return AdaptiveDetectionScheduler(**params)
+
+
+def test_first_frame_always_detects():
+    assert _scheduler().should_detect(False, False, now=0.0)
+
+
+def test_idle_interval_backs_off_to_the_maximum():
+    scheduler = _scheduler()
+    intervals = []
+    for i in range(8):
+        scheduler.record_detection(float(i), 0.01, faces_found=False)
+        intervals.append(scheduler.next_interval(False, False))
+
+    assert intervals[:4] == pytest.approx([0.1, 0.2, 0.4, 0.8])
+    assert intervals[-1] == pytest.approx(2.0)
+    assert all(b >= a for a, b in zip(intervals, intervals[1:]))
+
+
+def test_faces_or_motion_reset_the_backoff():
+    scheduler = _scheduler()
+    for i in range(5):
+        scheduler.record_detection(float(i), 0.01, faces_found=False)
+    scheduler.record_detection(5.0, 0.01, faces_found=True)
+    assert scheduler.idle_interval == pytest.approx(0.05)
+
+    for i in range(5):
+        scheduler.record_detection(float(6 + i), 0.01, faces_found=False)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    scheduler.observe(frame)
+    scheduler.observe(frame + 100)
+    # 上次檢測後有活動時不等待退避間隔
+    assert scheduler.next_interval(False, False) == pytest.approx(0.05)
+
+
+def test_base_interval_follows_latency_and_cpu_budget():
+    scheduler = _scheduler(cpu_budget=0.25)
+    scheduler.record_detection(0.0, 0.2, faces_found=True)
+
+    assert scheduler.base_interval() == pytest.approx(0.8)
+    assert not scheduler.should_detect(True, False, now=0.7)
+    assert scheduler.should_detect(True, False, now=0.8)
+
+
+def test_tracking_uses_the_recognition_interval():
+    scheduler = _scheduler()
+    scheduler.record_detection(10.0, 0.01, faces_found=True)
+
+    assert not scheduler.should_detect(True, True, now=10.4)
+    assert scheduler.should_detect(True, True, now=10.5)
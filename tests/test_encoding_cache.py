@@ -0,0 +1,94 @@
+import numpy as np
+from encoding_cache import EncodingCache
+from face_gallery import FaceGallery
+from face_index import gallery_fingerprint
+
+
+PARAMS = {"model": "hog", "upsample": 1}
+
+
+def _make_cache(tmp_path):
+    return EncodingCache(str(tmp_path / "enc.npy"), str(tmp_path / "enc.json"), PARAMS)
+
+
+def _make_photos(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(f"photo {i}".encode("ascii"))
+        paths.append(str(path))
+    return paths
+
+
+def test_matrix_for_skips_photos_without_faces(tmp_path):
+    paths = _make_photos(tmp_path, 4)
+    labels = ["a", "b", "a", "c"]
+    encodings = [np.full(128, i, dtype=np.float32) for i in range(4)]
+    # 第二張照片未檢測到人臉
+    encodings[1] = None
+    _make_cache(tmp_path).save(list(zip(paths, encodings, labels)))
+
+    cache = _make_cache(tmp_path)
+    cache.load()
+    matrix, row_labels = cache.matrix_for(paths, labels)
+
+    assert isinstance(matrix, np.memmap)
+    assert row_labels == ["a", "a", "c"]
+    np.testing.assert_array_equal(matrix[:, 0], [0, 2, 3])
+
+
+def test_matrix_for_ignores_missing_photos(tmp_path):
+    paths = _make_photos(tmp_path, 3)
+    labels = ["a", "a", "b"]
+    encodings = [np.zeros(128, dtype=np.float32)] * 3
+    _make_cache(tmp_path).save(list(zip(paths, encodings, labels)))
+
+    cache = _make_cache(tmp_path)
+    cache.load()
+    assert cache.matrix_for(paths + [str(tmp_path / "missing.jpg")], labels + ["a"]) is not None
+
+
+def test_matrix_for_rejects_new_photo_and_label_change(tmp_path):
+    paths = _make_photos(tmp_path, 3)
+    labels = ["a", "a", "b"]
+    encodings = [np.zeros(128, dtype=np.float32)] * 2
+    _make_cache(tmp_path).save(list(zip(paths[:2], encodings, labels[:2])))
+
+    cache = _make_cache(tmp_path)
+    cache.load()
+    assert cache.matrix_for(paths, labels) is None
+    assert cache.matrix_for(paths[:2], ["a", "b"]) is None
+
+
+def test_saved_norms_and_digest_match_gallery(tmp_path):
+    paths = _make_photos(tmp_path, 3)
+    labels = ["a", "b", "c"]
+    rng = np.random.default_rng(0)
+    encodings = [rng.normal(size=128).astype(np.float32) for _ in range(3)]
+    encodings[1] = None
+    _make_cache(tmp_path).save(list(zip(paths, encodings, labels)))
+
+    cache = _make_cache(tmp_path)
+    cache.load()
+    matrix, row_labels = cache.matrix_for(paths, labels)
+    assert isinstance(cache.sq_norms, np.memmap)
+
+    mapped = FaceGallery()
+    mapped.set_encodings(matrix, row_labels, cache.sq_norms, cache.digest)
+    rebuilt = FaceGallery([encodings[0], encodings[2]], ["a", "c"])
+    np.testing.assert_allclose(mapped.sq_norms, rebuilt.sq_norms, rtol=1e-6)
+    assert gallery_fingerprint(mapped) == gallery_fingerprint(rebuilt)
+
+
+def test_save_and_load_when_no_photo_encodes(tmp_path):
+    paths = _make_photos(tmp_path, 2)
+    labels = ["a", "b"]
+    _make_cache(tmp_path).save(list(zip(paths, [None, None], labels)))
+
+    cache = _make_cache(tmp_path)
+    cache.load()
+    assert cache.lookup(paths[0]) == (True, None)
+    assert cache.misses == 0
+    matrix, row_labels = cache.matrix_for(paths, labels)
+    assert matrix.shape == (0, 128)
+    assert row_labels == []
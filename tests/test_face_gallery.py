@@ -0,0 +1,79 @@
+import numpy as np
+from face_gallery import FaceGallery
+
+
+def _random_gallery(size, seed=0, chunk_size=1024):
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 0.1, size=(size, 128)).astype(np.float32)
+    return FaceGallery(encodings, [f"id{i}" for i in range(size)], chunk_size=chunk_size), rng
+
+
+def _naive_distances(gallery, queries):
+    return np.linalg.norm(gallery.matrix[None, :, :] - np.asarray(queries)[:, None, :], axis=2)
+
+
+def test_match_returns_nearest_encoding():
+    gallery, rng = _random_gallery(50)
+    queries = gallery.matrix[[3, 17]] + rng.normal(0.0, 0.001, size=(2, 128)).astype(np.float32)
+
+    distances, indices = gallery.match(queries)
+
+    np.testing.assert_array_equal(indices, [3, 17])
+    np.testing.assert_allclose(distances, _naive_distances(gallery, queries).min(axis=1), atol=1e-4)
+
+
+def test_top_k_is_sorted_and_matches_naive_order():
+    gallery, rng = _random_gallery(40)
+    queries = rng.normal(0.0, 0.1, size=(3, 128)).astype(np.float32)
+
+    distances, indices = gallery.match(queries, top_k=5)
+
+    expected = np.argsort(_naive_distances(gallery, queries), axis=1)[:, :5]
+    assert distances.shape == indices.shape == (3, 5)
+    np.testing.assert_array_equal(indices, expected)
+    assert np.all(np.diff(distances, axis=1) >= 0)
+
+
+def test_top_k_larger_than_gallery_is_clamped():
+    gallery, _ = _random_gallery(3)
+
+    distances, indices = gallery.match(gallery.matrix[:1], top_k=10)
+
+    assert indices.shape == (1, 3)
+    assert indices[0, 0] == 0
+
+
+def test_early_accept_stops_after_first_chunk_with_a_close_match():
+    gallery, _ = _random_gallery(30, chunk_size=10)
+    # 第一塊中已有低於門檻的編碼，之後的塊中更近的編碼不會被比對到
+    query = gallery.matrix[2].copy()
+    matrix = gallery.matrix.copy()
+    matrix[2] = query + 0.0002
+    matrix[25] = query
+    gallery.set_encodings(matrix, gallery.labels)
+
+    distances, indices = gallery.match([query], accept_threshold=0.01)
+    assert indices[0] == 2
+    assert distances[0] < 0.01
+
+    _, indices = gallery.match([query])
+    assert indices[0] == 25
+
+
+def test_early_accept_searches_all_chunks_when_nothing_is_close():
+    gallery, rng = _random_gallery(30, chunk_size=10)
+    query = rng.normal(0.0, 0.1, size=128).astype(np.float32)
+
+    _, indices = gallery.match([query], accept_threshold=1e-6)
+
+    assert indices[0] == np.argmin(_naive_distances(gallery, [query])[0])
+
+
+def test_empty_gallery_and_empty_queries():
+    empty = FaceGallery()
+    distances, indices = empty.match([np.zeros(128)])
+    assert distances.shape == indices.shape == (1,)
+
+    gallery, _ = _random_gallery(5)
+    distances, indices = gallery.match([], top_k=2)
+    assert distances.shape == indices.shape == (0, 0)
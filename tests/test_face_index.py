@@ -0,0 +1,54 @@
+import numpy as np
+from face_index import BruteForceIndex, IVFIndex, build_index, load_index, save_index
+from index_benchmark import make_synthetic_gallery
+
+
+def test_ivf_recall_against_brute_force():
+    gallery, queries, _ = make_synthetic_gallery(num_identities=100, per_identity=20)
+    _, expected = BruteForceIndex(gallery).search(queries, k=1)
+
+    ivf = IVFIndex(gallery, num_probes=8).train()
+    _, found = ivf.search(queries, k=1)
+
+    assert np.mean(found[:, 0] == expected[:, 0]) >= 0.95
+
+
+def test_ivf_probing_every_list_is_exact():
+    gallery, queries, _ = make_synthetic_gallery(num_identities=20, per_identity=10)
+    reference, expected = BruteForceIndex(gallery).search(queries, k=3)
+
+    ivf = IVFIndex(gallery, num_lists=8, num_probes=8).train()
+    distances, found = ivf.search(queries, k=3)
+
+    np.testing.assert_array_equal(found, expected)
+    np.testing.assert_allclose(distances, reference, atol=1e-4)
+
+
+def test_ivf_pads_when_candidates_are_fewer_than_k():
+    gallery, queries, _ = make_synthetic_gallery(num_identities=4, per_identity=2)
+    ivf = IVFIndex(gallery, num_lists=4, num_probes=1).train()
+
+    distances, indices = ivf.search(queries[:1], k=8)
+
+    assert (indices[0] == -1).any()
+    assert np.isinf(distances[0][indices[0] == -1]).all()
+
+
+def test_build_index_switches_to_ivf_at_threshold():
+    gallery, _, _ = make_synthetic_gallery(num_identities=10, per_identity=5)
+    assert isinstance(build_index(gallery, ann_min_size=100), BruteForceIndex)
+    assert isinstance(build_index(gallery, ann_min_size=50), IVFIndex)
+
+
+def test_saved_index_is_rejected_after_gallery_changes(tmp_path):
+    gallery, _, _ = make_synthetic_gallery(num_identities=10, per_identity=5)
+    path = str(tmp_path / "index.npz")
+    save_index(build_index(gallery, ann_min_size=1), path)
+
+    loaded = load_index(path, gallery)
+    assert isinstance(loaded, IVFIndex)
+    # 每個編碼恰好屬於一個桶
+    np.testing.assert_array_equal(np.sort(loaded.list_ids), np.arange(len(gallery)))
+
+    gallery.set_encodings(gallery.matrix, list(reversed(gallery.labels)))
+    assert load_index(path, gallery) is None
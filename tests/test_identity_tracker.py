@@ -0,0 +1,82 @@
+import numpy as np
+from identity_tracker import IdentityTracker
+
+
+BOX = (100, 200, 200, 100)
+ENCODING = np.zeros(128, dtype=np.float32)
+
+
+def _tracker(**kwargs):
+    params = dict(vote_window=5, min_votes=2, expiry_detections=2)
+    params.update(kwargs)
+    return IdentityTracker(0.5, **params)
+
+
+def _observe(tracker, track, label, distance, now=0.0):
+    tracker.add_observation(track, ENCODING, label, distance, now)
+
+
+def test_identity_needs_min_votes():
+    tracker = _tracker()
+    track, = tracker.associate([BOX])
+
+    _observe(tracker, track, "alice", 0.3)
+    assert tracker.identity(track) == ("alice", 0.3, False)
+
+    _observe(tracker, track, "alice", 0.3)
+    assert tracker.identity(track)[::2] == ("alice", True)
+
+
+def test_votes_above_threshold_do_not_count():
+    tracker = _tracker()
+    track, = tracker.associate([BOX])
+    for _ in range(3):
+        _observe(tracker, track, "alice", 0.7)
+
+    label, _, is_friend = tracker.identity(track)
+    assert (label, is_friend) == ("alice", False)
+
+
+def test_old_votes_leave_the_window():
+    tracker = _tracker(vote_window=3)
+    track, = tracker.associate([BOX])
+    _observe(tracker, track, "alice", 0.3)
+    _observe(tracker, track, "alice", 0.3)
+    for _ in range(3):
+        _observe(tracker, track, "bob", 0.3)
+
+    assert tracker.identity(track)[::2] == ("bob", True)
+
+
+def test_association_keeps_votes_for_a_slightly_moved_face():
+    tracker = _tracker()
+    track, = tracker.associate([BOX])
+    moved, = tracker.associate([(105, 205, 205, 105)])
+
+    assert moved is track
+    assert moved.box == (105, 205, 205, 105)
+
+
+def test_track_expires_after_missed_detections():
+    tracker = _tracker(expiry_detections=2)
+    track, = tracker.associate([BOX])
+
+    tracker.associate([])
+    assert tracker.tracks == [track]
+    tracker.associate([])
+    assert tracker.tracks == []
+    assert tracker.associate([BOX])[0] is not track
+
+
+def test_needs_encoding_until_votes_then_on_move_or_age():
+    tracker = _tracker(max_age=2.0, move_ratio=0.25)
+    track, = tracker.associate([BOX])
+    assert tracker.needs_encoding(track, 0.0)
+
+    _observe(tracker, track, "alice", 0.3)
+    _observe(tracker, track, "alice", 0.3)
+    assert not tracker.needs_encoding(track, 1.0)
+    assert tracker.needs_encoding(track, 2.5)
+
+    tracker.associate([(100, 240, 200, 140)])
+    assert tracker.needs_encoding(track, 1.0)
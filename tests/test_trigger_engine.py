@@ -0,0 +1,81 @@
+import time
+from trigger_engine import TriggerEngine
+
+
+def _engine(**kwargs):
+    params = dict(debounce=0.2, leave_after=1.0, cooldown=0.0)
+    params.update(kwargs)
+    engine = TriggerEngine(**params)
+    events = []
+    engine.subscribe(lambda event: events.append((event.kind, event.label)))
+    # 以未來的時間觀察，背景的逾時檢查 (使用實際時間) 不會提早送出 leave
+    return engine, events, time.monotonic() + 1000.0
+
+
+def test_enter_after_debounce():
+    engine, events, t = _engine()
+    engine.observe({"alice"}, now=t)
+    engine.observe({"alice"}, now=t + 0.1)
+    assert engine.active_labels == []
+
+    engine.observe({"alice"}, now=t + 0.25)
+    assert engine.active_labels == ["alice"]
+    engine.close()
+    assert events == [("enter", "alice")]
+
+
+def test_brief_absence_does_not_leave():
+    engine, events, t = _engine()
+    engine.observe({"alice"}, now=t)
+    engine.observe({"alice"}, now=t + 0.3)
+    engine.observe(set(), now=t + 1.0)
+    engine.observe({"alice"}, now=t + 1.2)
+    engine.close()
+    assert events == [("enter", "alice")]
+
+
+def test_leave_after_absence():
+    engine, events, t = _engine()
+    engine.observe({"alice"}, now=t)
+    engine.observe({"alice"}, now=t + 0.3)
+    engine.observe(set(), now=t + 1.4)
+    assert engine.active_labels == []
+    engine.close()
+    assert events == [("enter", "alice"), ("leave", "alice")]
+
+
+def test_cooldown_blocks_a_quick_reenter():
+    engine, events, t = _engine(cooldown=5.0)
+    engine.observe({"alice"}, now=t)
+    engine.observe({"alice"}, now=t + 0.3)
+    engine.observe(set(), now=t + 1.5)
+    # 冷卻期間再次出現不觸發 enter
+    engine.observe({"alice"}, now=t + 2.0)
+    engine.observe({"alice"}, now=t + 2.5)
+    assert engine.active_labels == []
+    # 冷卻結束後持續出現即觸發
+    for step in (3.0, 3.5, 4.0, 4.5, 5.0):
+        engine.observe({"alice"}, now=t + step)
+    assert engine.active_labels == []
+    engine.observe({"alice"}, now=t + 5.4)
+    engine.close()
+    assert events == [("enter", "alice"), ("leave", "alice"), ("enter", "alice")]
+
+
+def test_labels_are_independent():
+    engine, events, t = _engine()
+    engine.observe({"alice", "bob"}, now=t)
+    engine.observe({"alice"}, now=t + 0.3)
+    engine.close()
+    assert events == [("enter", "alice")]
+
+
+def test_slow_subscriber_does_not_block_observe():
+    engine = TriggerEngine(debounce=0.0, leave_after=1.0)
+    engine.subscribe(lambda event: time.sleep(0.5))
+    t = time.monotonic() + 1000.0
+
+    start = time.perf_counter()
+    engine.observe({"alice"}, now=t)
+    assert time.perf_counter() - start < 0.1
+    engine.close()
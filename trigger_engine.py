@@ -0,0 +1,215 @@
+import json
+import queue
+import threading
+import time
+import urllib.request
+
+
+class TriggerEvent:
+    """身分進入或離開觸發範圍的事件"""
+
+    def __init__(self, kind, label, observed_at):
+        """
+        初始化事件
+
+        Args:
+            kind: "enter" 或 "leave"
+            label: 身分標籤
+            observed_at: 造成事件的觀察時間 (單調時鐘)
+        """
+        self.kind = kind
+        self.label = label
+        self.observed_at = observed_at
+        self.timestamp = time.time()
+
+    def to_dict(self):
+        """轉為可序列化為 JSON 的字典"""
+        return {"event": self.kind, "label": self.label, "timestamp": self.timestamp}
+
+
+class TriggerEngine:
+    """以實際時間判斷身分進入 / 離開，並以非同步方式將事件分送給各訂閱者"""
+
+    def __init__(self, debounce=0.2, leave_after=1.5, cooldown=0.0, timer=None):
+        """
+        初始化觸發引擎
+
+        Args:
+            debounce: 身分需持續出現在範圍內多久才觸發 enter (秒)
+            leave_after: 身分消失超過多久觸發 leave (秒)
+            cooldown: 同一身分兩次 enter 之間的最短間隔 (秒)
+            timer: 各階段計時器，記錄觀察到事件送達的延遲
+        """
+        self.debounce = debounce
+        self.leave_after = leave_after
+        self.cooldown = cooldown
+        self.timer = timer
+
+        self.lock = threading.Lock()
+        self.presence = {}
+        self.subscribers = []
+        self.running = True
+        self.ticker = threading.Thread(target=self._tick_loop, name="trigger-tick", daemon=True)
+        self.ticker.start()
+
+    @property
+    def active_labels(self):
+        """目前在範圍內 (已觸發 enter 尚未 leave) 的身分"""
+        with self.lock:
+            return [label for label, state in self.presence.items() if state["active"]]
+
+    def subscribe(self, callback):
+        """
+        訂閱事件；每個訂閱者有自己的佇列與執行緒，慢的動作不會影響其他訂閱者或畫面處理
+
+        Args:
+            callback: 接收 TriggerEvent 的函數
+        """
+        subscriber = _Subscriber(callback, self.timer)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def observe(self, labels_in_range, now=None):
+        """
+        記錄一次觀察結果 (不會阻塞)
+
+        Args:
+            labels_in_range: 此次檢測或追蹤中位於觸發範圍內的身分集合
+            now: 觀察時間 (單調時鐘)，預設為 time.monotonic()
+        """
+        now = time.monotonic() if now is None else now
+        events = []
+        with self.lock:
+            for label in labels_in_range:
+                state = self.presence.get(label)
+                if state is None or now - state["last_seen"] > self.leave_after:
+                    # 新出現或離開後再次出現，重新計算持續時間
+                    last_enter = state["last_enter"] if state else None
+                    state = {"first_seen": now, "last_seen": now, "active": False, "last_enter": last_enter}
+                    self.presence[label] = state
+                state["last_seen"] = now
+
+                cooled = state["last_enter"] is None or now - state["last_enter"] >= self.cooldown
+                if not state["active"] and now - state["first_seen"] >= self.debounce and cooled:
+                    state["active"] = True
+                    state["last_enter"] = now
+                    events.append(TriggerEvent("enter", label, now))
+            events.extend(self._expire(now))
+        self._publish(events)
+
+    def close(self):
+        """停止引擎並等待所有訂閱者處理完已送出的事件"""
+        self.running = False
+        self.ticker.join(timeout=1)
+        for subscriber in self.subscribers:
+            subscriber.close()
+
+    def _expire(self, now):
+        """產生逾時未出現的身分的 leave 事件 (需持有 lock)"""
+        events = []
+        for label, state in list(self.presence.items()):
+            if now - state["last_seen"] > self.leave_after:
+                if state["active"]:
+                    events.append(TriggerEvent("leave", label, state["last_seen"] + self.leave_after))
+                    state["active"] = False
+                if state["last_enter"] is None or now - state["last_enter"] >= self.cooldown:
+                    del self.presence[label]
+        return events
+
+    def _tick_loop(self):
+        """即使沒有新的觀察 (例如檢測被排程略過)，也能依時間送出 leave 事件"""
+        while self.running:
+            time.sleep(0.1)
+            with self.lock:
+                events = self._expire(time.monotonic())
+            self._publish(events)
+
+    def _publish(self, events):
+        for event in events:
+            if self.timer is not None:
+                self.timer.increment(f"trigger_{event.kind}")
+            for subscriber in self.subscribers:
+                subscriber.queue.put(event)
+
+
+class _Subscriber:
+    """以獨立執行緒依序處理事件的訂閱者"""
+
+    def __init__(self, callback, timer):
+        self.callback = callback
+        self.timer = timer
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="trigger-subscriber", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=2)
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+            if self.timer is not None:
+                self.timer.record("trigger_latency", time.monotonic() - event.observed_at)
+            try:
+                self.callback(event)
+            except Exception as e:
+                print(f"觸發事件處理錯誤: {e}")
+
+
+class PlayerAction:
+    """進入範圍時播放影片 (影片播放中則略過)"""
+
+    def __init__(self, video_player, timer=None):
+        """
+        Args:
+            video_player: 影片播放器 (或具有 is_playing / play 的觸發策略)
+            timer: 指標註冊表，記錄 video_triggers 次數
+        """
+        self.video_player = video_player
+        self.timer = timer
+
+    def __call__(self, event):
+        if event.kind == "enter" and not self.video_player.is_playing:
+            self.video_player.play()
+            if self.timer is not None:
+                self.timer.increment("video_triggers")
+            print(f"🎉 檢測到 {event.label}！開始播放影片")
+        elif event.kind == "leave":
+            print(f"👋 {event.label} 已離開")
+
+
+class FileSink:
+    """將事件以 JSON Lines 格式附加到檔案"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: JSON Lines 檔案路徑
+        """
+        self.path = path
+
+    def __call__(self, event):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+
+
+class WebhookAction:
+    """以 HTTP POST 傳送事件 JSON"""
+
+    def __init__(self, url, timeout=2.0):
+        """
+        Args:
+            url: 接收事件的網址
+            timeout: 請求逾時 (秒)
+        """
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, event):
+        body = json.dumps(event.to_dict(), ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
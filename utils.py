@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-from PIL import Image, ImageEnhance, ImageDraw, ImageFont
 
 
 def cv2_puttext_chinese(img, text, position, font_size, color):
@@ -17,53 +16,138 @@ def cv2_puttext_chinese(img, text, position, font_size, color):
     Returns:
         繪製文字後的圖像
     """
+    # PIL 繪圖與字型只在繪製文字時才載入，只用到幾何或讀圖函數的模組不需要
+    from PIL import Image, ImageDraw
+    from overlay import load_font
+    
     img_pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
     draw = ImageDraw.Draw(img_pil)
     
-    # 嘗試載入字體
-    try:
-        font = ImageFont.truetype("msyh.ttc", font_size)  # Windows 微軟雅黑
-    except:
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)  # 備用字體
-        except:
-            font = ImageFont.load_default()
+    # 載入字體 (已快取)
+    font = load_font(font_size)
     
     draw.text(position, text, font=font, fill=color)
     return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
 
 
-def preprocess_image(image_path):
+# 預處理流程版本，變更 preprocess_image 的輸出時需遞增以讓編碼快取失效
+PREPROCESS_VERSION = 2
+
+
+def preprocess_image(image_path, max_side=None):
     """
     預處理圖片以提高人臉檢測成功率
     
     Args:
         image_path: 圖片路径
+        max_side: 輸出圖片的最長邊上限 (像素)，None 表示保留原始尺寸
     
     Returns:
-        預處理後的圖像陣列，失敗時返回 None
+        預處理後的 RGB 圖像陣列，失敗時返回 None
     """
     try:
-        pil_image = Image.open(image_path)
-        
-        # 確保圖片為 RGB 格式
-        if pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
+        image, _ = load_rgb_image(image_path, max_side)
         
         # 調整亮度和對比度
-        enhancer = ImageEnhance.Brightness(pil_image)
-        pil_image = enhancer.enhance(1.2)
-        
-        enhancer = ImageEnhance.Contrast(pil_image)
-        pil_image = enhancer.enhance(1.1)
-        
-        return np.array(pil_image)
+        return enhance_brightness_contrast(image, 1.2, 1.1)
         
     except Exception as e:
         print(f"預處理圖片 {image_path} 失敗: {str(e)}")
         return None
 
 
+def load_rgb_image(image_path, max_side=None):
+    """
+    讀取圖片為 RGB 陣列，超過大小上限時以縮小後的尺寸解碼
+    
+    Args:
+        image_path: 圖片路径
+        max_side: 輸出圖片的最長邊上限 (像素)，None 表示保留原始尺寸
+    
+    Returns:
+        (RGB 圖像陣列, 相對於原始尺寸的縮放比例)
+    """
+    from PIL import Image
+    
+    with Image.open(image_path) as pil_image:
+        original_size = max(pil_image.size)
+        # JPEG 直接以 1/2、1/4、1/8 的 DCT 尺寸解碼，大幅降低解碼時間與記憶體
+        if max_side and original_size > max_side:
+            scale = max_side / original_size
+            pil_image.draft("RGB", (int(pil_image.width * scale), int(pil_image.height * scale)))
+        
+        # 確保圖片為 RGB 格式
+        if pil_image.mode != 'RGB':
+            pil_image = pil_image.convert('RGB')
+        image = np.asarray(pil_image)
+    
+    # 解碼後仍超過上限時再縮小 (PNG 或縮放倍率不足時)
+    if max_side and max(image.shape[:2]) > max_side:
+        scale = max_side / max(image.shape[:2])
+        image = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    return image, max(image.shape[:2]) / original_size
+
+
+def iter_preprocessed_images(image_paths, max_side=None):
+    """
+    逐張預處理圖片，同一時間只保留一張解碼後的圖片
+    
+    Args:
+        image_paths: 圖片路径列表
+        max_side: 輸出圖片的最長邊上限 (像素)
+    
+    Yields:
+        (圖片路径, 預處理後的圖像陣列或 None)
+    """
+    for image_path in image_paths:
+        yield image_path, preprocess_image(image_path, max_side)
+
+
+def enhance_brightness_contrast(rgb_image, brightness, contrast):
+    """
+    以單一查表同時調整亮度與對比度 (等同依序套用 PIL 的 Brightness 與 Contrast)
+    
+    Args:
+        rgb_image: RGB 圖像陣列 (uint8)
+        brightness: 亮度倍率
+        contrast: 對比度倍率，以亮度調整後的灰階平均為中心
+    
+    Returns:
+        調整後的新圖像陣列
+    """
+    levels = np.clip(np.arange(256, dtype=np.float32) * brightness, 0, 255)
+    
+    # 由灰階直方圖估計亮度調整後的平均值，不需產生中間圖像
+    gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    mean = int(hist @ levels / max(hist.sum(), 1) + 0.5)
+    
+    lut = np.clip(mean + (levels - mean) * contrast, 0, 255).astype(np.uint8)
+    return cv2.LUT(np.ascontiguousarray(rgb_image), lut)
+
+
+def letterbox(image, width, height):
+    """
+    等比縮放圖片並置中貼到黑底，模擬攝影機畫面
+    
+    Args:
+        image: 圖像陣列
+        width: 畫面寬度
+        height: 畫面高度
+    
+    Returns:
+        height×width 的新圖像陣列
+    """
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    scale = min(width / image.shape[1], height / image.shape[0])
+    new_width, new_height = int(image.shape[1] * scale), int(image.shape[0] * scale)
+    x, y = (width - new_width) // 2, (height - new_height) // 2
+    canvas[y:y + new_height, x:x + new_width] = cv2.resize(
+        image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    return canvas
+
+
 def calculate_face_center_distance(face_location, frame_shape):
     """
     計算人臉中心與畫面中心的距離
@@ -81,4 +165,21 @@ def calculate_face_center_distance(face_location, frame_shape):
     
     distance = np.sqrt((face_center[0] - frame_center[0]) ** 2 + 
                       (face_center[1] - frame_center[1]) ** 2)
-    return distance
\ No newline at end of file
+    return distance
+
+def scale_face_locations(face_locations, factor):
+    """
+    依比例縮放人臉位置座標
+    
+    Args:
+        face_locations: 人臉位置列表 [(top, right, bottom, left), ...]
+        factor: 縮放倍率
+    
+    Returns:
+        縮放後的人臉位置列表
+    """
+    if factor == 1:
+        return list(face_locations)
+    return [(int(round(top * factor)), int(round(right * factor)),
+             int(round(bottom * factor)), int(round(left * factor)))
+            for (top, right, bottom, left) in face_locations]
@@ -1,16 +1,20 @@
 import cv2
 import os
 import threading
-import pyautogui
+import time
+from config import VIDEO_PRELOAD, VIDEO_CACHE_MAX_MB, VIDEO_SCALED_CACHE
+
+
+DEFAULT_SCREEN_SIZE = (1280, 720)
 
 
 class VideoPlayer:
     """影片播放器類別"""
-    
+
     def __init__(self, video_path):
         """
         初始化影片播放器
-        
+
         Args:
             video_path: 影片檔案路径
         """
@@ -18,21 +22,40 @@ class VideoPlayer:
         self.is_playing = False
         self.window_name = "Video Player"
         self.thread = None
-        
+
+        # 螢幕尺寸只查詢一次
+        self.screen_size = None
+
+        # 預先解碼並縮放好的影格 (影片可完整放入快取時使用)
+        self.frame_cache = None
+        self.dropped_frames = 0
+
+        # 已縮放到螢幕尺寸的影片快取檔 (準備完成後才設定)
+        self.scaled_path = None
+
         # 檢查影片檔案是否存在
         if not os.path.exists(video_path):
             print(f"警告: 影片檔案不存在: {video_path}")
             self.video_exists = False
-        else:
-            self.video_exists = True
-            self.cap = cv2.VideoCapture(video_path)
-    
+            return
+
+        self.video_exists = True
+        cap = cv2.VideoCapture(video_path)
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        if VIDEO_PRELOAD:
+            threading.Thread(target=self.preload, daemon=True).start()
+        elif VIDEO_SCALED_CACHE:
+            threading.Thread(target=self.prepare_scaled_file, daemon=True).start()
+
     def play(self):
         """開始播放影片"""
         if not self.video_exists:
             print("無法播放影片：檔案不存在")
             return
-            
+
         if not self.is_playing:
             self.is_playing = True
             self.thread = threading.Thread(target=self._play_loop)
@@ -48,46 +71,130 @@ class VideoPlayer:
             cv2.destroyWindow(self.window_name)
         except:
             pass
-    
+
+    def preload(self):
+        """預先解碼並縮放整部影片，讓之後的觸發可以立即開始播放"""
+        width, height = self._get_screen_size()
+        estimated_mb = width * height * 3 * self.frame_count / (1024 * 1024)
+        if self.frame_count <= 0 or estimated_mb > VIDEO_CACHE_MAX_MB:
+            print(f"影片預載略過：預估 {estimated_mb:.0f}MB 超過上限 {VIDEO_CACHE_MAX_MB}MB，改為即時解碼")
+            return
+
+        frames = list(self._decode_scaled_frames())
+        if frames:
+            self.frame_cache = frames
+            print(f"✅ 影片已預載 {len(frames)} 幀 ({estimated_mb:.0f}MB)")
+
+    def prepare_scaled_file(self):
+        """
+        將影片縮放到螢幕尺寸並寫入快取檔 (<影片>.<寬>x<高>.avi)，之後的觸發直接讀取，不需每幀縮放
+
+        快取檔比原始影片舊時重新產生；寫入暫存檔後才取代，中斷時不會留下不完整的檔案
+        """
+        width, height = self._get_screen_size()
+        path = f"{os.path.splitext(self.video_path)[0]}.{width}x{height}.avi"
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.video_path):
+            self.scaled_path = path
+            return
+
+        tmp_path = f"{os.path.splitext(path)[0]}.tmp.avi"
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"MJPG"), self.fps, (width, height))
+        if not writer.isOpened():
+            print(f"無法建立縮放影片快取: {path}")
+            return
+        try:
+            for frame in self._decode_scaled_frames():
+                writer.write(frame)
+        finally:
+            writer.release()
+        os.replace(tmp_path, path)
+        self.scaled_path = path
+        print(f"✅ 已建立縮放影片快取 {path}")
+
+    def _get_screen_size(self):
+        """取得螢幕尺寸 (只查詢一次)"""
+        if self.screen_size is None:
+            try:
+                # pyautogui 載入較慢，只在需要螢幕尺寸時才匯入
+                import pyautogui
+                self.screen_size = tuple(pyautogui.size())
+            except:
+                # 如果無法獲取螢幕尺寸，使用預設大小
+                self.screen_size = DEFAULT_SCREEN_SIZE
+        return self.screen_size
+
+    def _decode_scaled_frames(self, is_late=None):
+        """
+        逐幀解碼並縮放到螢幕尺寸
+
+        Args:
+            is_late: 以幀索引判斷是否已落後的函數；落後的幀以 cap.grab() 略過，
+                     不解碼也不縮放，產生 None
+        """
+        screen_size = self._get_screen_size()
+        # 有縮放快取檔時直接讀取，尺寸已與螢幕相同時不再縮放
+        cap = cv2.VideoCapture(self.scaled_path or self.video_path)
+        try:
+            index = 0
+            while True:
+                if is_late is not None and is_late(index):
+                    if not cap.grab():
+                        break
+                    yield None
+                else:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if (frame.shape[1], frame.shape[0]) != screen_size:
+                        frame = cv2.resize(frame, screen_size)
+                    yield frame
+                index += 1
+        finally:
+            cap.release()
+
     def _play_loop(self):
         """影片播放循環（私有方法）"""
         if not self.video_exists:
             return
-            
+
         try:
+            # 全螢幕視窗只建立一次
+            cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+            cv2.setWindowProperty(self.window_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+
+            frame_period = 1.0 / self.fps
             while self.is_playing:
-                # 重置影片到開頭
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                
-                while self.is_playing:
-                    ret, frame = self.cap.read()
-                    if not ret:
+                start_time = time.monotonic()
+
+                def is_late(index):
+                    # 依影片 FPS 與單調時鐘排程，落後超過一幀時丟棄
+                    return time.monotonic() - (start_time + index * frame_period) > frame_period
+
+                # 優先使用預載的影格，否則即時解碼 (落後的幀只 grab 不解碼)
+                frames = self.frame_cache if self.frame_cache is not None else self._decode_scaled_frames(is_late)
+
+                for index, frame in enumerate(frames):
+                    if not self.is_playing:
                         break
-                    
-                    # 獲取螢幕尺寸並調整影片大小
-                    try:
-                        screen_width, screen_height = pyautogui.size()
-                        frame = cv2.resize(frame, (screen_width, screen_height))
-                    except:
-                        # 如果無法獲取螢幕尺寸，使用預設大小
-                        frame = cv2.resize(frame, (1280, 720))
-                    
-                    # 創建全螢幕視窗
-                    cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
-                    cv2.setWindowProperty(self.window_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-                    
+
+                    due_time = start_time + index * frame_period
+                    if frame is None or is_late(index):
+                        self.dropped_frames += 1
+                        continue
+
                     cv2.imshow(self.window_name, frame)
-                    
-                    # 檢查按鍵 (ESC 鍵退出)
-                    key = cv2.waitKey(30) & 0xFF
+
+                    # 等待到下一幀的時間並檢查按鍵 (ESC 鍵退出)
+                    wait_ms = int((due_time + frame_period - time.monotonic()) * 1000)
+                    key = cv2.waitKey(max(1, wait_ms)) & 0xFF
                     if key == 27:  # ESC鍵
                         self.is_playing = False
                         break
-                        
+
         except Exception as e:
             print(f"影片播放錯誤: {e}")
         finally:
             try:
                 cv2.destroyWindow(self.window_name)
             except:
-                pass
\ No newline at end of file
+                pass